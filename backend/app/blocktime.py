@@ -0,0 +1,231 @@
+"""
+区块号与区块时间的本地索引，取代 fetch_data 每次换算都调用 Etherscan getblocknobytime（失败时重试 3 次、每次间隔 3 秒）。
+
+- 锚点：block_timestamps 表中的 (block_number, timestamp)，来自 uniswap_swaps 中已有的区块（record_swap_blocks），
+  以及校验时获取的区块头。加载后在内存中保存为两个有序数组，换算只是一次二分查找（微秒级）；
+- 插值与上下界：合并（The Merge）之后每个 slot 12 秒，区块时间严格递增且相差 slot 的整数倍。
+  锚点 (b0, t0) 之后第 j 个区块的时间不早于 t0 + 12j，锚点 (b1, t1) 之前第 j 个区块的时间不晚于 t1 - 12j，
+  由此得到答案一定所在的区块范围；两个锚点之间没有空 slot 时范围只有一个区块，结果精确；
+- 有界校验：范围不超过 BLOCK_TIME_TOLERANCE 个区块时直接返回保守的一侧（"before" 取上界、"after" 取下界，
+  按区块范围抓取日志时只会多取、不会漏取）；超出时按插值位置获取区块头收窄，最多 BLOCK_TIME_MAX_PROBES 个，
+  获取到的区块头写回表中作为新的锚点；
+- 已知范围之外按 slot 外推（如最新 swap 之后 1 秒的第一个区块是精确的），
+  仍无法确定时返回 None，由调用方改用网络接口（如换算当前时间所在的最新区块）。
+"""
+from __future__ import annotations
+
+import os
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from . import models
+
+SLOT_SECONDS = 12  # 合并后的 slot 长度
+# 不经校验直接接受的范围宽度（区块数）；fetch_data 按 5000 个区块一段抓取日志，多取几十个区块没有额外代价
+BLOCK_TIME_TOLERANCE = int(os.getenv("BLOCK_TIME_TOLERANCE", "100"))
+# 一次换算最多获取的区块头个数
+BLOCK_TIME_MAX_PROBES = int(os.getenv("BLOCK_TIME_MAX_PROBES", "8"))
+
+# 区块号 -> 区块时间（unix 秒），失败时返回 None
+HeaderFetcher = Callable[[int], Optional[int]]
+
+# 每个区块一行；只扫描编号大于 :after 的区块，走 uniswap_swaps 的 (block_number, ...) 索引
+_RECORD_SWAP_BLOCKS = """
+INSERT INTO block_timestamps (block_number, timestamp, source)
+SELECT block_number, min(timestamp), 'swap'
+FROM uniswap_swaps
+WHERE block_number > :after
+GROUP BY block_number
+ON CONFLICT (block_number) DO NOTHING
+"""
+
+
+def record_swap_blocks(conn, rebuild: bool = False) -> int:
+    """
+    把 uniswap_swaps 中新出现的区块记为锚点，返回新增的行数（conn 为 Connection 或 Session，由调用方提交）。
+    默认只看编号大于已有 swap 锚点的区块；rebuild 时删除全部 swap 锚点后重新扫描（回补或重置 swap 之后使用）。
+    """
+    after = -1
+    if rebuild:
+        conn.execute(text("DELETE FROM block_timestamps WHERE source = 'swap'"))
+    else:
+        after = conn.execute(text(
+            "SELECT coalesce(max(block_number), -1) FROM block_timestamps WHERE source = 'swap'"
+        )).scalar()
+    return conn.execute(text(_RECORD_SWAP_BLOCKS), {"after": after}).rowcount
+
+
+def _to_unix(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _from_unix(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+@dataclass(frozen=True)
+class BlockRange:
+    """换算结果：答案一定在 [low, high] 内；estimate 为按时间插值的估计（校验时优先获取它的区块头）。"""
+
+    low: int
+    high: int
+    estimate: int
+
+    @property
+    def exact(self) -> bool:
+        return self.low == self.high
+
+    def conservative(self, closest: str) -> int:
+        return self.high if closest == "before" else self.low
+
+
+Anchor = Tuple[int, int]  # (block_number, unix 秒)
+
+
+def _between(timestamp: int, closest: str, left: Optional[Anchor], right: Optional[Anchor]) -> Optional[BlockRange]:
+    """时间严格位于锚点 left 与 right 之间（任一侧可以没有锚点）时答案的范围；无法确定时返回 None。"""
+    if left is None and right is None:
+        return None
+    if left is not None and right is not None and right[1] - left[1] < SLOT_SECONDS * (right[0] - left[0]):
+        # 两个锚点之间的区块比 slot 多（不符合合并后的出块规则，如手工构造的测试数据），只能确定答案在两者之间
+        low, high = (left[0], right[0] - 1) if closest == "before" else (left[0] + 1, right[0])
+    elif closest == "before":
+        # 时间不晚于 timestamp 的最后一个区块：left 本身一定满足
+        if left is None:
+            return None
+        low, high = left[0], left[0] + (timestamp - left[1]) // SLOT_SECONDS
+        if right is not None:
+            low = max(low, right[0] - _ceil_div(right[1] - timestamp, SLOT_SECONDS))
+            high = min(high, right[0] - 1)
+    else:
+        # 时间不早于 timestamp 的第一个区块：right 本身一定满足
+        if left is None:
+            low, high = max(0, right[0] - (right[1] - timestamp) // SLOT_SECONDS), right[0]
+        else:
+            low, high = left[0] + 1, left[0] + _ceil_div(timestamp - left[1], SLOT_SECONDS)
+            if right is not None:
+                low = max(low, right[0] - (right[1] - timestamp) // SLOT_SECONDS)
+                high = min(high, right[0])
+    if low > high:
+        return None
+
+    if left is not None and right is not None:
+        estimate = left[0] + round((timestamp - left[1]) * (right[0] - left[0]) / (right[1] - left[1]))
+    elif left is not None:
+        estimate = left[0] + (timestamp - left[1]) // SLOT_SECONDS
+    else:
+        estimate = right[0] - (right[1] - timestamp) // SLOT_SECONDS
+    estimate = min(max(estimate, low), high)
+    # 估计值落在锚点上时没有可获取的新信息，改为相邻的未知区块
+    if left is not None and estimate == left[0] and estimate < high:
+        estimate += 1
+    if right is not None and estimate == right[0] and estimate > low:
+        estimate -= 1
+    return BlockRange(low, high, estimate)
+
+
+class BlockTimeIndex:
+    """按区块号排序的锚点；区块时间随区块号严格递增，因此时间数组同样有序，可以按时间二分。"""
+
+    def __init__(self, anchors: Iterable[Anchor] = ()):
+        self.blocks: List[int] = []
+        self.times: List[int] = []
+        self.skipped = 0  # 时间不随区块号递增而被忽略的锚点
+        self._fetched: List[Anchor] = []  # 本次获取、尚未写回的区块头
+        for block, timestamp in sorted(anchors):
+            if self.blocks and timestamp <= self.times[-1]:
+                self.skipped += 1
+                continue
+            self.blocks.append(block)
+            self.times.append(timestamp)
+
+    @classmethod
+    def load(cls, session) -> "BlockTimeIndex":
+        rows = session.execute(
+            select(models.BlockTimestamp.block_number, models.BlockTimestamp.timestamp)
+        ).all()
+        return cls((block, _to_unix(timestamp)) for block, timestamp in rows)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def add(self, block: int, timestamp: int) -> bool:
+        """加入一个获取到的区块头；与已有锚点重复或时间不单调时忽略，返回是否加入。"""
+        i = bisect_left(self.blocks, block)
+        if i < len(self.blocks) and self.blocks[i] == block:
+            return False
+        if (i > 0 and timestamp <= self.times[i - 1]) or (i < len(self.times) and timestamp >= self.times[i]):
+            return False
+        self.blocks.insert(i, block)
+        self.times.insert(i, timestamp)
+        self._fetched.append((block, timestamp))
+        return True
+
+    def lookup(self, timestamp: int, closest: str = "before") -> Optional[BlockRange]:
+        """只用已有锚点换算，返回答案所在的范围；无法确定有限的范围时返回 None。"""
+        i = bisect_left(self.times, timestamp)
+        if i < len(self.times) and self.times[i] == timestamp:
+            return BlockRange(self.blocks[i], self.blocks[i], self.blocks[i])
+        left = (self.blocks[i - 1], self.times[i - 1]) if i > 0 else None
+        right = (self.blocks[i], self.times[i]) if i < len(self.times) else None
+        return _between(timestamp, closest, left, right)
+
+    def block_at(
+        self,
+        timestamp: int,
+        closest: str = "before",
+        fetch_header: Optional[HeaderFetcher] = None,
+        tolerance: int = BLOCK_TIME_TOLERANCE,
+        max_probes: int = BLOCK_TIME_MAX_PROBES,
+    ) -> Optional[int]:
+        """
+        时间戳换算为区块号，语义与 getblocknobytime 相同："before" 为时间不晚于它的最后一个区块，
+        "after" 为时间不早于它的第一个区块。范围超过 tolerance 时，若时间在已知范围之内，
+        用 fetch_header 获取至多 max_probes 个区块头收窄（范围之外的估计位置常常还没有出块，不做探测）；
+        仍超过时返回 None（调用方改用网络接口）。
+        """
+        result = self.lookup(timestamp, closest)
+        inside = bool(self.times) and self.times[0] < timestamp < self.times[-1]
+        probes = 0
+        while (
+            result is not None
+            and result.high - result.low > tolerance
+            and inside
+            and fetch_header is not None
+            and probes < max_probes
+        ):
+            probes += 1
+            header_time = fetch_header(result.estimate)
+            if header_time is None or not self.add(result.estimate, header_time):
+                break
+            result = self.lookup(timestamp, closest)
+        if result is None or result.high - result.low > tolerance:
+            return None
+        return result.conservative(closest)
+
+    def save(self, session) -> int:
+        """把本次获取的区块头写入 block_timestamps（由调用方提交），返回写入的个数。"""
+        if not self._fetched:
+            return 0
+        session.execute(
+            insert(models.BlockTimestamp)
+            .values([
+                {"block_number": block, "timestamp": _from_unix(timestamp), "source": "header"}
+                for block, timestamp in self._fetched
+            ])
+            .on_conflict_do_nothing(index_elements=["block_number"])
+        )
+        count = len(self._fetched)
+        self._fetched = []
+        return count
@@ -0,0 +1,268 @@
+"""
+API 响应缓存与数据版本计数器。
+
+数据只会在 fetch_data / compute_opportunities / compute_arbitrage 提交时变化，
+脚本在同一事务内递增 data_generation 表中的计数器，并在 data_changes 表中记录变化的表与时间范围（app/changes.py）；
+API 每次请求读取该计数器，计数器变化时读取两个版本之间的变更事件，只淘汰依赖范围（CacheScope）与之重叠的条目；
+事件不连续（已清理、有脚本只递增了版本）时整体清空，保证重新计算后不会返回旧结果。
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+
+DATA_GENERATION_ROW_ID = 1
+MAX_CHANGE_REPLAY_GENERATIONS = 1000  # 版本前进超过该数量时不再逐个读取事件，直接整体清空
+
+CacheKey = Tuple[str, Tuple[Tuple[str, Hashable], ...]]
+
+
+def _normalize_value(value: Any) -> Hashable:
+    """将参数值规范化为可哈希、与输入写法无关的形式。"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def make_cache_key(endpoint: str, params: Dict[str, Any]) -> CacheKey:
+    """根据端点名与（已解析默认值的）参数生成缓存键。"""
+    return endpoint, tuple(sorted((name, _normalize_value(value)) for name, value in params.items()))
+
+
+async def get_data_generation(db: AsyncSession) -> int:
+    """读取当前数据版本；表中还没有记录时返回 0。"""
+    generation = await db.scalar(
+        select(models.DataGeneration.generation).where(
+            models.DataGeneration.id == DATA_GENERATION_ROW_ID
+        )
+    )
+    return int(generation or 0)
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """表中的 timestamp 为 naive UTC；带时区的时间转换后再比较。"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@dataclass(frozen=True)
+class CacheScope:
+    """缓存条目依赖的数据：表名与 timestamp 范围（naive UTC，None 表示该侧无界）。"""
+
+    tables: Tuple[str, ...]
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    @classmethod
+    def of(cls, tables: Sequence[str], start: Optional[datetime] = None, end: Optional[datetime] = None):
+        return cls(tuple(tables), naive_utc(start), naive_utc(end))
+
+    def affected_by(self, change) -> bool:
+        """change 为 data_changes 的行（table_name / start_time / end_time）。"""
+        if change.table_name not in self.tables:
+            return False
+        if self.start is not None and change.end_time is not None and change.end_time < self.start:
+            return False
+        if self.end is not None and change.start_time is not None and change.start_time > self.end:
+            return False
+        return True
+
+
+async def load_changes(db: AsyncSession, after_generation: int, generation: int) -> Optional[List[Any]]:
+    """
+    版本 (after_generation, generation] 之间的全部变更事件；
+    其中有版本没有事件（已清理，或写入方没有发布事件）时返回 None，表示无法确定变化范围。
+    """
+    if not 0 < generation - after_generation <= MAX_CHANGE_REPLAY_GENERATIONS:
+        return None
+    rows = (await db.execute(
+        select(
+            models.DataChange.generation,
+            models.DataChange.table_name,
+            models.DataChange.start_time,
+            models.DataChange.end_time,
+        ).where(
+            models.DataChange.generation > after_generation,
+            models.DataChange.generation <= generation,
+        )
+    )).all()
+    if len({row.generation for row in rows}) != generation - after_generation:
+        return None
+    return rows
+
+
+def bump_data_generation(session: Session) -> None:
+    """
+    在当前事务中递增数据版本，需在脚本 commit 之前调用。
+
+    首次插入时以毫秒级时间戳作为初始值：pipeline --reset 删表重建后，
+    新的计数器也必然大于旧值，API 不会误用重置前缓存的结果。
+    """
+    initial = func.floor(func.extract("epoch", func.clock_timestamp()) * 1000).cast(
+        models.DataGeneration.generation.type
+    )
+    stmt = insert(models.DataGeneration).values(
+        id=DATA_GENERATION_ROW_ID, generation=initial, updated_at=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.DataGeneration.id],
+        set_={
+            "generation": models.DataGeneration.generation + 1,
+            "updated_at": func.now(),
+        },
+    )
+    session.execute(stmt)
+
+
+class ResponseCache:
+    """
+    进程内 LRU 响应缓存。
+
+    所有条目都隶属于同一个数据版本，缓存版本只前进不后退。sync 把缓存前进到新版本：按变更事件只淘汰依赖范围受影响的条目，
+    其余条目视为新版本的结果保留；没有事件可用时整体清空。get / set 携带更新的版本时同样整体清空；
+    携带更旧的版本（版本递增前开始的慢请求）时不读不写，不影响当前版本的条目。
+    条目数超过 max_entries 时淘汰最久未使用的条目。max_entries 为 0 时禁用缓存。
+    shared 为多 worker 共享的二级缓存（SharedFileCache），进程内未命中时由它保证每个条目只计算一次。
+    """
+
+    def __init__(self, max_entries: int = 256, shared=None):
+        self.max_entries = max(0, max_entries)
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0  # 按变更事件淘汰的条目数
+        self.cleared = 0  # 整体清空的次数
+        self._generation: Optional[int] = None
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._scopes: Dict[CacheKey, Optional[CacheScope]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync_generation(self, generation: int) -> bool:
+        """版本前进时清空并采用新版本；返回 False 表示 generation 比缓存版本旧，不应读写。"""
+        if self._generation is not None and generation < self._generation:
+            return False
+        if self._generation != generation:
+            self._clear_entries()
+            self._generation = generation
+        return True
+
+    def _clear_entries(self) -> None:
+        if self._entries:
+            self.cleared += 1
+        self._entries.clear()
+        self._scopes.clear()
+
+    def advance(self, previous: int, generation: int, changes: Optional[Sequence[Any]]) -> None:
+        """
+        从版本 previous 前进到 generation：changes 为两者之间的全部变更事件时只淘汰受影响的条目，
+        为 None 时整体清空。其他请求已经前进到 generation（或更新的版本）时不做任何事。
+        """
+        with self._lock:
+            if self._generation is not None and self._generation >= generation:
+                return
+            if self._generation != previous or changes is None:
+                self._clear_entries()
+            else:
+                stale = [
+                    key for key, scope in self._scopes.items()
+                    if scope is None or any(scope.affected_by(change) for change in changes)
+                ]
+                for key in stale:
+                    del self._entries[key]
+                    del self._scopes[key]
+                self.invalidated += len(stale)
+            self._generation = generation
+
+    async def sync(self, db: AsyncSession, generation: int) -> None:
+        """请求读取到数据版本后调用：版本前进时读取变更事件并前进缓存。"""
+        previous = self._generation
+        if previous is None or previous >= generation or not self._entries:
+            return
+        self.advance(previous, generation, await load_changes(db, previous, generation))
+
+    def get(self, generation: int, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key) if self._sync_generation(generation) else None
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, generation: int, key: CacheKey, value: Any, scope: Optional[CacheScope] = None) -> None:
+        """scope 为条目依赖的数据范围；为 None 时任何变化都会使其失效。"""
+        if not self.max_entries:
+            return
+        with self._lock:
+            if not self._sync_generation(generation):
+                return
+            self._entries[key] = value
+            self._scopes[key] = scope
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                del self._scopes[evicted]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._generation = None
+
+    async def get_or_compute(
+        self,
+        db: AsyncSession,
+        endpoint: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        scope: Optional[CacheScope] = None,
+    ) -> Any:
+        """
+        先读取数据版本再查缓存；未命中时调用 compute 计算并写入缓存。
+
+        版本号在计算之前读取，因此缓存中的结果至少与该版本一样新。
+        """
+        generation = await get_data_generation(db)
+        await self.sync(db, generation)
+        return await self.lookup(generation, make_cache_key(endpoint, params), compute, scope=scope)
+
+    async def lookup(
+        self,
+        generation: int,
+        key: CacheKey,
+        compute: Callable[[], Awaitable[bytes]],
+        wrap: Callable[[bytes], Any] = lambda body: body,
+        scope: Optional[CacheScope] = None,
+    ) -> Any:
+        """
+        按已知的数据版本查找（调用方应先 sync）：先查进程内缓存，再查共享缓存，都未命中时调用 compute。
+        共享缓存只保存 compute 返回的 bytes，wrap 将其转换为进程内缓存的条目（如 EncodedBody）。
+        """
+        value = self.get(generation, key)
+        if value is None:
+            if self.shared is not None:
+                body = await self.shared.get_or_compute(generation, key, compute)
+            else:
+                body = await compute()
+            value = wrap(body)
+            self.set(generation, key, value, scope)
+        return value
@@ -0,0 +1,209 @@
+"""
+数据变更事件：写入数据的脚本在提交的同一事务内发布"哪张表的哪段时间变了"。
+
+- outbox：事件写入 data_changes 表，与数据一起提交或回滚，不会出现数据已提交而事件丢失的情况。
+  每个事件带有该事务递增后的数据版本（data_generation）。版本号连续的一串事件就是两个版本之间完整的变化记录；
+- NOTIFY：同一事务向 data_changes 频道发送通知（提交时才送达，只含版本与表名）。
+  `pipeline --watch` 在主库上 LISTEN，原始表有变化时立即增量重算，不再按固定周期运行；
+- 事件 id 的顺序：BIGSERIAL 在插入时分配、提交在后，并发的写入方可能先提交较大的 id。
+  因此发布事件的事务在分配 id 之前取得 outbox 咨询锁（持有到提交或回滚），读取处理位置时也在该锁下读取：
+  读到的最大 id 之前不会再有事件提交；
+- 清理：按 id 截断过期事件并记录清理位置（data_generation.pruned_change_id）。回滚的事务同样会留下 id 空洞，
+  只有处理位置落后于清理位置才说明事件已丢失；
+- 消费方：
+  - 流水线按事件 id 记录已处理位置，只重算事件覆盖的时间范围（app/scripts/pipeline.py）；
+  - API 响应缓存只淘汰与变化范围重叠的条目（app/cache.py）。API 可能连接只读副本，
+    NOTIFY 不会复制到副本，因此 API 不监听，而是在数据版本变化时读取 data_changes。
+"""
+from __future__ import annotations
+
+import json
+import os
+import select as io_select
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import DATA_GENERATION_ROW_ID, bump_data_generation, naive_utc
+
+CHANGES_CHANNEL = "data_changes"
+# 事件保留时长；消费方落后超过该时长时（事件已清理）退回全量 / 整体失效
+DATA_CHANGE_RETENTION_HOURS = float(os.getenv("DATA_CHANGE_RETENTION_HOURS", "168"))
+
+RAW_TABLES = ("uniswap_swaps", "binance_trades")
+# outbox 咨询锁的键（"data" 的 ASCII）
+CHANGES_LOCK_ID = 0x64617461
+
+
+@dataclass(frozen=True)
+class ChangeRange:
+    """一张表在 [start, end]（timestamp 列，naive UTC）内的行被插入、修改或删除；None 表示该侧无界。"""
+
+    table: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    rows: Optional[int] = None
+
+    @classmethod
+    def covering(cls, table: str, timestamps: Sequence[datetime]) -> "ChangeRange":
+        """覆盖一批新写入行的范围。"""
+        values = [naive_utc(value) for value in timestamps]
+        return cls(table, min(values), max(values), len(values))
+
+
+def publish_changes(session: Session, changes: Sequence[ChangeRange]) -> int:
+    """
+    在当前事务中递增数据版本、记录变更事件并发送通知，需在 commit 之前调用（代替单独调用 bump_data_generation）。
+    返回新的数据版本。
+    """
+    # 持有到事务结束：发布方依次分配 id 并提交，见模块说明
+    session.execute(select(func.pg_advisory_xact_lock(CHANGES_LOCK_ID)))
+    bump_data_generation(session)
+    generation = session.execute(
+        select(models.DataGeneration.generation).where(models.DataGeneration.id == DATA_GENERATION_ROW_ID)
+    ).scalar_one()
+    for change in changes:
+        session.add(models.DataChange(
+            generation=generation,
+            table_name=change.table,
+            start_time=naive_utc(change.start),
+            end_time=naive_utc(change.end),
+            rows=change.rows,
+        ))
+    session.flush()
+    payload = {"generation": generation, "tables": sorted({change.table for change in changes})}
+    session.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps(payload))))
+    return generation
+
+
+def latest_change_id(session: Session) -> int:
+    """
+    已提交事件的最大 id，作为消费方的处理位置。在 outbox 锁（共享模式）下读取，等待发布中的事务结束，
+    之后提交的事件 id 一定更大；锁在读取后立即释放，不会在调用方的整个事务内阻塞发布方。
+    """
+    session.execute(select(func.pg_advisory_lock_shared(CHANGES_LOCK_ID)))
+    try:
+        return session.query(func.coalesce(func.max(models.DataChange.id), 0)).scalar()
+    finally:
+        session.execute(select(func.pg_advisory_unlock_shared(CHANGES_LOCK_ID)))
+
+
+def pruned_change_id(session: Session) -> int:
+    """已清理的位置：id 不超过它的事件可能已被删除。"""
+    value = session.query(models.DataGeneration.pruned_change_id).filter(
+        models.DataGeneration.id == DATA_GENERATION_ROW_ID
+    ).scalar()
+    return value or 0
+
+
+def current_generation(conn) -> int:
+    """当前数据版本（conn 为 Connection 或 Session）；还没有记录时返回 0。"""
+    generation = conn.execute(
+        select(models.DataGeneration.generation).where(models.DataGeneration.id == DATA_GENERATION_ROW_ID)
+    ).scalar()
+    return int(generation or 0)
+
+
+def changes_between_generations(
+    conn, after_generation: int, generation: int, tables: Sequence[str]
+) -> Optional[List[ChangeRange]]:
+    """
+    数据版本 (after_generation, generation] 之间涉及 tables 的事件（conn 为 Connection 或 Session）。
+    与 app/cache.py 的 load_changes 相同，其中有版本没有事件（已清理、写入方没有发布事件、
+    表被删除重建后版本重新起算）时返回 None，表示无法确定变化范围。
+    """
+    if generation == after_generation:
+        return []
+    if generation < after_generation:
+        return None
+    rows = conn.execute(
+        select(
+            models.DataChange.generation,
+            models.DataChange.table_name,
+            models.DataChange.start_time,
+            models.DataChange.end_time,
+            models.DataChange.rows,
+        )
+        .where(models.DataChange.generation > after_generation, models.DataChange.generation <= generation)
+        .order_by(models.DataChange.id)
+    ).all()
+    if len({row.generation for row in rows}) != generation - after_generation:
+        return None
+    return [
+        ChangeRange(row.table_name, row.start_time, row.end_time, row.rows)
+        for row in rows
+        if row.table_name in tables
+    ]
+
+
+def changes_after(
+    session: Session, after_id: int, tables: Sequence[str], until_id: Optional[int] = None
+) -> Optional[List[ChangeRange]]:
+    """
+    id 在 (after_id, until_id] 内、涉及 tables 的事件。
+    after_id 之后的事件已被清理（消费方落后于清理位置）时返回 None，调用方应退回全量处理；
+    id 的空洞（回滚的事务）不影响判断。
+    """
+    if after_id < pruned_change_id(session):
+        return None
+    query = session.query(models.DataChange).filter(
+        models.DataChange.id > after_id, models.DataChange.table_name.in_(tables)
+    )
+    if until_id is not None:
+        query = query.filter(models.DataChange.id <= until_id)
+    return [
+        ChangeRange(row.table_name, row.start_time, row.end_time, row.rows)
+        for row in query.order_by(models.DataChange.id)
+    ]
+
+
+def prune_changes(session: Session, retention_hours: float = DATA_CHANGE_RETENTION_HOURS) -> int:
+    """
+    删除超过保留时长的事件并推进清理位置，返回删除的行数（调用方提交）。
+    按 id 截断（删除不超过最后一个过期事件 id 的全部事件），清理位置之前不会留下零散的事件。
+    """
+    horizon = session.query(func.max(models.DataChange.id)).filter(
+        models.DataChange.created_at < func.now() - timedelta(hours=retention_hours)
+    ).scalar()
+    if horizon is None:
+        return 0
+    session.execute(
+        update(models.DataGeneration)
+        .where(models.DataGeneration.id == DATA_GENERATION_ROW_ID)
+        .values(pruned_change_id=func.greatest(models.DataGeneration.pruned_change_id, horizon))
+    )
+    return (
+        session.query(models.DataChange)
+        .filter(models.DataChange.id <= horizon)
+        .delete(synchronize_session=False)
+    )
+
+
+def listen(engine: Engine, timeout: float) -> Iterator[List[dict]]:
+    """
+    在主库上 LISTEN 变更通知。每次收到通知或等待超时时产出一批通知内容（超时为空列表）。
+    使用独立的连接（从连接池分离），生成器关闭时断开。
+    """
+    connection = engine.raw_connection()
+    connection.detach()
+    try:
+        dbapi = connection.dbapi_connection
+        dbapi.rollback()
+        dbapi.autocommit = True
+        with dbapi.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANGES_CHANNEL}")
+        while True:
+            readable, _, _ = io_select.select([dbapi], [], [], timeout)
+            notifications = []
+            if readable:
+                dbapi.poll()
+                while dbapi.notifies:
+                    notifications.append(json.loads(dbapi.notifies.pop(0).payload))
+            yield notifications
+    finally:
+        connection.close()
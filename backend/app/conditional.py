@@ -0,0 +1,129 @@
+"""
+条件请求（ETag / If-None-Match）与响应压缩。
+
+ETag 由数据版本（data_generation）和规范化后的请求参数计算：同一版本、同一参数的响应体必然相同，
+因此无需先计算响应体就能判断客户端缓存是否仍然有效，命中时直接返回 304。
+
+超过阈值的响应体按客户端的 Accept-Encoding 压缩（优先 brotli，其次 gzip）。
+压缩结果与原始 bytes 一起保存在响应缓存条目中，同一条目只压缩一次。
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+from typing import Dict, Optional, Sequence
+
+from fastapi import Request, Response
+
+from .cache import CacheKey
+
+try:  # brotli 为可选依赖，未安装时只提供 gzip
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩算法；客户端不支持时返回 None。"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            field, _, value = param.strip().partition("=")
+            if field.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def make_etag(generation: int, key: CacheKey, encoding: Optional[str] = None) -> str:
+    """强 ETag：数据版本 + 参数摘要；压缩后的表示带编码后缀，与未压缩的表示区分。"""
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    suffix = f"-{encoding}" if encoding else ""
+    return f'"{generation:x}-{digest}{suffix}"'
+
+
+def matching_etag(if_none_match: str, etags: Sequence[str]) -> Optional[str]:
+    """If-None-Match 使用弱比较（忽略 W/ 前缀，支持多个值和 *），返回命中的 ETag。"""
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    if "*" in candidates:
+        return etags[0]
+    candidates = {tag[2:] if tag.startswith("W/") else tag for tag in candidates}
+    for etag in etags:
+        if etag in candidates:
+            return etag
+    return None
+
+
+class EncodedBody:
+    """缓存条目：原始 JSON bytes 及按需生成的压缩版本。"""
+
+    __slots__ = ("identity", "_variants")
+
+    def __init__(self, identity: bytes):
+        self.identity = identity
+        self._variants: Dict[str, bytes] = {}
+
+    def compressible(self) -> bool:
+        return len(self.identity) >= RESPONSE_COMPRESSION_MIN_BYTES
+
+    def variant(self, encoding: str) -> bytes:
+        body = self._variants.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.identity, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.identity, compresslevel=GZIP_LEVEL, mtime=0)
+            self._variants[encoding] = body
+        return body
+
+
+def _cache_headers(etag: str) -> Dict[str, str]:
+    # no-cache：浏览器可以保存响应，但每次使用前都要携带 If-None-Match 重新验证
+    return {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+
+def not_modified_response(request: Request, generation: int, key: CacheKey) -> Optional[Response]:
+    """客户端持有的 ETag 仍然有效时返回 304，否则返回 None。"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    # 响应体过小而未压缩时，客户端持有的是无后缀的 ETag
+    etag = matching_etag(
+        if_none_match, (make_etag(generation, key, encoding), make_etag(generation, key))
+    )
+    if etag is None:
+        return None
+    return Response(status_code=304, headers=_cache_headers(etag))
+
+
+def encoded_json_response(
+    request: Request, generation: int, key: CacheKey, body: EncodedBody
+) -> Response:
+    """按 Accept-Encoding 返回（可能压缩的）JSON 响应，并附带 ETag。"""
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if body.compressible() else None
+    headers = _cache_headers(make_etag(generation, key, encoding))
+    if encoding is None:
+        content = body.identity
+    else:
+        content = body.variant(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -1,5 +1,9 @@
 import os
+import shlex
+import ssl
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -7,16 +11,160 @@ from dotenv import load_dotenv
 # 从 .env 文件加载环境变量
 load_dotenv()
 
+# 主库（写入端）：采集 / 计算脚本的删除与批量写入只走这里
 DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise ValueError("DATABASE_URL 环境变量未设置")
+# 读端：API 只读查询使用，可指向流复制的只读副本；未设置时与主库相同
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+# --- 写引擎（同步，供脚本使用） ---
+# 批处理是少量长连接，连接池很小；语句超时默认不限制（全量重算的 DELETE / 批量写入可能运行很久）
+WRITE_DB_POOL_SIZE = _env_int("WRITE_DB_POOL_SIZE", 5)
+WRITE_DB_MAX_OVERFLOW = _env_int("WRITE_DB_MAX_OVERFLOW", 5)
+WRITE_DB_POOL_TIMEOUT = float(os.getenv("WRITE_DB_POOL_TIMEOUT", "30"))
+WRITE_DB_STATEMENT_TIMEOUT_MS = _env_int("WRITE_DB_STATEMENT_TIMEOUT_MS", 0)  # 0 表示不限制
+WRITE_DB_LOCK_TIMEOUT_MS = _env_int("WRITE_DB_LOCK_TIMEOUT_MS", 0)  # 等待锁的最长时间，0 表示不限制
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=WRITE_DB_POOL_SIZE,
+    max_overflow=WRITE_DB_MAX_OVERFLOW,
+    pool_timeout=WRITE_DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={
+        "application_name": "arbitrage-batch",
+        "options": f"-c statement_timeout={WRITE_DB_STATEMENT_TIMEOUT_MS} -c lock_timeout={WRITE_DB_LOCK_TIMEOUT_MS}",
+    },
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- 读引擎（异步，API 读接口使用 asyncpg） ---
+
+# asyncpg.connect 直接接受的查询参数（以及 SQLAlchemy asyncpg 方言自己的参数），原样保留
+_ASYNCPG_QUERY_PARAMS = {
+    "prepared_statement_cache_size", "statement_cache_size", "max_cached_statement_lifetime",
+    "max_cacheable_statement_size", "command_timeout", "target_session_attrs", "krbsrvname", "gsslib",
+    "passfile", "service", "servicefile", "direct_tls", "host", "port",
+}
+_SSL_FILE_PARAMS = ("sslrootcert", "sslcert", "sslkey")
+
+
+def _ssl_argument(mode, files):
+    """libpq 的 sslmode / 证书参数 -> asyncpg 的 ssl 参数（sslmode 字符串或 SSLContext）。"""
+    if not any(files.values()):
+        return mode
+    if mode in (None, "disable", "allow", "prefer"):
+        mode = "require"
+    context = ssl.create_default_context(cafile=files["sslrootcert"])
+    context.check_hostname = mode == "verify-full"
+    if mode not in ("verify-ca", "verify-full"):
+        context.verify_mode = ssl.CERT_NONE
+    if files["sslcert"]:
+        context.load_cert_chain(files["sslcert"], files["sslkey"])
+    return context
+
+
+def _parse_options(value: str) -> dict:
+    """libpq 的 options（"-c name=value ..."）-> asyncpg 的 server_settings。"""
+    settings = {}
+    tokens = shlex.split(value)
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token == "-c" and index + 1 < len(tokens):
+            index += 1
+            token = tokens[index]
+        elif token.startswith("-c"):
+            token = token[2:]
+        elif token.startswith("--"):
+            token = token[2:]
+        else:
+            token = ""
+        name, sep, setting = token.partition("=")
+        if not name or not sep:
+            raise ValueError(f"无法转换连接串中的 options={value!r}：只支持 -c name=value 形式")
+        settings[name.replace("-", "_")] = setting
+        index += 1
+    return settings
+
+
+def _asyncpg_url(url):
+    """
+    把 libpq 风格的连接串转换为 asyncpg 可用的形式，返回 (url, connect_args)。
+    asyncpg 会拒绝 libpq 专有的查询参数：sslmode / sslrootcert / sslcert / sslkey 转换为 ssl，
+    connect_timeout 转换为 timeout，options（-c name=value）与 application_name 转换为 server_settings；
+    其余无法转换的参数在启动时报错，而不是等到第一次连接才失败。
+    """
+    url = make_url(url)
+    if url.drivername in ("postgresql", "postgres", "postgresql+psycopg2", "postgresql+psycopg"):
+        url = url.set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    connect_args = {}
+    server_settings = {}
+    ssl_argument = _ssl_argument(
+        query.pop("sslmode", None), {name: query.pop(name, None) for name in _SSL_FILE_PARAMS}
+    )
+    if ssl_argument is not None:
+        connect_args["ssl"] = ssl_argument
+    if "connect_timeout" in query:
+        connect_args["timeout"] = float(query.pop("connect_timeout"))
+    if "options" in query:
+        server_settings.update(_parse_options(query.pop("options")))
+    if "application_name" in query:
+        server_settings["application_name"] = query.pop("application_name")
+    unsupported = sorted(name for name in query if name not in _ASYNCPG_QUERY_PARAMS)
+    if unsupported:
+        raise ValueError(
+            f"异步连接串包含 asyncpg 不支持的参数: {', '.join(unsupported)}；"
+            "请通过 ASYNC_DATABASE_URL 指定不含这些参数的连接串"
+        )
+    if server_settings:
+        connect_args["server_settings"] = server_settings
+    return url.set(query=query), connect_args
+
+
+# 默认由 READ_DATABASE_URL 推导（postgresql:// -> postgresql+asyncpg://），也可通过 ASYNC_DATABASE_URL 单独指定
+ASYNC_DATABASE_URL, _ASYNC_CONNECT_ARGS = _asyncpg_url(os.getenv("ASYNC_DATABASE_URL") or READ_DATABASE_URL)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 20)  # 常驻连接数
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)  # 高峰期允许额外创建的连接数
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # 等待空闲连接的最长秒数
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 15000)  # 单条语句超时（毫秒）
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={
+        **_ASYNC_CONNECT_ARGS,
+        "server_settings": {
+            **_ASYNC_CONNECT_ARGS.get("server_settings", {}),
+            "statement_timeout": str(DB_STATEMENT_TIMEOUT_MS),
+            "application_name": "arbitrage-api",
+            # API 只读：即使误写也会在数据库端被拒绝（只读副本上本来就是只读）
+            "default_transaction_read_only": "on",
+        },
+    },
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 # 依赖项：获取数据库会话
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 依赖项：获取异步数据库会话
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,158 @@
+"""
+图表序列的服务端降采样。
+
+先在 SQL 中把时间范围等分为 `points * SERIES_OVERSAMPLE` 个细分桶，每桶只返回一行
+（平均时间 / 平均价格，以及最低价、最高价和它们出现的时间），传输量与原始行数无关；
+再在 Python 中把细分桶序列降到目标点数：
+- `lttb`：Largest-Triangle-Three-Buckets，保留视觉形状；
+- `minmax`：每个输出桶保留最低点和最高点（按时间顺序），尖峰不会被平均掉。
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import Float, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import array
+
+SERIES_OVERSAMPLE = 4  # 每个输出点对应的细分桶数
+SERIES_METHODS = ("lttb", "minmax")
+
+Point = Tuple[float, float]  # (epoch 秒, 值)
+
+
+class FineBucket:
+    """一个细分桶的聚合结果。"""
+
+    __slots__ = ("index", "avg_t", "avg", "min_t", "min", "max_t", "max")
+
+    def __init__(self, row):
+        self.index = int(row.bucket)
+        self.avg_t = float(row.avg_t)
+        self.avg = float(row.avg_price)
+        # min / max 聚合的是 ARRAY[price, epoch]：数组按字典序比较，第二个元素即极值出现的时间
+        self.min, self.min_t = (float(value) for value in row.min_point)
+        self.max, self.max_t = (float(value) for value in row.max_point)
+
+
+def fine_bucket_statement(model, start_dt: datetime, end_dt: datetime, bucket_count: int):
+    """
+    按等宽时间桶聚合 price（start_dt / end_dt 为 naive UTC）。
+    只使用 timestamp 范围条件，可以走 timestamp 索引；落在 end_dt 上的行归入最后一个桶。
+    """
+    start_epoch = start_dt.replace(tzinfo=timezone.utc).timestamp()
+    width = max((end_dt - start_dt).total_seconds() / bucket_count, 1e-6)
+    epoch = cast(func.extract("epoch", model.timestamp), Float)
+    price = cast(model.price, Float)
+    bucket = func.least(
+        func.floor((epoch - literal(start_epoch)) / literal(width)), bucket_count - 1
+    ).label("bucket")
+    return (
+        select(
+            bucket,
+            func.avg(epoch).label("avg_t"),
+            func.avg(price).label("avg_price"),
+            func.min(array([price, epoch])).label("min_point"),
+            func.max(array([price, epoch])).label("max_point"),
+        )
+        .where(model.timestamp >= start_dt, model.timestamp <= end_dt, model.price.isnot(None))
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Largest-Triangle-Three-Buckets：保留首尾点，中间每个桶选与前一选中点、下一桶均值构成最大三角形的点。
+    返回的点数不超过 threshold；threshold 小于 3 时没有中间桶，只保留首尾点（为 1 时只保留首点）。
+    """
+    count = len(points)
+    if threshold >= count:
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]][:max(threshold, 0)]
+
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    previous = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # 下一个桶的平均点（最后一个桶使用末点）
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, count)
+        if next_start >= next_end:
+            avg_x, avg_y = points[-1]
+        else:
+            span = next_end - next_start
+            avg_x = sum(p[0] for p in points[next_start:next_end]) / span
+            avg_y = sum(p[1] for p in points[next_start:next_end]) / span
+
+        ax, ay = points[previous]
+        best_area = -1.0
+        best = start
+        for j in range(start, min(end, count - 1)):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points: Sequence[Tuple[float, float, float, float]], bucket_count: int) -> List[Point]:
+    """
+    将 (min_t, min, max_t, max) 序列合并为 bucket_count 个桶，每桶按时间顺序输出最低点和最高点。
+    输出点数不超过 2 * bucket_count。
+    """
+    count = len(points)
+    if not count:
+        return []
+    bucket_count = max(1, min(bucket_count, count))
+    result: List[Point] = []
+    for i in range(bucket_count):
+        chunk = points[i * count // bucket_count:(i + 1) * count // bucket_count]
+        low = min(chunk, key=lambda p: p[1])
+        high = max(chunk, key=lambda p: p[3])
+        extremes = sorted({(low[0], low[1]), (high[2], high[3])})
+        result.extend(extremes)
+    return result
+
+
+def downsample_buckets(buckets: Sequence[FineBucket], points: int, method: str) -> List[Point]:
+    """将一个交易所的细分桶序列降到目标点数。"""
+    if method == "minmax":
+        return minmax([(b.min_t, b.min, b.max_t, b.max) for b in buckets], points // 2)
+    return lttb([(b.avg_t, b.avg) for b in buckets], points)
+
+
+def spread_series(
+    uniswap: Sequence[FineBucket], binance: Sequence[FineBucket], points: int, method: str
+) -> List[Point]:
+    """
+    Uniswap 相对 Binance 的价差（百分比，带符号，分母为两者均价，与 price_diff_percent 一致）。
+    只在两个交易所都有成交的细分桶上计算，时间取两者平均时间的均值。
+    """
+    binance_by_index: Dict[int, FineBucket] = {b.index: b for b in binance}
+    spread: List[Point] = []
+    for u in uniswap:
+        b = binance_by_index.get(u.index)
+        if b is None:
+            continue
+        mid = (u.avg + b.avg) / 2
+        if not mid:
+            continue
+        spread.append(((u.avg_t + b.avg_t) / 2, (u.avg - b.avg) / mid * 100))
+    if method == "minmax":
+        return minmax([(t, v, t, v) for t, v in spread], points // 2)
+    return lttb(spread, points)
+
+
+def to_records(points: Sequence[Point], value_name: str) -> List[dict]:
+    return [
+        {"timestamp": datetime.fromtimestamp(t, timezone.utc), value_name: value}
+        for t, value in points
+    ]
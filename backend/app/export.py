@@ -0,0 +1,156 @@
+"""
+列式批量导出（Arrow IPC 流 / Parquet）。
+
+按时间范围从服务端游标逐批读取整张表的行，每批转换为一个 Arrow RecordBatch 后立即写出，
+内存占用只与批大小有关。列类型由 SQLAlchemy 模型推导：时间列为 UTC 的 timestamp[us]，
+Numeric(p, 0) 与紧凑存储的大整数（sqrt_price_x96、liquidity，见 app/types.py）为 decimal256(p, 0)，不丢失精度；
+gas 列改为 bigint 存储后仍按原来的 decimal256(40, 0) 导出（列的 info["export_precision"]），导出 schema 不变。
+"""
+from __future__ import annotations
+
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, DateTime, Float, Integer, Numeric, String, select
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .database import AsyncSessionLocal
+from .types import HexBinary, UnsignedBinary
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+EXPORT_TABLES = {
+    model.__tablename__: model
+    for model in (
+        models.UniswapSwap,
+        models.BinanceTrade,
+        models.ArbitrageOpportunity,
+        models.ArbitrageOpportunityMinute,
+    )
+}
+
+# format -> (media type, 文件扩展名)
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if "export_precision" in column.info:
+        return pa.decimal256(column.info["export_precision"], 0)
+    if isinstance(column_type, UnsignedBinary):
+        return pa.decimal256(column_type.precision, 0)
+    if isinstance(column_type, HexBinary):
+        return pa.string()
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, Integer):
+        return pa.int32()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal256(column_type.precision, column_type.scale or 0)
+    if isinstance(column_type, DateTime):
+        # 表中按 UTC 存储 naive 时间
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column_type, String):
+        return pa.string()
+    raise TypeError(f"unsupported column type for export: {column.name} {column_type}")
+
+
+def arrow_schema(model) -> pa.Schema:
+    """由模型的列推导 Arrow schema（列顺序与表定义一致）。"""
+    return pa.schema([pa.field(column.name, _arrow_type(column)) for column in model.__table__.columns])
+
+
+def export_statement(model, start_dt: Optional[datetime], end_dt: Optional[datetime]):
+    """按时间范围选取整张表的所有列（start_dt / end_dt 为 naive UTC）。"""
+    stmt = select(*model.__table__.columns)
+    if start_dt is not None:
+        stmt = stmt.where(model.timestamp >= start_dt)
+    if end_dt is not None:
+        stmt = stmt.where(model.timestamp <= end_dt)
+    return stmt.order_by(model.timestamp)
+
+
+class _Drain(io.RawIOBase):
+    """只写缓冲区：写入器写出的字节在每批之后取走，不在内存中累积。"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _open_writer(fmt: str, sink: _Drain, schema: pa.Schema):
+    if fmt == "parquet":
+        # 每个 RecordBatch 写为一个 row group
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_stream(sink, schema)
+
+
+def _batch_encoder(schema: pa.Schema) -> Callable:
+    def encode(rows) -> pa.RecordBatch:
+        columns = list(zip(*rows))
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+    return encode
+
+
+async def stream_export(model, stmt, fmt: str) -> AsyncIterator[bytes]:
+    """
+    通过服务端游标逐批读取并输出 Arrow IPC 流或 Parquet 文件。
+
+    行到列的转换与编码在线程池中执行，不阻塞事件循环；
+    使用独立会话，原因同 NDJSON 流式输出（依赖注入的会话在响应发送前就会关闭）。
+    """
+    schema = arrow_schema(model)
+    encode = _batch_encoder(schema)
+    sink = _Drain()
+    writer = _open_writer(fmt, sink, schema)
+
+    def write(rows) -> bytes:
+        writer.write_batch(encode(rows))
+        return sink.take()
+
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+            async for rows in result.partitions():
+                chunk = await run_in_threadpool(write, rows)
+                if chunk:
+                    yield chunk
+    finally:
+        writer.close()
+    # 写出流结束标记 / Parquet 文件尾
+    yield sink.take()
+
+
+def export_filename(table: str, fmt: str, start_dt: Optional[datetime], end_dt: Optional[datetime]) -> str:
+    parts: Dict[str, str] = {}
+    if start_dt is not None:
+        parts["from"] = start_dt.strftime("%Y%m%dT%H%M%S")
+    if end_dt is not None:
+        parts["to"] = end_dt.strftime("%Y%m%dT%H%M%S")
+    suffix = "".join(f"_{name}{value}" for name, value in parts.items())
+    return f"{table}{suffix}.{EXPORT_FORMATS[fmt][1]}"
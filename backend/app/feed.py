@@ -0,0 +1,236 @@
+"""
+实时推送（Server-Sent Events）。
+
+采集 / 计算脚本每次提交都会递增 data_generation；进程内的 GenerationWatcher 以固定间隔读取该单行表，
+版本变化时唤醒所有订阅者。每个订阅者按自己的游标（已处理到的数据版本，以及各频道最后一个已发送的 id）
+查询 id 更大的新行，因此断线重连时只需带上最后收到的事件 id（EventSource 自动发送 Last-Event-ID）即可从断点继续。
+
+新行只能说明有数据追加；重新计算会删除并替换一段时间内的行，这从 id 上看不出来。因此每次数据版本变化时
+先读取两个版本之间的变更事件（data_changes，见 app/changes.py），对被替换的范围发送 replace 事件，
+再推送替换后的新行；无法确定变化范围（事件已清理、版本跨度过大、表被删除重建）时发送 reset。
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import get_data_generation, load_changes
+from .database import AsyncSessionLocal
+from .serialization import dumps, rows_to_records
+
+FEED_POLL_INTERVAL = float(os.getenv("FEED_POLL_INTERVAL", "0.5"))  # 秒
+FEED_HEARTBEAT_SECONDS = 15.0  # 没有新数据时发送注释行，防止代理断开空闲连接
+FEED_BATCH_SIZE = 1000  # 每个事件最多包含的行数
+FEED_RETRY_MS = 3000  # 建议客户端的重连间隔
+GENERATION_KEY = "generation"  # 游标中记录已处理到的数据版本的键
+
+
+@dataclass(frozen=True)
+class FeedChannel:
+    """
+    一个推送频道：按自增 id 追踪新行的表及其输出列。
+    replaces 为 True 表示该表按时间范围重新计算（每个变更事件都意味着范围内的旧行被替换）；
+    否则该表只追加，只有下界无界的事件（重置、分离分区）才删除已推送的行。
+    """
+
+    id_column: object
+    columns: Sequence
+    replaces: bool = False
+
+    @property
+    def table(self) -> str:
+        return self.id_column.class_.__tablename__
+
+
+class GenerationWatcher:
+    """
+    轮询数据版本并唤醒等待者。整个进程只有一个轮询任务，与订阅者数量无关；
+    有订阅者时运行，最后一个订阅者断开（或应用关闭）时停止，没有 SSE 连接的 worker 不占用数据库连接。
+    """
+
+    def __init__(self, interval: float = FEED_POLL_INTERVAL):
+        self.interval = interval
+        self.subscribers = 0
+        self._generation: Optional[int] = None
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> None:
+        self.subscribers += 1
+
+    def unsubscribe(self) -> None:
+        """订阅者断开；没有订阅者时取消轮询任务（下一个订阅者到来时重新启动）。"""
+        self.subscribers = max(0, self.subscribers - 1)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def current_event(self) -> asyncio.Event:
+        """
+        返回下一次版本变化时会被触发的事件。
+        需在查询新行之前获取，避免查询与等待之间发生的变化被错过。
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._event
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """等待版本变化；超时返回 False。"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with AsyncSessionLocal() as session:
+                    generation = await get_data_generation(session)
+            except Exception:
+                # 数据库暂时不可用：保持当前版本，下个周期重试
+                generation = self._generation
+            if generation != self._generation:
+                self._generation = generation
+                event, self._event = self._event, asyncio.Event()
+                event.set()
+            await asyncio.sleep(self.interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def parse_cursor(value: Optional[str], channels: Dict[str, FeedChannel]) -> Dict[str, int]:
+    """解析事件 id（"generation:版本,频道:id,频道:id"）；未知频道被忽略，格式错误返回 400。"""
+    cursor: Dict[str, int] = {}
+    if not value:
+        return cursor
+    try:
+        for part in value.split(","):
+            name, _, last_id = part.partition(":")
+            if name in channels or name == GENERATION_KEY:
+                cursor[name] = int(last_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"invalid last event id: {value}")
+    return cursor
+
+
+def format_cursor(cursor: Dict[str, int]) -> str:
+    return ",".join(f"{name}:{last_id}" for name, last_id in cursor.items())
+
+
+def format_event(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    """编码一条 SSE 事件（data 为单行 JSON）。"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode() + data + b"\n\n"
+
+
+async def _max_id(session: AsyncSession, channel: FeedChannel) -> int:
+    return int(await session.scalar(select(func.max(channel.id_column))) or 0)
+
+
+async def _replacements(
+    session: AsyncSession, channels: Dict[str, FeedChannel], cursor: Dict[str, int], generation: int
+) -> List[bytes]:
+    """
+    游标版本之后被删除或替换的行：返回 replace 事件（每个频道合并为一个范围，None 表示该侧无界），
+    无法确定范围时返回 reset 事件并把频道游标移到当前末尾。cursor 的数据版本随之更新为 generation。
+    """
+    after = cursor.get(GENERATION_KEY)
+    changes = None if after is None else await load_changes(session, after, generation)
+    cursor[GENERATION_KEY] = generation
+    if changes is None:
+        for name, channel in channels.items():
+            cursor[name] = await _max_id(session, channel)
+        return [format_event("reset", dumps({"channel": name}), format_cursor(cursor)) for name in channels]
+
+    ranges: Dict[str, Tuple[Optional[datetime], Optional[datetime]]] = {}
+    for change in changes:
+        for name, channel in channels.items():
+            if change.table_name != channel.table or not (channel.replaces or change.start_time is None):
+                continue
+            if name not in ranges:
+                ranges[name] = (change.start_time, change.end_time)
+                continue
+            start, end = ranges[name]
+            ranges[name] = (
+                None if start is None or change.start_time is None else min(start, change.start_time),
+                None if end is None or change.end_time is None else max(end, change.end_time),
+            )
+    return [
+        format_event("replace", dumps({"channel": name, "start": start, "end": end}), format_cursor(cursor))
+        for name, (start, end) in ranges.items()
+    ]
+
+
+async def stream_events(
+    request: Request,
+    watcher: GenerationWatcher,
+    channels: Dict[str, FeedChannel],
+    cursor: Dict[str, int],
+) -> AsyncIterator[bytes]:
+    """
+    订阅者的事件流：先发送 ready 事件（当前游标），补发游标之后的变化，之后每次数据版本变化时推送。
+
+    每次先按变更事件发送 replace / reset，再推送 id 大于游标的新行（包括替换后的行），客户端按顺序应用即可。
+    同一轮的版本、事件与新行在同一个快照中读取，新行不会先于描述它的 replace 事件送达。
+    每个事件携带完整游标作为 SSE id；游标中没有数据版本（旧客户端）时无法补发期间的替换，发送 reset。
+    """
+    yield f"retry: {FEED_RETRY_MS}\n\n".encode()
+
+    async with AsyncSessionLocal() as session:
+        if not cursor:
+            # 新连接只推送连接之后提交的变化
+            cursor[GENERATION_KEY] = await get_data_generation(session)
+        for name, channel in channels.items():
+            if name not in cursor:
+                cursor[name] = await _max_id(session, channel)
+    # 立即给出起始游标，客户端即使还没收到任何数据也能断点续传
+    yield format_event("ready", dumps(cursor), format_cursor(cursor))
+
+    watcher.subscribe()
+    try:
+        while not await request.is_disconnected():
+            changed = watcher.current_event()
+            caught_up = True
+            events = []
+            # 先查询完再发送，发送期间（受客户端速度影响）不占用数据库连接
+            async with AsyncSessionLocal() as session:
+                await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                generation = await get_data_generation(session)
+                if cursor.get(GENERATION_KEY) != generation:
+                    events.extend(await _replacements(session, channels, cursor, generation))
+                for name, channel in channels.items():
+                    result = await session.execute(
+                        select(*channel.columns)
+                        .where(channel.id_column > cursor[name])
+                        .order_by(channel.id_column)
+                        .limit(FEED_BATCH_SIZE)
+                    )
+                    rows = result.all()
+                    if rows:
+                        cursor[name] = rows[-1].id
+                        caught_up = caught_up and len(rows) < FEED_BATCH_SIZE
+                        records = rows_to_records(result.keys(), rows)
+                        events.append(format_event(name, dumps(records), format_cursor(cursor)))
+            for event in events:
+                yield event
+
+            if caught_up and not await watcher.wait(changed, FEED_HEARTBEAT_SECONDS):
+                yield b": keepalive\n\n"
+    finally:
+        # 客户端断开时生成器被取消或关闭，同样会执行到这里
+        watcher.unsubscribe()
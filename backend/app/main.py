@@ -1,16 +1,66 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import func, cast, Date, text, and_
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, cast, Date, text, and_, tuple_, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
 from datetime import datetime, timezone, time, date, timedelta
 from typing import List, Dict, Optional
-from .database import engine, Base, get_db
+from contextlib import asynccontextmanager
+import base64
+import json
+import logging
+import os
+from .database import AsyncSessionLocal, async_engine, get_async_db
 from . import models
+from .cache import CacheScope, ResponseCache, get_data_generation, make_cache_key
+from .conditional import EncodedBody, encoded_json_response, not_modified_response
+from .downsample import (
+    SERIES_METHODS,
+    SERIES_OVERSAMPLE,
+    FineBucket,
+    downsample_buckets,
+    fine_bucket_statement,
+    spread_series,
+    to_records,
+)
+from .export import (
+    EXPORT_FORMATS,
+    EXPORT_TABLES,
+    export_filename,
+    export_statement,
+    stream_export,
+)
+from .metrics import (
+    CACHE_ENTRIES,
+    CACHE_INVALIDATIONS,
+    CACHE_LOOKUPS,
+    MetricsMiddleware,
+    instrument_engine,
+    registry as metrics_registry,
+)
+from .feed import FeedChannel, GenerationWatcher, parse_cursor, stream_events
+from .readiness import Readiness
+from .shared_cache import SharedFileCache, default_shared_cache_dir
+from .summary import format_summary_row, load_summary
+from .serialization import dumps, dumps_ndjson, json_response, rows_to_records
+
+logger = logging.getLogger("app.api")
+
+# 数据库结构由迁移管理（python -m app.scripts.migrate），导入时不访问数据库
 
-# 创建数据库表 (如果它们不存在)
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 后台预热连接池与响应缓存，不阻塞启动；/api/ready 在预热完成后才返回 200
+    readiness.start()
+    yield
+    await readiness.stop()
+    await feed_watcher.stop()
+    # 关闭异步连接池，避免进程退出时遗留连接
+    await async_engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # 添加 CORS 中间件
 app.add_middleware(
@@ -26,8 +76,43 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有请求头
 )
 
+# 请求 / 数据库指标（/api/metrics）；最后添加的中间件位于最外层，计时包含 CORS 处理
+instrument_engine(async_engine.sync_engine)
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
+
+# 读接口的响应缓存：按端点 + 规范化参数缓存；数据版本（data_generation）变化时按变更事件（data_changes）
+# 只淘汰依赖范围（CacheScope）受影响的条目
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# 多 worker 运行时（WEB_CONCURRENCY > 1 或设置了 SHARED_CACHE_DIR）由共享缓存保证每个数据版本只计算一次
+_shared_cache_dir = default_shared_cache_dir()
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    shared=SharedFileCache(_shared_cache_dir) if _shared_cache_dir else None,
+)
+# 实时推送：进程内共享一个数据版本轮询任务
+feed_watcher = GenerationWatcher()
+readiness = Readiness(async_engine, app)
+
+
+async def _conditional_json_response(
+    request: Request, db: AsyncSession, endpoint: str, params, compute, scope: Optional[CacheScope] = None
+):
+    """
+    带 ETag 的缓存响应：ETag 只依赖数据版本和参数，If-None-Match 命中时不读缓存、不计算，直接返回 304；
+    否则从缓存取出（或计算）响应体，按 Accept-Encoding 返回压缩后的版本。
+    scope 为响应依赖的数据范围，数据变化与其不重叠时缓存条目在新版本下继续使用。
+    """
+    generation = await get_data_generation(db)
+    key = make_cache_key(endpoint, params)
+    not_modified = not_modified_response(request, generation, key)
+    if not_modified is not None:
+        return not_modified
+    await response_cache.sync(db, generation)
+    body = await response_cache.lookup(generation, key, compute, wrap=EncodedBody, scope=scope)
+    return encoded_json_response(request, generation, key, body)
+
 @app.get("/api/health")
-def health_check():
+async def health_check():
     """
 Signature: `GET /api/health`
 
@@ -39,8 +124,44 @@ Returns:
     """
     return {"status": "ok"}
 
+@app.get("/api/ready")
+async def ready_check():
+    """
+Signature: `GET /api/ready`
+
+Description:
+就绪检查（供容器编排判断何时接入流量）。数据库结构版本为最新、连接池与常用接口的响应缓存
+预热完成后返回 200，否则返回 503；与只表示进程存活的 `/api/health` 区分。
+
+Returns:
+- `dict`: `{"ready": bool, ...}`，未就绪时含 `detail`。
+    """
+    body = await readiness.check()
+    return json_response(dumps(body), status_code=200 if body["ready"] else 503)
+
+@app.get("/api/metrics")
+async def metrics():
+    """
+Signature: `GET /api/metrics`
+
+Description:
+以 Prometheus 文本格式输出本进程的请求延迟 / 响应大小直方图、进行中的请求数、
+每个请求的 SQL 次数与数据库时间、慢查询计数以及响应缓存命中情况。
+    """
+    CACHE_LOOKUPS.set("hit", value=response_cache.hits)
+    CACHE_LOOKUPS.set("miss", value=response_cache.misses)
+    if response_cache.shared is not None:
+        CACHE_LOOKUPS.set("shared_hit", value=response_cache.shared.hits)
+        CACHE_LOOKUPS.set("shared_miss", value=response_cache.shared.misses)
+    CACHE_ENTRIES.set(value=len(response_cache))
+    CACHE_INVALIDATIONS.set("entry", value=response_cache.invalidated)
+    CACHE_INVALIDATIONS.set("clear", value=response_cache.cleared)
+    return Response(
+        content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/api/db-check")
-def db_check(db: Session = Depends(get_db)):
+async def db_check(db: AsyncSession = Depends(get_async_db)):
     """
 Signature: `GET /api/db-check`
 
@@ -48,14 +169,14 @@ Description:
 用于检查数据库连接是否成功的端点。
 
 Parameters:
-- `db` (Session): 通过依赖注入提供的数据库会话。
+- `db` (AsyncSession): 通过依赖注入提供的数据库会话。
 
 Returns:
 - `dict`: 包含数据库连接状态的 JSON 对象。
     """
     try:
         # 执行一个简单的查询来测试连接
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"db_status": "connected"}
     except Exception as e:
         return {"db_status": "error", "detail": str(e)}
@@ -70,8 +191,16 @@ def _ensure_utc(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
-def _daily_ohlcv(
-    db: Session,
+def _naive_utc(dt: datetime) -> datetime:
+    """
+    转换为不带时区的 UTC 时间，用作查询参数。
+    表中的时间列为 timestamp without time zone（按 UTC 存储），asyncpg 不接受带时区的值。
+    """
+    return _ensure_utc(dt).replace(tzinfo=None)
+
+
+async def _daily_ohlcv(
+    db: AsyncSession,
     model,
     volume_expr,
     start_dt: datetime,
@@ -81,47 +210,37 @@ def _daily_ohlcv(
     将任意包含 price/timestamp 的表聚合为日级 OHLCV。
     额外返回 id（行号）和 displayTime 以兼容前端现有结构。
     """
+    # 单条查询完成按天聚合：开盘 / 收盘价取当天按时间排序的第一 / 最后一个价格，
+    # 只使用 timestamp 范围条件，可以走 timestamp 索引
+    day = cast(model.timestamp, Date)
     grouped = (
-        db.query(
-            cast(model.timestamp, Date).label("date"),
-            func.min(model.price).label("low"),
-            func.max(model.price).label("high"),
-            func.sum(volume_expr).label("volume"),
+        await db.execute(
+            select(
+                day.label("date"),
+                array_agg(aggregate_order_by(model.price, model.timestamp.asc()))[1].label("open"),
+                func.min(model.price).label("low"),
+                func.max(model.price).label("high"),
+                array_agg(aggregate_order_by(model.price, model.timestamp.desc()))[1].label("close"),
+                func.sum(volume_expr).label("volume"),
+            )
+            .where(model.timestamp >= _naive_utc(start_dt), model.timestamp <= _naive_utc(end_dt))
+            .group_by(day)
+            .order_by(day)
         )
-        .filter(model.timestamp >= start_dt, model.timestamp <= end_dt)
-        .group_by(cast(model.timestamp, Date))
-        .order_by(cast(model.timestamp, Date))
-        .all()
-    )
+    ).all()
 
     results: List[Dict[str, float]] = []
     for idx, row in enumerate(grouped, start=1):
-        current_date = row.date
-        first_trade = (
-            db.query(model)
-            .filter(cast(model.timestamp, Date) == current_date)
-            .order_by(model.timestamp.asc())
-            .first()
-        )
-        last_trade = (
-            db.query(model)
-            .filter(cast(model.timestamp, Date) == current_date)
-            .order_by(model.timestamp.desc())
-            .first()
-        )
-        if not first_trade or not last_trade:
-            continue
-
-        ts = _ensure_utc(datetime.combine(current_date, time.min))
+        ts = datetime.combine(row.date, time.min)
         results.append(
             {
                 "id": idx,
-                "timestamp": ts.isoformat().replace("+00:00", "Z"),
+                "timestamp": ts,
                 "displayTime": ts.strftime("%m-%d"),
-                "open": float(first_trade.price or 0.0),
-                "high": float(row.high or first_trade.price or 0.0),
-                "low": float(row.low or first_trade.price or 0.0),
-                "close": float(last_trade.price or 0.0),
+                "open": float(row.open or 0.0),
+                "high": float(row.high or row.open or 0.0),
+                "low": float(row.low or row.open or 0.0),
+                "close": float(row.close or 0.0),
                 "volume": float(row.volume or 0.0),
             }
         )
@@ -129,14 +248,15 @@ def _daily_ohlcv(
 
 
 @app.get("/api/price-data")
-def get_price_data(
+async def get_price_data(
+    request: Request,
     start_date: Optional[date] = Query(
         None, description="开始日期，格式 YYYY-MM-DD（默认返回最近 30 天）"
     ),
     end_date: Optional[date] = Query(
         None, description="结束日期，格式 YYYY-MM-DD（默认今天，UTC）"
     ),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Signature: `GET /api/price-data`
@@ -144,11 +264,12 @@ def get_price_data(
     Description:
     获取 Uniswap V3 和 Binance 的价格数据，按天聚合为 OHLC（开高低收）格式，
     并提供前端图表直接可用的 displayTime/id 字段。
+    响应带 ETag，携带 If-None-Match 且数据未变化时返回 304；较大的响应按 Accept-Encoding 压缩。
     
     Parameters:
     - `start_date` (date, optional): 开始日期，格式为 "YYYY-MM-DD"，默认 = 结束日期往前 29 天
     - `end_date` (date, optional): 结束日期，格式为 "YYYY-MM-DD"，默认 = 今天 (UTC)
-    - `db` (Session): 通过依赖注入提供的数据库会话。
+    - `db` (AsyncSession): 通过依赖注入提供的数据库会话。
     
     Returns:
     - `dict`: 包含 uniswap 和 binance 价格数据的 JSON 对象，格式为：
@@ -175,57 +296,164 @@ def get_price_data(
     start_dt = _ensure_utc(datetime.combine(resolved_start, time.min))
     end_dt = _ensure_utc(datetime.combine(resolved_end, time.max))
 
-    uniswap_ohlc = _daily_ohlcv(
-        db,
-        models.UniswapSwap,
-        func.abs(models.UniswapSwap.amount1),
-        start_dt,
-        end_dt,
-    )
-    binance_ohlc = _daily_ohlcv(
+    async def compute():
+        uniswap_ohlc = await _daily_ohlcv(
+            db,
+            models.UniswapSwap,
+            func.abs(models.UniswapSwap.amount1),
+            start_dt,
+            end_dt,
+        )
+        binance_ohlc = await _daily_ohlcv(
+            db,
+            models.BinanceTrade,
+            models.BinanceTrade.quantity,
+            start_dt,
+            end_dt,
+        )
+
+        return dumps({
+            "uniswap": uniswap_ohlc,
+            "binance": binance_ohlc
+        })
+
+    return await _conditional_json_response(
+        request,
         db,
-        models.BinanceTrade,
-        models.BinanceTrade.quantity,
-        start_dt,
-        end_dt,
+        "price-data",
+        {"start_date": resolved_start, "end_date": resolved_end},
+        compute,
+        CacheScope.of(("uniswap_swaps", "binance_trades"), start_dt, end_dt),
     )
 
-    return {
-        "uniswap": uniswap_ohlc,
-        "binance": binance_ohlc
-    }
-
 
 @app.get("/api/arbitrage/statistics")
-def get_arbitrage_statistics(db: Session = Depends(get_db)):
+async def get_arbitrage_statistics(
+    by: Optional[str] = Query(None, description="可选分组维度：day 或 direction"),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     Signature: `GET /api/arbitrage/statistics`
 
     Description:
-    返回预计算的非原子套利统计数据，直接读取 arbitrage_opportunities 表的汇总。
+    返回预计算的非原子套利统计数据，直接读取 compute_arbitrage 写入时维护的 arbitrage_summary 汇总行。
+
+    Parameters:
+    - `by` (str, optional): 传入 `day` 或 `direction` 时额外返回按天 / 按方向的分组统计 `breakdown`。
     """
-    total_opportunities = db.query(func.count(models.ArbitrageOpportunity.id)).scalar() or 0
-    total_profit = (
-        db.query(func.coalesce(func.sum(models.ArbitrageOpportunity.profit), 0)).scalar() or 0.0
+    if by is not None and by not in ("day", "direction"):
+        raise HTTPException(status_code=400, detail="by must be one of: day, direction")
+
+    async def compute():
+        totals = await load_summary(db, "total")
+        result = format_summary_row(totals[0]) if totals else {
+            "total_opportunities": 0,
+            "total_profit": 0.0,
+            "average_profit_rate": 0.0,
+        }
+        if by is not None:
+            result["breakdown"] = [
+                {by: row.bucket_key, **format_summary_row(row)}
+                for row in await load_summary(db, by)
+            ]
+        return dumps(result)
+
+    return json_response(
+        await response_cache.get_or_compute(
+            db, "arbitrage-statistics", {"by": by}, compute, CacheScope.of(("arbitrage_opportunities",))
+        )
     )
-    average_profit_rate = (
-        db.query(func.coalesce(func.avg(models.ArbitrageOpportunity.profit_rate), 0)).scalar() or 0.0
+
+
+BEHAVIOR_TOTAL_MODES = ("exact", "estimate", "none")
+
+# 套利行为列表输出的列（按列查询，profit_rate 转换为百分比、direction 缺省值均在 SQL 中完成）
+BEHAVIOR_COLUMNS = (
+    models.ArbitrageOpportunity.id,
+    models.ArbitrageOpportunity.buy_timestamp,
+    models.ArbitrageOpportunity.sell_timestamp,
+    models.ArbitrageOpportunity.uniswap_price,
+    models.ArbitrageOpportunity.binance_price,
+    models.ArbitrageOpportunity.price_diff_percent,
+    models.ArbitrageOpportunity.profit,
+    (func.coalesce(models.ArbitrageOpportunity.profit_rate, 0.0) * 100).label("profit_rate"),
+    func.coalesce(models.ArbitrageOpportunity.direction, "unknown").label("direction"),
+)
+
+
+def _encode_cursor(sort_by: str, sort_order: str, value, row_id: int) -> str:
+    """将 keyset 分页位置编码为不透明的 URL 安全字符串。"""
+    if isinstance(value, datetime):
+        value = _ensure_utc(value).isoformat()
+    payload = json.dumps({"s": sort_by, "o": sort_order, "v": value, "id": row_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_by: str, sort_order: str):
+    """解析 cursor，返回 (排序列的值, id)；格式错误或与当前排序不一致时返回 400。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort_by or payload["o"] != sort_order:
+            raise ValueError("cursor does not match sort_by/sort_order")
+        value = payload["v"]
+        if sort_by != "profit":
+            value = datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            value = float(value)
+        return value, int(payload["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        # 具体原因只写日志，响应中不回显解析细节
+        logger.info("invalid cursor %r: %s", cursor, exc)
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+async def _count_rows(db: AsyncSession, statement) -> int:
+    """精确计数：SELECT COUNT(*) FROM (statement)。"""
+    return int(await db.scalar(select(func.count()).select_from(statement.subquery())) or 0)
+
+
+async def _estimate_row_count(db: AsyncSession, statement) -> int:
+    """
+    利用规划器的行数估计代替 COUNT(*)：
+    无过滤条件时读取 pg_class.reltuples，否则读取 EXPLAIN 顶层节点的 Plan Rows。
+    """
+    if statement.whereclause is None:
+        table_name = models.ArbitrageOpportunity.__tablename__
+        estimate = await db.scalar(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": table_name},
+        )
+        # reltuples 为 -1 表示表从未被 ANALYZE，退回到精确计数
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+        return await _count_rows(db, statement)
+
+    compiled = statement.compile(
+        dialect=async_engine.dialect, compile_kwargs={"literal_binds": True}
     )
-    return {
-        "total_opportunities": int(total_opportunities),
-        "total_profit": float(total_profit),
-        "average_profit_rate": float(average_profit_rate * 100),
-    }
+    plan = await db.scalar(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
 
 
 @app.get("/api/arbitrage/behaviors")
-def get_arbitrage_behaviors(
+async def get_arbitrage_behaviors(
     page: int = 1,
     page_size: int = 10,
     sort_by: str = "profit",  # profit | buy_timestamp | sell_timestamp
     sort_order: str = "desc",
     min_profit: Optional[float] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None, description="上一页返回的 next_cursor；提供时按 keyset 翻页并忽略 page"
+    ),
+    total_mode: Optional[str] = Query(
+        None,
+        description="总数计算方式：exact（COUNT）| estimate（规划器估计）| none（不返回）；"
+        "默认按页码翻页时为 exact，按 cursor 翻页时为 estimate",
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Signature: `GET /api/arbitrage/behaviors`
@@ -233,70 +461,178 @@ def get_arbitrage_behaviors(
     Description:
     分页返回识别出的套利行为，支持最小利润过滤和排序。
     与套利机会的区别：移除了 transaction_hash、timestamp、volume，新增了 direction 字段。
+
+    排序按 (排序列, id) 进行，对应 arbitrage_opportunities 上的复合索引。
+    传入 `cursor` 时使用 keyset 分页（WHERE (排序列, id) < (上一页末行)），
+    深翻页与第一页代价相同；此模式下排序列为空的记录不会出现，总数默认使用规划器估计（精确 COUNT 需扫描全部匹配行），
+    page 没有意义，返回 null。
+
+    Returns:
+    - `dict`: behaviors、page、page_size、total、total_pages、total_estimated，
+      以及用于获取下一页的 `next_cursor`（没有更多数据时为 null）。
     """
     page = max(1, page)
     page_size = max(1, min(100, page_size))
 
-    query = db.query(models.ArbitrageOpportunity)
-    if min_profit is not None:
-        query = query.filter(models.ArbitrageOpportunity.profit >= min_profit)
-
-    total = query.count()
     sort_column_map = {
         "profit": models.ArbitrageOpportunity.profit,
         "buy_timestamp": models.ArbitrageOpportunity.buy_timestamp,
         "sell_timestamp": models.ArbitrageOpportunity.sell_timestamp,
     }
-    sort_column = sort_column_map.get(sort_by, models.ArbitrageOpportunity.profit)
-    order_clause = (
-        sort_column.desc() if sort_order.lower() == "desc" else sort_column.asc()
-    )
+    if sort_by not in sort_column_map:
+        sort_by = "profit"
+    sort_order = "desc" if sort_order.lower() == "desc" else "asc"
+    if total_mode is None:
+        total_mode = "estimate" if cursor else "exact"
+    if total_mode not in BEHAVIOR_TOTAL_MODES:
+        raise HTTPException(status_code=400, detail="total_mode must be one of: exact, estimate, none")
+    after = _decode_cursor(cursor, sort_by, sort_order) if cursor else None
+
+    async def compute():
+        filters = []
+        if min_profit is not None:
+            filters.append(models.ArbitrageOpportunity.profit >= min_profit)
+
+        count_query = select(models.ArbitrageOpportunity.id).where(*filters)
+        if total_mode == "exact":
+            total = await _count_rows(db, count_query)
+        elif total_mode == "estimate":
+            total = await _estimate_row_count(db, count_query)
+        else:
+            total = None
+
+        sort_column = sort_column_map[sort_by]
+        id_column = models.ArbitrageOpportunity.id
+        if sort_order == "desc":
+            order_clauses = (sort_column.desc(), id_column.desc())
+        else:
+            order_clauses = (sort_column.asc(), id_column.asc())
+
+        page_query = select(*BEHAVIOR_COLUMNS).where(*filters).order_by(*order_clauses)
+        if after is not None:
+            boundary = tuple_(sort_column, id_column)
+            after_row = tuple_(literal(after[0], sort_column.type), literal(after[1]))
+            page_query = page_query.where(
+                boundary < after_row if sort_order == "desc" else boundary > after_row
+            )
+        else:
+            page_query = page_query.offset((page - 1) * page_size)
+
+        # 多取一行用于判断是否还有下一页
+        result = await db.execute(page_query.limit(page_size + 1))
+        rows = result.all()
+        has_more = len(rows) > page_size
+        data = rows_to_records(result.keys(), rows[:page_size])
+
+        next_cursor = None
+        if has_more and data:
+            last = data[-1]
+            # profit 列输出的就是原值；时间列输出的是 datetime，由 _encode_cursor 统一处理
+            last_value = last[sort_by]
+            if last_value is not None:
+                next_cursor = _encode_cursor(sort_by, sort_order, last_value, last["id"])
+
+        if total is None:
+            total_pages = None
+        else:
+            total_pages = max(1, (total + page_size - 1) // page_size) if total else 1
+        return dumps({
+            "behaviors": data,
+            "total_pages": total_pages,
+            "total": total,
+            "total_estimated": total_mode == "estimate",
+            "page": None if cursor else page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+        })
+
+    return json_response(await response_cache.get_or_compute(
+        db,
+        "arbitrage-behaviors",
+        {
+            "page": None if cursor else page,
+            "page_size": page_size,
+            "sort_by": sort_by,
+            "sort_order": sort_order,
+            "min_profit": min_profit,
+            "cursor": cursor,
+            "total_mode": total_mode,
+        },
+        compute,
+        CacheScope.of(("arbitrage_opportunities",)),
+    ))
+
+OPPORTUNITY_PAGE_LIMIT_MAX = 10000  # 单页最多返回的分钟级机会条数
+OPPORTUNITY_STREAM_BATCH_SIZE = 2000  # 流式输出时每批从服务端游标读取的行数
+OPPORTUNITY_FORMATS = ("json", "ndjson")
+
+# 列表 / 流式输出只需要这些列，直接按列查询，避免构造 ORM 实例
+OPPORTUNITY_COLUMNS = (
+    models.ArbitrageOpportunityMinute.id,
+    models.ArbitrageOpportunityMinute.timestamp,
+    models.ArbitrageOpportunityMinute.uniswap_price,
+    models.ArbitrageOpportunityMinute.binance_price,
+    models.ArbitrageOpportunityMinute.price_diff_percent,
+    models.ArbitrageOpportunityMinute.profit,
+    # 转换为百分比
+    (func.coalesce(models.ArbitrageOpportunityMinute.profit_rate, 0.0) * 100).label("profit_rate"),
+    func.coalesce(models.ArbitrageOpportunityMinute.direction, "unknown").label("direction"),
+)
 
-    opportunities = (
-        query.order_by(order_clause)
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
 
-    def serialize_timestamp(dt: Optional[datetime]) -> Optional[str]:
-        if not dt:
-            return None
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.isoformat().replace("+00:00", "Z")
+def _opportunities_statement(
+    min_profit_rate: Optional[float],
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    offset: Optional[int] = None,
+    limit: Optional[int] = None,
+):
+    """构造分钟级套利机会的列查询（按时间倒序，最新的在前）。"""
+    stmt = select(*OPPORTUNITY_COLUMNS)
+    # 时间范围筛选
+    if start_dt is not None:
+        stmt = stmt.where(models.ArbitrageOpportunityMinute.timestamp >= _naive_utc(start_dt))
+    if end_dt is not None:
+        stmt = stmt.where(models.ArbitrageOpportunityMinute.timestamp <= _naive_utc(end_dt))
+    # 最小利润率筛选
+    if min_profit_rate is not None:
+        stmt = stmt.where(models.ArbitrageOpportunityMinute.profit_rate >= min_profit_rate)
+    stmt = stmt.order_by(models.ArbitrageOpportunityMinute.timestamp.desc())
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
 
-    data = []
-    for opp in opportunities:
-        data.append(
-            {
-                "id": opp.id,
-                "buy_timestamp": serialize_timestamp(opp.buy_timestamp),
-                "sell_timestamp": serialize_timestamp(opp.sell_timestamp),
-                "uniswap_price": opp.uniswap_price,
-                "binance_price": opp.binance_price,
-                "price_diff_percent": opp.price_diff_percent,
-                "profit": opp.profit,
-                "profit_rate": (opp.profit_rate or 0.0) * 100,
-                "direction": opp.direction or "unknown",
-            }
+
+async def _stream_opportunities_ndjson(stmt):
+    """
+    通过服务端游标逐批读取并输出 NDJSON（每行一个 JSON 对象）。
+
+    使用独立会话：依赖注入的会话在响应开始发送前就会关闭，
+    而流式响应在整个传输期间都需要保持游标打开。
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            stmt.execution_options(yield_per=OPPORTUNITY_STREAM_BATCH_SIZE)
         )
+        keys = list(result.keys())
+        async for rows in result.partitions():
+            yield dumps_ndjson(rows_to_records(keys, rows))
 
-    total_pages = max(1, (total + page_size - 1) // page_size) if total else 1
-    return {
-        "behaviors": data,
-        "total_pages": total_pages,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-    }
 
 @app.get("/api/arbitrage/opportunities")
-def get_arbitrage_opportunities(
+async def get_arbitrage_opportunities(
+    request: Request,
     min_profit_rate: Optional[float] = None,
     start_time: Optional[str] = None,
     end_time: Optional[str] = None,
-    db: Session = Depends(get_db),
+    page: Optional[int] = Query(None, description="页码，从 1 开始；需配合 limit 使用"),
+    limit: Optional[int] = Query(
+        None, description=f"每页条数（最多 {OPPORTUNITY_PAGE_LIMIT_MAX}）；不传时返回全部匹配记录"
+    ),
+    format: str = Query("json", description="json（默认）或 ndjson（流式输出，每行一条记录）"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Signature: `GET /api/arbitrage/opportunities`
@@ -304,16 +640,27 @@ def get_arbitrage_opportunities(
     Description:
     获取预计算的套利机会列表（按分钟），支持最小利润率过滤和时间范围筛选。
     这些机会表示在某个时间点，用户如果进行套利交易可能获得的利润。
+
+    Parameters:
+    - `page` / `limit` (int, optional): 分页参数，传入 limit 时只返回一页，并在响应中附带 page、limit、has_more。
+    - `format` (str): `ndjson` 时以 `application/x-ndjson` 流式输出，行直接来自服务端游标，
+      内存占用与结果集大小无关，首字节可立即返回（流式结果不进入响应缓存）。
+
+    json 格式的响应带 ETag（由数据版本和参数计算），If-None-Match 命中时返回 304；
+    超过压缩阈值的响应按 Accept-Encoding 返回 br / gzip 压缩结果。
     """
-    query = db.query(models.ArbitrageOpportunityMinute)
-    
-    # 时间范围筛选
+    if format not in OPPORTUNITY_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be one of: json, ndjson")
+
+    start_dt = None
+    end_dt = None
+
+    # 时间范围参数解析（先于缓存查找，保证等价写法命中同一缓存键）
     if start_time:
         try:
             start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
             if start_dt.tzinfo is None:
                 start_dt = start_dt.replace(tzinfo=timezone.utc)
-            query = query.filter(models.ArbitrageOpportunityMinute.timestamp >= start_dt)
         except ValueError:
             return {"error": "start_time 格式错误，请使用 ISO 8601 格式（如 2025-09-01T12:00:00Z）"}
     
@@ -322,39 +669,265 @@ def get_arbitrage_opportunities(
             end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
             if end_dt.tzinfo is None:
                 end_dt = end_dt.replace(tzinfo=timezone.utc)
-            query = query.filter(models.ArbitrageOpportunityMinute.timestamp <= end_dt)
         except ValueError:
             return {"error": "end_time 格式错误，请使用 ISO 8601 格式（如 2025-09-01T12:00:00Z）"}
-    
-    # 最小利润率筛选
-    if min_profit_rate is not None:
-        query = query.filter(models.ArbitrageOpportunityMinute.profit_rate >= min_profit_rate)
-    
-    # 按时间倒序排列（最新的在前）
-    opportunities = query.order_by(models.ArbitrageOpportunityMinute.timestamp.desc()).all()
-    
-    def serialize_timestamp(dt: Optional[datetime]) -> Optional[str]:
-        if not dt:
-            return None
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.isoformat().replace("+00:00", "Z")
-    
-    data = []
-    for opp in opportunities:
-        data.append(
-            {
-                "id": opp.id,
-                "timestamp": serialize_timestamp(opp.timestamp),
-                "uniswap_price": opp.uniswap_price,
-                "binance_price": opp.binance_price,
-                "price_diff_percent": opp.price_diff_percent,
-                "profit": opp.profit,
-                "profit_rate": (opp.profit_rate or 0.0) * 100,  # 转换为百分比
-                "direction": opp.direction or "unknown",
-            }
+
+    offset = None
+    if limit is not None:
+        limit = max(1, min(OPPORTUNITY_PAGE_LIMIT_MAX, limit))
+        page = max(1, page or 1)
+        offset = (page - 1) * limit
+    else:
+        page = None
+
+    if format == "ndjson":
+        stmt = _opportunities_statement(min_profit_rate, start_dt, end_dt, offset, limit)
+        return StreamingResponse(
+            _stream_opportunities_ndjson(stmt), media_type="application/x-ndjson"
         )
-    
-    return {
-        "opportunities": data,
-    }
+
+    async def compute():
+        # 分页时多取一行用于判断是否还有下一页
+        stmt = _opportunities_statement(
+            min_profit_rate, start_dt, end_dt, offset, limit + 1 if limit is not None else None
+        )
+        result = await db.execute(stmt)
+        rows = result.all()
+        payload = {}
+        if limit is not None:
+            payload.update({"page": page, "limit": limit, "has_more": len(rows) > limit})
+            rows = rows[:limit]
+        payload["opportunities"] = rows_to_records(result.keys(), rows)
+        return dumps(payload)
+
+    return await _conditional_json_response(
+        request,
+        db,
+        "arbitrage-opportunities",
+        {
+            "min_profit_rate": min_profit_rate,
+            "start_time": _ensure_utc(start_dt) if start_dt else None,
+            "end_time": _ensure_utc(end_dt) if end_dt else None,
+            "page": page,
+            "limit": limit,
+        },
+        compute,
+        CacheScope.of(("arbitrage_opportunities_minute",), start_dt, end_dt),
+    )
+
+
+# 实时推送的频道：事件名 -> 表的自增 id 列与输出列（与对应 REST 接口的字段一致）；
+# 两张机会表由计算脚本按时间范围删除重算，原始表只追加
+FEED_CHANNELS = {
+    "opportunities_minute": FeedChannel(models.ArbitrageOpportunityMinute.id, OPPORTUNITY_COLUMNS, replaces=True),
+    "opportunities": FeedChannel(models.ArbitrageOpportunity.id, BEHAVIOR_COLUMNS, replaces=True),
+    "uniswap_prices": FeedChannel(
+        models.UniswapSwap.id,
+        (
+            models.UniswapSwap.id,
+            models.UniswapSwap.timestamp,
+            models.UniswapSwap.price,
+            func.abs(models.UniswapSwap.amount1).label("amount"),
+        ),
+    ),
+    "binance_prices": FeedChannel(
+        models.BinanceTrade.id,
+        (
+            models.BinanceTrade.id,
+            models.BinanceTrade.timestamp,
+            models.BinanceTrade.price,
+            models.BinanceTrade.quantity.label("amount"),
+        ),
+    ),
+}
+
+
+@app.get("/api/stream")
+async def stream_updates(
+    request: Request,
+    channels: Optional[str] = Query(
+        None, description=f"逗号分隔的频道列表，默认全部：{', '.join(FEED_CHANNELS)}"
+    ),
+    last_event_id: Optional[str] = Query(
+        None, description="从该事件 id 之后继续推送；EventSource 重连时会自动通过 Last-Event-ID 请求头提供"
+    ),
+):
+    """
+    Signature: `GET /api/stream`
+
+    Description:
+    以 Server-Sent Events 推送新提交的分钟级套利机会、套利行为和两个交易所的价格 tick。
+    采集 / 计算脚本提交后（data_generation 变化）约 FEED_POLL_INTERVAL 秒内推送。
+
+    事件:
+    - `ready`: 连接建立，data 为各频道的起始游标
+    - `opportunities_minute` / `opportunities` / `uniswap_prices` / `binance_prices`:
+      data 为新行数组（字段与对应 REST 接口一致，每个事件最多 1000 行）
+    - `replace`: data 为 `{"channel", "start", "end"}`，该频道在 [start, end] 内（null 表示该侧无界）的行
+      已被删除或重新计算，客户端应丢弃已收到的这段数据；替换后的行随后作为新行推送
+    - `reset`: 无法确定某频道的变化范围（如表被删除重建、断线太久），客户端应通过 REST 接口重新加载
+
+    每个事件的 id 为完整游标（如 `generation:1792401874324,opportunities_minute:120,uniswap_prices:98765`），
+    断线重连时带上最后收到的 id 即可补发期间提交的数据；不带 id 时只推送连接之后的新数据。
+    """
+    if channels:
+        selected = [name.strip() for name in channels.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in FEED_CHANNELS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"channels must be a subset of: {', '.join(FEED_CHANNELS)}",
+            )
+    else:
+        selected = list(FEED_CHANNELS)
+    subscribed = {name: FEED_CHANNELS[name] for name in selected}
+    cursor = parse_cursor(last_event_id or request.headers.get("last-event-id"), subscribed)
+
+    return StreamingResponse(
+        stream_events(request, feed_watcher, subscribed, cursor),
+        media_type="text/event-stream",
+        # 禁止 Nginx 缓冲，事件到达后立即转发给客户端
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _parse_time_param(value: Optional[str], name: str) -> Optional[datetime]:
+    """解析 ISO 8601 时间参数（无时区视为 UTC），返回 naive UTC；格式错误返回 400。"""
+    if not value:
+        return None
+    try:
+        return _naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{name} 格式错误，请使用 ISO 8601 格式（如 2025-09-01T12:00:00Z）",
+        )
+
+
+@app.get("/api/export/{table}")
+async def export_table(
+    table: str,
+    start_time: Optional[str] = Query(None, description="开始时间（ISO 8601，含），按 timestamp 列过滤"),
+    end_time: Optional[str] = Query(None, description="结束时间（ISO 8601，含）"),
+    format: str = Query("arrow", description="arrow（Arrow IPC 流）或 parquet"),
+):
+    """
+    Signature: `GET /api/export/{table}`
+
+    Description:
+    以列式格式导出整张表在时间范围内的全部列，供 notebook 直接读取，替代逐页抓取 REST 接口。
+    `table` 为 uniswap_swaps、binance_trades、arbitrage_opportunities 或 arbitrage_opportunities_minute。
+
+    数据从服务端游标按 EXPORT_BATCH_ROWS 行一批读取，每批编码为一个 Arrow RecordBatch
+    （Parquet 中为一个 row group）后立即发送，内存占用与导出范围无关。
+
+    读取示例:
+    - `pyarrow.ipc.open_stream(urlopen(url)).read_all()`
+    - `pandas.read_parquet(io.BytesIO(requests.get(url).content))`
+    """
+    model = EXPORT_TABLES.get(table)
+    if model is None:
+        raise HTTPException(
+            status_code=404, detail=f"table must be one of: {', '.join(EXPORT_TABLES)}"
+        )
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be one of: arrow, parquet")
+    start_dt = _parse_time_param(start_time, "start_time")
+    end_dt = _parse_time_param(end_time, "end_time")
+
+    media_type = EXPORT_FORMATS[format][0]
+    filename = export_filename(table, format, start_dt, end_dt)
+    return StreamingResponse(
+        stream_export(model, export_statement(model, start_dt, end_dt), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+SERIES_POINTS_DEFAULT = 1000
+SERIES_POINTS_MAX = 5000
+
+
+async def _series_range(db: AsyncSession):
+    """未指定时间范围时使用两个交易所数据的整体范围（naive UTC）。"""
+    bounds = []
+    for model in (models.UniswapSwap, models.BinanceTrade):
+        bounds.append(
+            (await db.execute(select(func.min(model.timestamp), func.max(model.timestamp)))).one()
+        )
+    starts = [low for low, _ in bounds if low is not None]
+    ends = [high for _, high in bounds if high is not None]
+    return (min(starts) if starts else None), (max(ends) if ends else None)
+
+
+@app.get("/api/series")
+async def get_price_series(
+    request: Request,
+    start_time: Optional[str] = Query(None, description="开始时间（ISO 8601），默认为最早的数据"),
+    end_time: Optional[str] = Query(None, description="结束时间（ISO 8601），默认为最新的数据"),
+    points: int = Query(
+        SERIES_POINTS_DEFAULT, description=f"每条序列的目标点数（最多 {SERIES_POINTS_MAX}）"
+    ),
+    method: str = Query("lttb", description="降采样方法：lttb 或 minmax（每桶保留最低 / 最高点）"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Signature: `GET /api/series`
+
+    Description:
+    返回任意时间范围内 Uniswap、Binance 的降采样价格序列以及 Uniswap–Binance 价差序列，
+    每条序列的点数不超过 `points`，图表负载与缩放级别无关。
+
+    数据库端把范围等分为 `points * 4` 个时间桶聚合（每桶一行），再按 `method` 降到目标点数；
+    价差只在两个交易所都有成交的桶上计算：(uniswap - binance) / 两者均价 * 100。
+
+    Returns:
+    - `dict`: start_time、end_time、points、method、bucket_seconds，
+      `uniswap` / `binance`（`{timestamp, price}` 列表）和 `spread`（`{timestamp, spread_percent}` 列表）。
+    """
+    if method not in SERIES_METHODS:
+        raise HTTPException(status_code=400, detail="method must be one of: lttb, minmax")
+    points = max(2, min(SERIES_POINTS_MAX, points))
+    start_dt = _parse_time_param(start_time, "start_time")
+    end_dt = _parse_time_param(end_time, "end_time")
+    if start_dt is None or end_dt is None:
+        data_start, data_end = await _series_range(db)
+        start_dt = start_dt or data_start
+        end_dt = end_dt or data_end
+    if start_dt is not None and end_dt is not None and start_dt > end_dt:
+        raise HTTPException(status_code=400, detail="start_time must not be after end_time")
+
+    async def compute():
+        payload = {
+            "start_time": start_dt,
+            "end_time": end_dt,
+            "points": points,
+            "method": method,
+            "bucket_seconds": None,
+            "uniswap": [],
+            "binance": [],
+            "spread": [],
+        }
+        if start_dt is None or end_dt is None:
+            return dumps(payload)
+
+        bucket_count = points * SERIES_OVERSAMPLE
+        buckets = {}
+        for name, model in (("uniswap", models.UniswapSwap), ("binance", models.BinanceTrade)):
+            rows = (await db.execute(fine_bucket_statement(model, start_dt, end_dt, bucket_count))).all()
+            buckets[name] = [FineBucket(row) for row in rows]
+            payload[name] = to_records(downsample_buckets(buckets[name], points, method), "price")
+        payload["spread"] = to_records(
+            spread_series(buckets["uniswap"], buckets["binance"], points, method), "spread_percent"
+        )
+        payload["bucket_seconds"] = (end_dt - start_dt).total_seconds() / bucket_count
+        return dumps(payload)
+
+    return await _conditional_json_response(
+        request,
+        db,
+        "series",
+        {"start_time": start_dt, "end_time": end_dt, "points": points, "method": method},
+        compute,
+        CacheScope.of(("uniswap_swaps", "binance_trades"), start_dt, end_dt),
+    )
@@ -0,0 +1,287 @@
+"""
+请求与数据库指标（Prometheus 文本格式，由 /api/metrics 输出）。
+
+- MetricsMiddleware：按路由模板记录请求数、延迟、响应大小直方图和进行中的请求数；
+- instrument_engine：在 SQLAlchemy 的 before/after_cursor_execute 事件中累计每条 SQL 的耗时，
+  按请求汇总查询次数与数据库时间（N+1 查询会直接体现在 db_queries_per_request 上），
+  超过 SLOW_QUERY_MS 的语句写入 app.slow_query 日志。
+
+指标保存在进程内，所有更新都发生在事件循环线程中。
+就绪预热（app/readiness.py）在进程内发出的请求以 WARMUP_CLIENT 作为客户端地址，不计入请求指标
+（其中的 SQL 记在 endpoint="background" 下）。
+"""
+from __future__ import annotations
+
+import abc
+import contextvars
+import logging
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 0 表示不记录慢查询
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+# 预热请求的 ASGI client（真实连接的客户端地址总是 IP，外部请求无法冒充）
+WARMUP_CLIENT = ("warmup", 0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[str]:
+        """按 Prometheus 文本格式逐行输出样本。"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def set(self, *label_values: str, value: float) -> None:
+        """直接设置取值（用于同步在别处维护的累计值，如响应缓存的命中数）。"""
+        self._values[label_values] = value
+
+    def samples(self) -> Iterable[str]:
+        for values, total in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, values)} {_format_number(total)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [每个桶的计数..., 总和, 总数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        state = self._values.get(label_values)
+        if state is None:
+            state = self._values[label_values] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        for values, state in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {_format_number(cumulative)}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {_format_number(state[-1])}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {_format_number(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {_format_number(state[-1])}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+registry = Registry()
+
+REQUESTS_TOTAL = registry.register(
+    Counter("http_requests_total", "HTTP 请求数", ("method", "endpoint", "status"))
+)
+REQUEST_DURATION = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "从收到请求到响应体发送完毕的耗时",
+        ("method", "endpoint"),
+        LATENCY_BUCKETS,
+    )
+)
+RESPONSE_SIZE = registry.register(
+    Histogram("http_response_size_bytes", "响应体字节数（压缩后）", ("method", "endpoint"), SIZE_BUCKETS)
+)
+REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "正在处理的请求数（含流式响应）", ("endpoint",))
+)
+DB_QUERIES_PER_REQUEST = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "单个请求执行的 SQL 语句数",
+        ("endpoint",),
+        QUERY_COUNT_BUCKETS,
+    )
+)
+DB_TIME_PER_REQUEST = registry.register(
+    Histogram(
+        "db_time_per_request_seconds",
+        "单个请求内 SQL 执行时间之和",
+        ("endpoint",),
+        LATENCY_BUCKETS,
+    )
+)
+DB_QUERY_DURATION = registry.register(
+    Histogram("db_query_duration_seconds", "单条 SQL 的执行时间", ("endpoint",), LATENCY_BUCKETS)
+)
+DB_SLOW_QUERIES = registry.register(
+    Counter("db_slow_queries_total", "超过 SLOW_QUERY_MS 的 SQL 语句数", ("endpoint",))
+)
+CACHE_LOOKUPS = registry.register(
+    Counter("response_cache_lookups_total", "响应缓存查找次数", ("result",))
+)
+CACHE_ENTRIES = registry.register(Gauge("response_cache_entries", "响应缓存当前条目数"))
+CACHE_INVALIDATIONS = registry.register(
+    Counter("response_cache_invalidations_total", "数据变化导致的缓存失效：按事件淘汰的条目数 / 整体清空次数", ("kind",))
+)
+
+
+class RequestStats:
+    """当前请求的数据库统计；通过 contextvar 传递，SQLAlchemy 事件中可以直接访问。"""
+
+    __slots__ = ("endpoint", "queries", "db_seconds")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+
+
+def _route_template(app, scope) -> str:
+    """返回匹配的路由模板（如 /api/export/{table}），避免按原始路径产生过多标签值。"""
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：不缓冲响应体，流式响应（NDJSON / SSE / 导出）照常逐块发送。"""
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tuple(scope.get("client") or ()) == WARMUP_CLIENT:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = _route_template(self.fastapi_app.router, scope)
+        method = scope["method"]
+        stats = RequestStats(endpoint)
+        token = _request_stats.set(stats)
+        status = "500"
+        size = 0
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(endpoint)
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint)
+            REQUESTS_TOTAL.inc(method, endpoint, status)
+            REQUEST_DURATION.observe(time.perf_counter() - started, method, endpoint)
+            RESPONSE_SIZE.observe(size, method, endpoint)
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, endpoint)
+            DB_TIME_PER_REQUEST.observe(stats.db_seconds, endpoint)
+            _request_stats.reset(token)
+
+
+def instrument_engine(engine) -> None:
+    """为 Engine（异步引擎传入 async_engine.sync_engine）注册 SQL 计时事件。"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _request_stats.get()
+        endpoint = stats.endpoint if stats is not None else "background"
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        DB_QUERY_DURATION.observe(elapsed, endpoint)
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            DB_SLOW_QUERIES.inc(endpoint)
+            slow_query_logger.warning(
+                "slow query (%.1f ms) [%s]: %s", elapsed * 1000, endpoint, " ".join(statement.split())
+            )
@@ -0,0 +1,539 @@
+"""
+数据库结构的版本化迁移。
+
+已应用的版本记录在 schema_migrations 表中。"是否最新"只需读取 max(version)，
+因此脚本每次启动都可以调用 ensure_current，结构已是最新时不会执行任何 DDL。
+
+- 空库：直接按当前模型 create_all，并记录为最新版本（只有这里使用当前模型建表）；
+- 已有数据的库：按版本顺序执行尚未应用的迁移，每个迁移一个事务。
+  因此迁移只需负责把旧库升级到下一版本的结构，不需要处理空库。
+  已发布的迁移不再修改：每个迁移都是编写时写定的 DDL 与回填 SQL，不引用 models 或其他模块，
+  模型或辅助函数以后的修改不会改变旧迁移的行为。
+
+升级由主库（写引擎）执行并持有 advisory lock，多个脚本 / 容器同时启动时只有一个在执行迁移。
+API 只读取版本号判断是否就绪，不执行 DDL。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+
+SCHEMA_MIGRATIONS_TABLE = "schema_migrations"
+# pg_advisory_lock 的键（任意常量，与其他使用 advisory lock 的代码区分即可）
+MIGRATION_LOCK_KEY = 0x5343_4845_4D41
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """注册迁移；版本号必须连续递增。"""
+
+    def register(upgrade: Callable[[Connection], None]):
+        expected = MIGRATIONS[-1].version + 1 if MIGRATIONS else 1
+        if version != expected:
+            raise ValueError(f"migration {name}: version {version}, expected {expected}")
+        MIGRATIONS.append(Migration(version, name, upgrade))
+        return upgrade
+
+    return register
+
+
+# ========== 迁移 ==========
+
+# 采集脚本早期版本创建的表缺少的列（原 fetch_data.ensure_schema_upgraded）
+_LEGACY_COLUMNS = [
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS block_number BIGINT",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS block_hash VARCHAR(66)",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS transaction_index INTEGER",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS sender VARCHAR(66)",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS recipient VARCHAR(66)",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS sqrt_price_x96 NUMERIC",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS liquidity NUMERIC",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS tick INTEGER",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS gas_price_wei NUMERIC",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS gas_used NUMERIC",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS gas_fee_eth DOUBLE PRECISION",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS fee_amount DOUBLE PRECISION",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS slippage_bps DOUBLE PRECISION",
+    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS log_index INTEGER",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS open_time TIMESTAMPTZ",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS close_time TIMESTAMPTZ",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS open_price DOUBLE PRECISION",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS high_price DOUBLE PRECISION",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS low_price DOUBLE PRECISION",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS close_price DOUBLE PRECISION",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS quote_volume DOUBLE PRECISION",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS number_of_trades BIGINT",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS taker_buy_base_volume DOUBLE PRECISION",
+    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS taker_buy_quote_volume DOUBLE PRECISION",
+]
+
+
+# 基线结构：初始版本（c35b52d）的四张表，以及引入迁移之前脚本启动时 create_all 建立的
+# data_generation、arbitrage_summary 与套利行为的 keyset 分页索引
+_BASELINE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS uniswap_swaps (
+        id SERIAL NOT NULL,
+        transaction_hash VARCHAR,
+        log_index INTEGER,
+        timestamp TIMESTAMP WITHOUT TIME ZONE,
+        amount0 FLOAT,
+        amount1 FLOAT,
+        price FLOAT,
+        block_number BIGINT,
+        block_hash VARCHAR,
+        transaction_index INTEGER,
+        sender VARCHAR,
+        recipient VARCHAR,
+        sqrt_price_x96 NUMERIC(50, 0),
+        liquidity NUMERIC(40, 0),
+        tick INTEGER,
+        gas_price_wei NUMERIC(40, 0),
+        gas_used NUMERIC(40, 0),
+        gas_fee_eth FLOAT,
+        fee_amount FLOAT,
+        slippage_bps FLOAT,
+        PRIMARY KEY (id),
+        CONSTRAINT _tx_hash_log_index_uc UNIQUE (transaction_hash, log_index)
+    )""",
+    """CREATE TABLE IF NOT EXISTS binance_trades (
+        id BIGSERIAL NOT NULL,
+        timestamp TIMESTAMP WITHOUT TIME ZONE,
+        price FLOAT,
+        quantity FLOAT,
+        open_time TIMESTAMP WITHOUT TIME ZONE,
+        close_time TIMESTAMP WITHOUT TIME ZONE,
+        open_price FLOAT,
+        high_price FLOAT,
+        low_price FLOAT,
+        close_price FLOAT,
+        quote_volume FLOAT,
+        number_of_trades BIGINT,
+        taker_buy_base_volume FLOAT,
+        taker_buy_quote_volume FLOAT,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS arbitrage_opportunities (
+        id SERIAL NOT NULL,
+        transaction_hash VARCHAR,
+        uniswap_log_index INTEGER,
+        binance_trade_id BIGINT,
+        timestamp TIMESTAMP WITHOUT TIME ZONE,
+        buy_timestamp TIMESTAMP WITHOUT TIME ZONE,
+        sell_timestamp TIMESTAMP WITHOUT TIME ZONE,
+        uniswap_price FLOAT,
+        binance_price FLOAT,
+        price_diff_percent FLOAT,
+        profit FLOAT,
+        profit_rate FLOAT,
+        volume FLOAT,
+        relative_spread FLOAT,
+        direction VARCHAR,
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS arbitrage_opportunities_minute (
+        id SERIAL NOT NULL,
+        timestamp TIMESTAMP WITHOUT TIME ZONE,
+        uniswap_price FLOAT,
+        binance_price FLOAT,
+        price_diff_percent FLOAT,
+        profit FLOAT,
+        profit_rate FLOAT,
+        direction VARCHAR,
+        uniswap_trade_count INTEGER,
+        binance_trade_count INTEGER,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS data_generation (
+        id SERIAL NOT NULL,
+        generation BIGINT NOT NULL,
+        updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS arbitrage_summary (
+        id SERIAL NOT NULL,
+        bucket VARCHAR NOT NULL,
+        bucket_key VARCHAR NOT NULL,
+        total_opportunities BIGINT NOT NULL,
+        total_profit FLOAT NOT NULL,
+        profit_rate_sum FLOAT NOT NULL,
+        updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        PRIMARY KEY (id),
+        CONSTRAINT _arbitrage_summary_bucket_uc UNIQUE (bucket, bucket_key)
+    )""",
+]
+
+# 已有的表不会被 CREATE TABLE 补建索引，逐个补齐
+_BASELINE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_id ON uniswap_swaps (id)",
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_transaction_hash ON uniswap_swaps (transaction_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_timestamp ON uniswap_swaps (timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_block_number ON uniswap_swaps (block_number)",
+    "CREATE INDEX IF NOT EXISTS ix_binance_trades_id ON binance_trades (id)",
+    "CREATE INDEX IF NOT EXISTS ix_binance_trades_timestamp ON binance_trades (timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_id ON arbitrage_opportunities (id)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_transaction_hash "
+    "ON arbitrage_opportunities (transaction_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_timestamp ON arbitrage_opportunities (timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_profit_id ON arbitrage_opportunities (profit, id)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_buy_timestamp_id "
+    "ON arbitrage_opportunities (buy_timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_sell_timestamp_id "
+    "ON arbitrage_opportunities (sell_timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_arbitrage_opportunities_minute_id ON arbitrage_opportunities_minute (id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_arbitrage_opportunities_minute_timestamp "
+    "ON arbitrage_opportunities_minute (timestamp)",
+]
+
+
+@migration(1, "baseline")
+def _baseline(conn: Connection) -> None:
+    """引入迁移之前的库：补齐缺失的表、旧版采集脚本缺少的列，以及已有表缺少的索引。"""
+    for statement in _BASELINE_TABLES + _LEGACY_COLUMNS + _BASELINE_INDEXES:
+        conn.execute(text(statement))
+
+
+# 分区后的约束与索引（与 models 中 UniswapSwap / BinanceTrade 的定义一致）
+_PARTITIONED_SCHEMA = {
+    "uniswap_swaps": [
+        "ALTER TABLE uniswap_swaps ADD PRIMARY KEY (id, timestamp)",
+        "ALTER TABLE uniswap_swaps ADD CONSTRAINT _tx_hash_log_index_uc "
+        "UNIQUE (transaction_hash, log_index, timestamp)",
+        "CREATE INDEX ix_uniswap_swaps_id ON uniswap_swaps (id)",
+        "CREATE INDEX ix_uniswap_swaps_timestamp ON uniswap_swaps (timestamp)",
+        "CREATE INDEX ix_uniswap_swaps_transaction_hash ON uniswap_swaps (transaction_hash)",
+        "CREATE INDEX ix_uniswap_swaps_block_number ON uniswap_swaps (block_number)",
+    ],
+    "binance_trades": [
+        "ALTER TABLE binance_trades ADD PRIMARY KEY (id, timestamp)",
+        "CREATE INDEX ix_binance_trades_id ON binance_trades (id)",
+        "CREATE INDEX ix_binance_trades_timestamp ON binance_trades (timestamp)",
+    ],
+}
+
+
+@migration(2, "partition_raw_tables")
+def _partition_raw_tables(conn: Connection) -> None:
+    """
+    将 uniswap_swaps / binance_trades 改为按月分区的表：
+    旧表改名（连同索引），按旧表的列建分区父表和 DEFAULT 分区，先建好数据覆盖的月分区再整体复制，
+    id 序列转给新表继续使用。复制在迁移事务内完成，耗时与表大小成正比。
+    """
+    for table, statements in _PARTITIONED_SCHEMA.items():
+        if conn.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"), {"name": table}
+        ).scalar():
+            continue
+        missing = conn.execute(text(f"SELECT count(*) FROM {table} WHERE timestamp IS NULL")).scalar()
+        if missing:
+            raise RuntimeError(f"{table} 有 {missing} 行 timestamp 为空，无法分区；请先清理这些行")
+
+        legacy = f"{table}_unpartitioned"
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        index_names = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE i.indrelid = to_regclass(:name)"
+            ),
+            {"name": legacy},
+        ).scalars().all()
+        for index_name in index_names:
+            conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_unpartitioned"'))
+
+        # LIKE 保留旧表的列顺序与类型，id 的默认值仍指向原序列
+        conn.execute(text(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+        ))
+        for statement in statements:
+            conn.execute(text(statement))
+        conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+        # 数据覆盖的每个月一个分区（{table}_pYYYYMM）；之后的月份由 app/partitions.py 在运行时创建
+        months = conn.execute(text(
+            "SELECT to_char(month, 'YYYYMM'), to_char(month, 'YYYY-MM-DD'), "
+            "to_char(month + interval '1 month', 'YYYY-MM-DD') "
+            f"FROM generate_series((SELECT date_trunc('month', min(timestamp)) FROM {legacy}), "
+            f"(SELECT date_trunc('month', max(timestamp)) FROM {legacy}), interval '1 month') AS month"
+        )).all()
+        for suffix, low, high in months:
+            conn.execute(text(
+                f"CREATE TABLE {table}_p{suffix} PARTITION OF {table} FOR VALUES FROM ('{low}') TO ('{high}')"
+            ))
+        conn.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:name, 'id')"), {"name": legacy}).scalar()
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+# 被覆盖索引 / 复合索引取代，或与主键、唯一约束前缀重复的单列索引
+_SUPERSEDED_INDEXES = [
+    "ix_uniswap_swaps_id",
+    "ix_uniswap_swaps_transaction_hash",
+    "ix_uniswap_swaps_timestamp",
+    "ix_uniswap_swaps_block_number",
+    "ix_binance_trades_id",
+    "ix_binance_trades_timestamp",
+]
+
+
+_QUERY_SHAPED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_timestamp_covering "
+    "ON uniswap_swaps (timestamp) INCLUDE (price, amount1)",
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_timestamp_brin ON uniswap_swaps USING brin (timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_uniswap_swaps_block_order "
+    "ON uniswap_swaps (block_number, transaction_index, log_index)",
+    "CREATE INDEX IF NOT EXISTS ix_binance_trades_timestamp_covering "
+    "ON binance_trades (timestamp) INCLUDE (price, quantity)",
+    "CREATE INDEX IF NOT EXISTS ix_binance_trades_timestamp_brin ON binance_trades USING brin (timestamp)",
+]
+
+
+@migration(3, "query_shaped_indexes")
+def _query_shaped_indexes(conn: Connection) -> None:
+    """原始成交表改用覆盖索引、BRIN 与 (block_number, transaction_index, log_index) 复合索引。"""
+    for statement in [f"DROP INDEX IF EXISTS {name}" for name in _SUPERSEDED_INDEXES] + _QUERY_SHAPED_INDEXES:
+        conn.execute(text(statement))
+
+
+# uniswap_swaps 列 -> (目标类型, USING 表达式)；见 app/types.py
+_COMPACT_COLUMNS = {
+    "transaction_hash": ("bytea", "decode(regexp_replace({col}, '^0x', ''), 'hex')"),
+    "block_hash": ("bytea", "decode(regexp_replace({col}, '^0x', ''), 'hex')"),
+    "sender": ("bytea", "decode(regexp_replace({col}, '^0x', ''), 'hex')"),
+    "recipient": ("bytea", "decode(regexp_replace({col}, '^0x', ''), 'hex')"),
+    "sqrt_price_x96": ("bytea", "pg_temp.uint_to_bytea({col}, 20)"),
+    "liquidity": ("bytea", "pg_temp.uint_to_bytea({col}, 16)"),
+    "gas_price_wei": ("bigint", "{col}::bigint"),
+    "gas_used": ("bigint", "{col}::bigint"),
+}
+
+# numeric -> 定长大端 bytea（逐字节取 div / mod，numeric 运算是精确的）
+_UINT_TO_BYTEA = """
+CREATE FUNCTION pg_temp.uint_to_bytea(n numeric, width int) RETURNS bytea
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT decode(string_agg(lpad(to_hex(mod(div(n, 256::numeric ^ (width - 1 - i)), 256)::int), 2, '0'), ''
+                             ORDER BY i), 'hex')
+    FROM generate_series(0, width - 1) AS i
+$$
+"""
+
+
+@migration(4, "compact_swap_columns")
+def _compact_swap_columns(conn: Connection) -> None:
+    """uniswap_swaps 的地址 / 哈希改存原始字节，uint160 / uint128 改存定长字节，gas 改存 bigint。"""
+    current = dict(conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'uniswap_swaps'"
+    )).all())
+    pending = {
+        column: (target, using)
+        for column, (target, using) in _COMPACT_COLUMNS.items()
+        if current.get(column) not in (None, target)
+    }
+    if not pending:
+        return
+    conn.execute(text(_UINT_TO_BYTEA))
+    # 一条 ALTER TABLE 只重写一次表；分区表上的修改会递归到所有分区
+    conn.execute(text("ALTER TABLE uniswap_swaps " + ", ".join(
+        f"ALTER COLUMN {column} TYPE {target} USING {using.format(col=column)}"
+        for column, (target, using) in pending.items()
+    )))
+    conn.execute(text("DROP FUNCTION pg_temp.uint_to_bytea(numeric, int)"))
+    conn.execute(text("ANALYZE uniswap_swaps"))
+
+
+@migration(5, "pipeline_watermarks")
+def _pipeline_watermarks(conn: Connection) -> None:
+    """增量流水线的阶段水位表。"""
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS pipeline_watermarks (
+        stage VARCHAR NOT NULL,
+        uniswap_watermark TIMESTAMP WITHOUT TIME ZONE,
+        binance_watermark TIMESTAMP WITHOUT TIME ZONE,
+        uniswap_rows BIGINT NOT NULL,
+        binance_rows BIGINT NOT NULL,
+        mode VARCHAR,
+        seconds FLOAT,
+        updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        PRIMARY KEY (stage)
+    )"""))
+
+
+@migration(6, "data_changes")
+def _data_changes(conn: Connection) -> None:
+    """数据变更事件表；流水线水位记录已处理到的事件。"""
+    for statement in (
+        """CREATE TABLE IF NOT EXISTS data_changes (
+            id BIGSERIAL NOT NULL,
+            generation BIGINT NOT NULL,
+            table_name VARCHAR NOT NULL,
+            start_time TIMESTAMP WITHOUT TIME ZONE,
+            end_time TIMESTAMP WITHOUT TIME ZONE,
+            rows BIGINT,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            PRIMARY KEY (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_data_changes_generation ON data_changes (generation)",
+        "CREATE INDEX IF NOT EXISTS ix_data_changes_created_at ON data_changes (created_at)",
+        "ALTER TABLE pipeline_watermarks ADD COLUMN IF NOT EXISTS change_id BIGINT",
+    ):
+        conn.execute(text(statement))
+
+
+@migration(7, "block_timestamps")
+def _block_timestamps(conn: Connection) -> None:
+    """本地区块时间索引的锚点表，用已有 swap 的 (block_number, timestamp) 填充。"""
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS block_timestamps (
+        block_number BIGINT NOT NULL,
+        timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        source VARCHAR(16) NOT NULL,
+        PRIMARY KEY (block_number)
+    )"""))
+    conn.execute(text(
+        "INSERT INTO block_timestamps (block_number, timestamp, source) "
+        "SELECT block_number, min(timestamp), 'swap' FROM uniswap_swaps "
+        "WHERE block_number IS NOT NULL AND timestamp IS NOT NULL "
+        "GROUP BY block_number ON CONFLICT (block_number) DO NOTHING"
+    ))
+
+
+@migration(8, "data_change_prune_horizon")
+def _data_change_prune_horizon(conn: Connection) -> None:
+    """记录变更事件的清理位置；已有的事件可能已被清理过，以现存最小 id 之前（表为空时为已分配的最大 id）作为初始位置。"""
+    conn.execute(text(
+        "ALTER TABLE data_generation ADD COLUMN IF NOT EXISTS pruned_change_id BIGINT NOT NULL DEFAULT 0"
+    ))
+    conn.execute(text(
+        "UPDATE data_generation SET pruned_change_id = coalesce("
+        "(SELECT min(id) - 1 FROM data_changes), "
+        "pg_sequence_last_value(pg_get_serial_sequence('data_changes', 'id')::regclass), 0)"
+    ))
+
+
+_SUMMARY_COLUMNS = "bucket, bucket_key, total_opportunities, total_profit, profit_rate_sum, profit_rate_count"
+_SUMMARY_SUMS = (
+    "coalesce(sum(total_opportunities), 0), coalesce(sum(total_profit), 0.0), "
+    "coalesce(sum(profit_rate_sum), 0.0), coalesce(sum(profit_rate_count), 0)"
+)
+# 明细行（"YYYY-MM-DD|方向"）由候选表聚合，total / day / direction 三种分桶再由明细行汇总
+_SUMMARY_REBUILD = [
+    f"INSERT INTO arbitrage_summary ({_SUMMARY_COLUMNS}) "
+    "SELECT 'day_direction', concat(coalesce(timestamp::date::varchar, ''), '|', coalesce(direction, 'unknown')), "
+    "count(id), coalesce(sum(profit), 0.0), coalesce(sum(profit_rate), 0.0), count(profit_rate) "
+    "FROM arbitrage_opportunities GROUP BY 2",
+    f"INSERT INTO arbitrage_summary ({_SUMMARY_COLUMNS}) "
+    f"SELECT 'total', 'all', {_SUMMARY_SUMS} FROM arbitrage_summary WHERE bucket = 'day_direction'",
+    f"INSERT INTO arbitrage_summary ({_SUMMARY_COLUMNS}) "
+    f"SELECT 'day', split_part(bucket_key, '|', 1), {_SUMMARY_SUMS} FROM arbitrage_summary "
+    "WHERE bucket = 'day_direction' AND split_part(bucket_key, '|', 1) != '' GROUP BY 2",
+    f"INSERT INTO arbitrage_summary ({_SUMMARY_COLUMNS}) "
+    f"SELECT 'direction', split_part(bucket_key, '|', 2), {_SUMMARY_SUMS} FROM arbitrage_summary "
+    "WHERE bucket = 'day_direction' GROUP BY 2",
+]
+
+
+@migration(9, "summary_profit_rate_count")
+def _summary_profit_rate_count(conn: Connection) -> None:
+    """汇总表记录利润率非空的候选数，并改为由按天 × 方向的明细行汇总；按新结构重建全部汇总行。"""
+    for statement in [
+        "ALTER TABLE arbitrage_summary ADD COLUMN IF NOT EXISTS profit_rate_count BIGINT NOT NULL DEFAULT 0",
+        "DELETE FROM arbitrage_summary",
+    ] + _SUMMARY_REBUILD:
+        conn.execute(text(statement))
+
+
+@migration(10, "pipeline_watermark_rows_optional")
+def _pipeline_watermark_rows_optional(conn: Connection) -> None:
+    """流水线默认不再统计原始表行数，水位中的行数允许为空。"""
+    conn.execute(text(
+        "ALTER TABLE pipeline_watermarks "
+        "ALTER COLUMN uniswap_rows DROP NOT NULL, ALTER COLUMN binance_rows DROP NOT NULL"
+    ))
+
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ========== 执行 ==========
+
+def current_version(conn: Connection) -> Optional[int]:
+    """已应用的最高版本；还没有 schema_migrations 表时返回 None。"""
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": SCHEMA_MIGRATIONS_TABLE}).scalar() is None:
+        return None
+    return conn.execute(text(f"SELECT max(version) FROM {SCHEMA_MIGRATIONS_TABLE}")).scalar()
+
+
+def _is_empty_database(conn: Connection) -> bool:
+    for table in models.Base.metadata.tables:
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": table}).scalar() is not None:
+            return False
+    return True
+
+
+def _record(conn: Connection, migration_: Migration) -> None:
+    conn.execute(
+        text(f"INSERT INTO {SCHEMA_MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+        {"version": migration_.version, "name": migration_.name},
+    )
+
+
+def upgrade(engine: Engine, verbose: bool = True) -> List[int]:
+    """执行所有未应用的迁移，返回本次应用的版本号。"""
+    applied: List[int] = []
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.commit()
+        try:
+            with conn.begin():
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {SCHEMA_MIGRATIONS_TABLE} ("
+                    "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+                    "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+                ))
+                version = current_version(conn) or 0
+                if version == 0 and _is_empty_database(conn):
+                    # 空库：按当前模型建表，直接记录为最新版本
+                    models.Base.metadata.create_all(bind=conn)
+                    _record(conn, MIGRATIONS[-1])
+                    applied = [LATEST_VERSION]
+                    if verbose:
+                        print(f"已按当前模型创建数据库结构（版本 {LATEST_VERSION}）")
+                    return applied
+
+            for migration_ in MIGRATIONS:
+                if migration_.version <= version:
+                    continue
+                if verbose:
+                    print(f"应用迁移 {migration_.version:04d}_{migration_.name} ...")
+                with conn.begin():
+                    migration_.upgrade(conn)
+                    _record(conn, migration_)
+                applied.append(migration_.version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.commit()
+    return applied
+
+
+def ensure_current(engine: Engine) -> None:
+    """脚本启动时调用：结构已是最新时只执行一次版本查询。"""
+    with engine.connect() as conn:
+        if current_version(conn) == LATEST_VERSION:
+            return
+    upgrade(engine)
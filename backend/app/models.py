@@ -6,42 +6,63 @@ from sqlalchemy import (
     DateTime,
     BigInteger,
     UniqueConstraint,
+    Index,
     func,
-    Numeric,
+    DDL,
+    event,
+    text,
 )
 from .database import Base
+from .types import HexBinary, UnsignedBinary
+
+# 原始成交表按 timestamp 做月度范围分区（见 app/partitions.py）。
+# 分区表的主键 / 唯一约束必须包含分区键，因此 timestamp 加入主键和 (transaction_hash, log_index) 唯一约束
+RAW_TABLE_PARTITIONING = {"postgresql_partition_by": "RANGE (timestamp)"}
 
 # 示例模型：存储 Uniswap V3 的 Swap 事件
 class UniswapSwap(Base):
     __tablename__ = "uniswap_swaps"
-    id = Column(Integer, primary_key=True, index=True)
-    transaction_hash = Column(String, index=True) # A transaction can have multiple swaps
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 地址 / 哈希存为原始字节，uint160 / uint128 存为定长字节，gas 存为 bigint（见 app/types.py）；
+    # Python 侧仍是 "0x..." 字符串与 int
+    transaction_hash = Column(HexBinary(32)) # A transaction can have multiple swaps
     log_index = Column(Integer) # Log index within the block, to uniquely identify the event
-    timestamp = Column(DateTime, index=True)
+    timestamp = Column(DateTime, primary_key=True)
     amount0 = Column(Float) # (例如 USDT)
     amount1 = Column(Float) # (例如 ETH)
     price = Column(Float)   # (USDT/ETH)
-    block_number = Column(BigInteger, index=True)
-    block_hash = Column(String)
+    block_number = Column(BigInteger)
+    block_hash = Column(HexBinary(32))
     transaction_index = Column(Integer)
-    sender = Column(String)
-    recipient = Column(String)
-    sqrt_price_x96 = Column(Numeric(precision=50, scale=0))
-    liquidity = Column(Numeric(precision=40, scale=0))
+    sender = Column(HexBinary(20))
+    recipient = Column(HexBinary(20))
+    sqrt_price_x96 = Column(UnsignedBinary(160, precision=50))
+    liquidity = Column(UnsignedBinary(128, precision=40))
     tick = Column(Integer)
-    gas_price_wei = Column(Numeric(precision=40, scale=0))
-    gas_used = Column(Numeric(precision=40, scale=0))
+    gas_price_wei = Column(BigInteger, info={"export_precision": 40})
+    gas_used = Column(BigInteger, info={"export_precision": 40})
     gas_fee_eth = Column(Float)
     fee_amount = Column(Float)
     slippage_bps = Column(Float)
 
-    __table_args__ = (UniqueConstraint('transaction_hash', 'log_index', name='_tx_hash_log_index_uc'),)
+    # 索引按查询形状设计（app/query_plans.py 中的 EXPLAIN 检查逐条对应）：
+    # - 主键 (id, timestamp) 以 id 开头，实时推送按 id 增量读取；唯一约束以 transaction_hash 开头，采集去重按哈希查找；
+    # - 覆盖索引：按时间范围聚合 price / amount1（日线、分钟聚合、降采样）只读索引，不回表；
+    # - BRIN：按时间顺序追加写入，大范围读取整行（导出整月）时只需很小的块范围摘要；
+    # - (block_number, transaction_index, log_index)：compute_arbitrage 按链上顺序加载，不需要排序
+    __table_args__ = (
+        UniqueConstraint('transaction_hash', 'log_index', 'timestamp', name='_tx_hash_log_index_uc'),
+        Index('ix_uniswap_swaps_timestamp_covering', 'timestamp', postgresql_include=['price', 'amount1']),
+        Index('ix_uniswap_swaps_timestamp_brin', 'timestamp', postgresql_using='brin'),
+        Index('ix_uniswap_swaps_block_order', 'block_number', 'transaction_index', 'log_index'),
+        RAW_TABLE_PARTITIONING,
+    )
 
 # 示例模型：存储 Binance 的成交数据
 class BinanceTrade(Base):
     __tablename__ = "binance_trades"
-    id = Column(BigInteger, primary_key=True, index=True) # Binance trade ID 很大
-    timestamp = Column(DateTime, index=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True) # Binance trade ID 很大
+    timestamp = Column(DateTime, primary_key=True)
     price = Column(Float)
     quantity = Column(Float)
     open_time = Column(DateTime)
@@ -55,6 +76,19 @@ class BinanceTrade(Base):
     taker_buy_base_volume = Column(Float)
     taker_buy_quote_volume = Column(Float)
 
+    # 与 uniswap_swaps 相同：覆盖日线 / 分钟聚合所需的 price、quantity，大范围整行读取走 BRIN
+    __table_args__ = (
+        Index('ix_binance_trades_timestamp_covering', 'timestamp', postgresql_include=['price', 'quantity']),
+        Index('ix_binance_trades_timestamp_brin', 'timestamp', postgresql_using='brin'),
+        RAW_TABLE_PARTITIONING,
+    )
+
+# 建表时同时创建 DEFAULT 分区，没有对应月分区的行先写入这里，之后由 ensure_partitions 移入月分区
+for _raw_table in (UniswapSwap.__table__, BinanceTrade.__table__):
+    event.listen(
+        _raw_table, "after_create", DDL("CREATE TABLE %(table)s_default PARTITION OF %(table)s DEFAULT")
+    )
+
 class ArbitrageOpportunity(Base):
     __tablename__ = "arbitrage_opportunities"
 
@@ -75,6 +109,13 @@ class ArbitrageOpportunity(Base):
     direction = Column(String, nullable=True)  # "cex->dex" or "dex->cex"
     created_at = Column(DateTime, server_default=func.now())
 
+    # /api/arbitrage/behaviors 的排序与 keyset 分页路径：(排序列, id)
+    __table_args__ = (
+        Index('ix_arbitrage_opportunities_profit_id', 'profit', 'id'),
+        Index('ix_arbitrage_opportunities_buy_timestamp_id', 'buy_timestamp', 'id'),
+        Index('ix_arbitrage_opportunities_sell_timestamp_id', 'sell_timestamp', 'id'),
+    )
+
 class ArbitrageOpportunityMinute(Base):
     """
     按分钟预计算的套利机会
@@ -92,3 +133,83 @@ class ArbitrageOpportunityMinute(Base):
     direction = Column(String)  # "cex->dex" or "dex->cex"
     uniswap_trade_count = Column(Integer)  # 该分钟 Uniswap 交易数量
     binance_trade_count = Column(Integer)  # 该分钟 Binance 交易数量
+
+
+class DataGeneration(Base):
+    """
+    数据版本计数器（单行表）
+    采集与计算脚本每次提交数据时递增，API 据此使响应缓存失效
+    """
+    __tablename__ = "data_generation"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now())
+    # 变更事件（data_changes）的清理位置：id 不超过它的事件可能已被删除
+    pruned_change_id = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
+
+class ArbitrageSummary(Base):
+    """
+    arbitrage_opportunities 的预聚合统计
+    由 compute_arbitrage 写入时刷新；bucket 为 "total"（bucket_key="all"）、"day"（YYYY-MM-DD）或 "direction"，
+    以及汇总出这三种分桶的明细行 "day_direction"（"YYYY-MM-DD|方向"）
+    """
+    __tablename__ = "arbitrage_summary"
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String, nullable=False)
+    bucket_key = Column(String, nullable=False)
+    total_opportunities = Column(BigInteger, nullable=False, default=0)
+    total_profit = Column(Float, nullable=False, default=0.0)
+    profit_rate_sum = Column(Float, nullable=False, default=0.0)  # 利润率之和（小数），平均值 = profit_rate_sum / profit_rate_count
+    profit_rate_count = Column(BigInteger, nullable=False, default=0, server_default=text("0"))  # profit_rate 不为空的候选数
+    updated_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (UniqueConstraint('bucket', 'bucket_key', name='_arbitrage_summary_bucket_uc'),)
+
+
+class PipelineWatermark(Base):
+    """
+    增量流水线（app/scripts/pipeline.py）各计算阶段上次成功运行时处理到的输入位置：
+    两张原始表的最大 timestamp，以及当时不晚于该时间的行数（只在 --check-rows 时统计，用于发现未发布事件的回补 / 删除）
+    """
+    __tablename__ = "pipeline_watermarks"
+
+    stage = Column(String, primary_key=True)
+    uniswap_watermark = Column(DateTime, nullable=True)
+    binance_watermark = Column(DateTime, nullable=True)
+    uniswap_rows = Column(BigInteger, nullable=True)  # 为空表示上次运行没有统计
+    binance_rows = Column(BigInteger, nullable=True)
+    change_id = Column(BigInteger, nullable=True)  # 已处理到的 data_changes.id
+    mode = Column(String, nullable=True)  # 上次运行方式：full / incremental
+    seconds = Column(Float, nullable=True)  # 上次运行耗时
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class DataChange(Base):
+    """
+    数据变更事件（outbox，见 app/changes.py）
+    写入数据的脚本在同一事务内记录变化的表与时间范围，generation 为该事务递增后的数据版本；
+    流水线据此只重算受影响的范围，API 据此只淘汰受影响的缓存条目
+    """
+    __tablename__ = "data_changes"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    generation = Column(BigInteger, nullable=False, index=True)
+    table_name = Column(String, nullable=False)
+    start_time = Column(DateTime, nullable=True)  # 为空表示范围无下界（如全量重算、删表）
+    end_time = Column(DateTime, nullable=True)  # 为空表示范围无上界
+    rows = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+
+
+class BlockTimestamp(Base):
+    """
+    区块号与区块时间（naive UTC），本地区块时间索引的锚点（见 app/blocktime.py）
+    source：swap 来自 uniswap_swaps 中已有的区块，header 为校验时获取的区块头
+    """
+    __tablename__ = "block_timestamps"
+
+    block_number = Column(BigInteger, primary_key=True, autoincrement=False)
+    timestamp = Column(DateTime, nullable=False)
+    source = Column(String(16), nullable=False)
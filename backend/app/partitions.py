@@ -0,0 +1,183 @@
+"""
+原始成交表（uniswap_swaps、binance_trades）按 timestamp 的月度分区（PostgreSQL 声明式分区）。
+
+- 每张表有一个 DEFAULT 分区兜底（建表时由 models 中的 after_create 事件创建），缺少月分区时写入也不会失败；
+- ensure_partitions 为指定时间范围、DEFAULT 分区中已有数据的月份以及当前月之后 PARTITION_PREMAKE_MONTHS
+  个月创建月分区。新分区先建成普通表，把 DEFAULT 中属于该月的行移过去，再 ATTACH 到父表——
+  ATTACH 对父表只加 SHARE UPDATE EXCLUSIVE 锁，不阻塞 API 的读取；
+- detach_partitions_before 把较早的月份 DETACH 为普通表（改名为 `{table}_archive_YYYYMM`），
+  之后可以单独归档或 DROP，不需要对大表执行 DELETE。
+
+带 timestamp 范围条件的查询（日线聚合、compute_opportunities 的分钟聚合、增量采集的 max(timestamp)）
+由规划器裁剪到相关分区，查询代价只与范围内的月份有关，与历史总量无关。
+"""
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from . import models
+
+PARTITIONED_TABLES: Tuple[str, ...] = (
+    models.UniswapSwap.__tablename__,
+    models.BinanceTrade.__tablename__,
+)
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))  # 预先创建的未来月份数
+DEFAULT_SUFFIX = "_default"
+ARCHIVE_INFIX = "_archive_"
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+# ========== 月份与命名 ==========
+
+def month_start(dt: datetime) -> datetime:
+    """所在月份的第一天 0 点（naive UTC，与表中 timestamp 列一致）。"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def months_between(start: datetime, end: datetime) -> List[datetime]:
+    """[start, end] 覆盖的所有月份（含两端所在月份）。"""
+    months = []
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return table + DEFAULT_SUFFIX
+
+
+# ========== 查询 ==========
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(
+        conn.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"),
+            {"name": table},
+        ).scalar()
+    )
+
+
+def list_partitions(conn: Connection, table: str) -> List[Tuple[str, Optional[datetime]]]:
+    """返回 (分区名, 月份) 列表，按月份排序；DEFAULT 分区的月份为 None，排在最后。"""
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name)"
+        ),
+        {"name": table},
+    ).scalars()
+    partitions = []
+    for name in names:
+        match = _MONTH_SUFFIX.search(name)
+        partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1) if match else None))
+    return sorted(partitions, key=lambda item: (item[1] is None, item[1] or datetime.min))
+
+
+def _default_months(conn: Connection, table: str) -> Set[datetime]:
+    """DEFAULT 分区中已有数据的月份（正常情况下该分区为空，查询很快）。"""
+    default = default_partition_name(table)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar() is None:
+        return set()
+    rows = conn.execute(text(f"SELECT DISTINCT date_trunc('month', timestamp) FROM {default}")).scalars()
+    return {month_start(row) for row in rows if row is not None}
+
+
+# ========== 创建 / 分离 ==========
+
+def create_month_partition(conn: Connection, table: str, month: datetime) -> str:
+    """
+    创建并挂载一个月分区，同时把 DEFAULT 分区中属于该月的行移入。
+    挂载前加上与分区范围相同的 CHECK 约束，ATTACH 无需再扫描新分区验证范围。
+    """
+    month = month_start(month)
+    name = partition_name(table, month)
+    default = default_partition_name(table)
+    bounds = {"low": month, "high": add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    # DDL 不支持绑定参数，边界由 datetime 格式化得到
+    low, high = (f"'{bound:%Y-%m-%d}'" for bound in (bounds["low"], bounds["high"]))
+    conn.execute(text(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_range "
+        f"CHECK (timestamp IS NOT NULL AND timestamp >= {low} AND timestamp < {high})"
+    ))
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar() is not None:
+        conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default} WHERE timestamp >= :low AND timestamp < :high RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({low}) TO ({high})"))
+    conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_range"))
+    return name
+
+
+def ensure_partitions(
+    conn: Connection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    premake: int = PARTITION_PREMAKE_MONTHS,
+    tables: Sequence[str] = PARTITIONED_TABLES,
+) -> List[str]:
+    """
+    确保以下月份都有分区，返回新建的分区名：
+    [start, end] 覆盖的月份、DEFAULT 分区中已有数据的月份、当前月及之后 premake 个月。
+    已有全部分区时只执行几条目录查询，可以在每次脚本启动时调用。
+    """
+    current = month_start(datetime.now(timezone.utc))
+    wanted: Set[datetime] = set(months_between(current, add_months(current, premake)))
+    if start is not None or end is not None:
+        wanted.update(months_between(start or end, end or start))
+
+    created: List[str] = []
+    for table in tables:
+        if not is_partitioned(conn, table):
+            continue
+        existing = {month for _, month in list_partitions(conn, table) if month is not None}
+        for month in sorted((wanted | _default_months(conn, table)) - existing):
+            created.append(create_month_partition(conn, table, month))
+    return created
+
+
+def detach_partitions_before(
+    conn: Connection, before: datetime, drop: bool = False, tables: Iterable[str] = PARTITIONED_TABLES
+) -> List[str]:
+    """
+    分离早于 before 所在月份的月分区，返回处理过的分区名。
+    分离后的表改名为 `{table}_archive_YYYYMM`（drop=True 时直接删除），原分区名可以重新使用。
+    """
+    cutoff = month_start(before)
+    handled: List[str] = []
+    for table in tables:
+        if not is_partitioned(conn, table):
+            continue
+        for name, month in list_partitions(conn, table):
+            if month is None or month >= cutoff:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            else:
+                conn.execute(text(f"ALTER TABLE {name} RENAME TO {table}{ARCHIVE_INFIX}{month:%Y%m}"))
+            handled.append(name)
+    return handled
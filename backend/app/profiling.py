@@ -0,0 +1,222 @@
+"""
+批处理脚本（fetch_data / compute_opportunities / compute_arbitrage）的阶段计时与性能剖析。
+
+每个阶段记录墙钟时间、CPU 时间、处理行数（行/秒）和阶段结束时的 RSS / 进程 RSS 峰值；
+开启 --trace-memory 时额外记录阶段内 Python 分配的峰值（tracemalloc，会明显拖慢运行）。
+--profile 把整个运行的 cProfile 结果写为 pstats 文件，--report（或 RUN_REPORT_DIR）写出 JSON 运行报告，
+用于长期跟踪批处理性能。
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，只记录能取到的指标
+    resource = None
+
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR")  # 设置后每次运行都写出报告：{dir}/{script}-{时间}.json
+
+
+def git_commit() -> Optional[str]:
+    """当前代码的短提交号（不在 git 仓库中时为 None）。"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _format_bytes(value: Optional[int]) -> str:
+    return "-" if value is None else f"{value / 1024 / 1024:.1f} MB"
+
+
+class StageRecord:
+    """一个阶段的统计；在 with 块内设置 rows 即可得到行/秒。"""
+
+    def __init__(self, name: str, rows: Optional[int] = None):
+        self.name = name
+        self.rows = rows
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rss_bytes: Optional[int] = None
+        self.peak_rss_bytes: Optional[int] = None
+        self.tracemalloc_peak_bytes: Optional[int] = None
+        self.details: Dict[str, object] = {}  # 调用方附加的说明（如流水线阶段的运行方式），写入报告
+
+    def to_dict(self) -> Dict[str, object]:
+        record = {
+            "name": self.name,
+            "seconds": self.seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rows": self.rows,
+            "rows_per_second": self.rows / self.seconds if self.rows is not None and self.seconds else None,
+            "rss_bytes": self.rss_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "tracemalloc_peak_bytes": self.tracemalloc_peak_bytes,
+        }
+        if self.details:
+            record["details"] = self.details
+        return record
+
+
+class RunProfiler:
+    """
+    用法:
+        with RunProfiler("compute_arbitrage", report_path="run.json") as profiler:
+            with profiler.stage("load_swaps") as stage:
+                swaps = load(...)
+                stage.rows = len(swaps)
+
+    不进入 with 时 stage() 仍然计时并打印，只是不写报告、不做 cProfile，
+    因此可以作为默认参数传给被其他脚本复用的函数。
+    """
+
+    def __init__(
+        self,
+        script: str,
+        report_path: Optional[str] = None,
+        profile_path: Optional[str] = None,
+        trace_memory: bool = False,
+        verbose: bool = True,
+    ):
+        self.script = script
+        self.report_path = report_path
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.stages: List[StageRecord] = []
+        self._profiler: Optional[cProfile.Profile] = None
+        self._started_at: Optional[datetime] = None
+        self._wall_started = 0.0
+        self._cpu_started = 0.0
+        self._tracemalloc_peak = 0
+
+    @classmethod
+    def from_args(cls, script: str, args: argparse.Namespace) -> "RunProfiler":
+        report_path = args.report
+        if report_path is None and RUN_REPORT_DIR:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            report_path = os.path.join(RUN_REPORT_DIR, f"{script}-{stamp}.json")
+        return cls(script, report_path=report_path, profile_path=args.profile, trace_memory=args.trace_memory)
+
+    def __enter__(self) -> "RunProfiler":
+        self._started_at = datetime.now(timezone.utc)
+        self._wall_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            print(f"cProfile 结果已写入 {self.profile_path}（python -m pstats {self.profile_path} 查看）")
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._tracemalloc_peak = max(self._tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        if self.report_path:
+            self.write_report(self.report_path, "error" if exc_type else "ok")
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+        record = StageRecord(name, rows)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # 记下之前的峰值，再把峰值重置为当前占用，得到本阶段内的峰值
+            self._tracemalloc_peak = max(self._tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - wall_started
+            record.cpu_seconds = time.process_time() - cpu_started
+            record.rss_bytes = current_rss_bytes()
+            peak = peak_rss_bytes()
+            # ru_maxrss 的更新可能略滞后于 statm，峰值至少是当前值
+            record.peak_rss_bytes = max(peak, record.rss_bytes) if None not in (peak, record.rss_bytes) else peak
+            if tracing:
+                record.tracemalloc_peak_bytes = tracemalloc.get_traced_memory()[1]
+            self.stages.append(record)
+            if self.verbose:
+                print(self._describe(record))
+
+    @staticmethod
+    def _describe(record: StageRecord) -> str:
+        parts = [f"  [{record.name}] {record.seconds:.2f}s (cpu {record.cpu_seconds:.2f}s)"]
+        if record.rows is not None:
+            rate = record.rows / record.seconds if record.seconds else 0.0
+            parts.append(f"{record.rows} 行 ({rate:.0f} 行/秒)")
+        parts.append(f"RSS {_format_bytes(record.rss_bytes)} / 峰值 {_format_bytes(record.peak_rss_bytes)}")
+        if record.tracemalloc_peak_bytes is not None:
+            parts.append(f"Python 分配峰值 {_format_bytes(record.tracemalloc_peak_bytes)}")
+        return ", ".join(parts)
+
+    def report(self, status: str = "ok") -> Dict[str, object]:
+        tracemalloc_peak = max(
+            [self._tracemalloc_peak]
+            + [stage.tracemalloc_peak_bytes for stage in self.stages if stage.tracemalloc_peak_bytes is not None]
+        )
+        return {
+            "script": self.script,
+            "status": status,
+            "started_at": self._started_at.isoformat() if self._started_at else None,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "wall_seconds": time.perf_counter() - self._wall_started if self._started_at else None,
+            "cpu_seconds": time.process_time() - self._cpu_started if self._started_at else None,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "tracemalloc_peak_bytes": tracemalloc_peak if self.trace_memory else None,
+            "argv": sys.argv[1:],
+            "git_commit": git_commit(),
+            "profile_path": self.profile_path,
+            "stages": [stage.to_dict() for stage in self.stages],
+        }
+
+    def write_report(self, path: str, status: str = "ok") -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(status), f, indent=2, ensure_ascii=False)
+        print(f"运行报告已写入 {path}")
+
+
+def add_profiling_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--report", help="运行报告 JSON 输出路径（默认写入 RUN_REPORT_DIR，未设置则不写）")
+    parser.add_argument("--profile", help="将 cProfile 结果写入该 pstats 文件")
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="用 tracemalloc 记录每个阶段的 Python 分配峰值（较慢）"
+    )
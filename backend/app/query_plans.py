@@ -0,0 +1,318 @@
+"""
+热点查询的执行计划检查。
+
+每个 PlanCheck 对应代码中的一条热点查询（SQL 与所注明函数中的查询形状相同），并声明它应该使用的索引。
+check_plan 执行 EXPLAIN (FORMAT JSON) 并收集计划中用到的索引：分区上的索引换算为父表上的索引名，
+与 models 中的 Index 定义一一对应。规划器只在数据量足够时才会选用索引，因此应在接近真实规模的数据上运行
+（例如 generate_synthetic --days 30 --swaps-per-day 20000），见 app.scripts.check_query_plans。
+
+QueryRecorder 与 plan_problems 供 app.scripts.plan_regression 使用：记录 API 与计算脚本实际发出的每条 SELECT，
+逐条 EXPLAIN (ANALYZE, BUFFERS)，报告大表上的顺序扫描和扫描节点严重偏离的行数估计。
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+from .partitions import month_start
+
+# 窄范围：最近 NARROW_WINDOW_DAYS 天（日线 / 分钟聚合的典型范围）
+NARROW_WINDOW_DAYS = 7
+# 宽范围：最新月份中除前 WIDE_WINDOW_SKIP 比例以外的数据（接近整个分区）
+WIDE_WINDOW_SKIP = 0.1
+
+LARGE_TABLE_ROWS = 10_000  # 表（分区）的行数估计达到该值时，顺序扫描视为问题
+ESTIMATE_FACTOR = 100  # 扫描节点的估计行数与实际行数相差超过该倍数时视为问题
+ESTIMATE_MIN_ROWS = 1_000  # 估计与实际都小于该值时不检查（小结果集的误差不影响计划选择）
+
+
+@dataclass(frozen=True)
+class PlanCheck:
+    name: str
+    source: str  # 对应的代码位置
+    sql: str
+    expected_index: str
+    index_only: bool = False  # 覆盖索引：要求 Index Only Scan，不回表
+
+
+@dataclass
+class PlanResult:
+    check: PlanCheck
+    indexes: List[str] = field(default_factory=list)
+    node_types: List[str] = field(default_factory=list)
+    plan: Optional[Dict[str, Any]] = None
+
+    @property
+    def problems(self) -> List[str]:
+        problems = []
+        if self.check.expected_index not in self.indexes:
+            used = ", ".join(self.indexes) or "无索引"
+            problems.append(f"期望使用 {self.check.expected_index}，实际: {used}")
+        elif self.check.index_only and "Index Only Scan" not in self.node_types:
+            problems.append("期望 Index Only Scan（覆盖索引），实际需要回表")
+        return problems
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+PLAN_CHECKS: List[PlanCheck] = [
+    PlanCheck(
+        "price_data_uniswap",
+        "main._daily_ohlcv (uniswap_swaps)",
+        "SELECT CAST(timestamp AS DATE) AS date, "
+        "(array_agg(price ORDER BY timestamp ASC))[1], min(price), max(price), "
+        "(array_agg(price ORDER BY timestamp DESC))[1], sum(abs(amount1)) "
+        "FROM uniswap_swaps WHERE timestamp >= :start AND timestamp <= :end "
+        "GROUP BY CAST(timestamp AS DATE) ORDER BY CAST(timestamp AS DATE)",
+        "ix_uniswap_swaps_timestamp_covering",
+        index_only=True,
+    ),
+    PlanCheck(
+        "price_data_binance",
+        "main._daily_ohlcv (binance_trades)",
+        "SELECT CAST(timestamp AS DATE) AS date, "
+        "(array_agg(price ORDER BY timestamp ASC))[1], min(price), max(price), "
+        "(array_agg(price ORDER BY timestamp DESC))[1], sum(quantity) "
+        "FROM binance_trades WHERE timestamp >= :start AND timestamp <= :end "
+        "GROUP BY CAST(timestamp AS DATE) ORDER BY CAST(timestamp AS DATE)",
+        "ix_binance_trades_timestamp_covering",
+        index_only=True,
+    ),
+    PlanCheck(
+        "minute_prices_uniswap",
+        "compute_opportunities (uniswap_minute_prices)",
+        "SELECT date_trunc('minute', timestamp), avg(price), count(*) FROM uniswap_swaps "
+        "WHERE timestamp >= :start AND timestamp <= :end GROUP BY date_trunc('minute', timestamp)",
+        "ix_uniswap_swaps_timestamp_covering",
+        index_only=True,
+    ),
+    PlanCheck(
+        "minute_prices_binance",
+        "compute_opportunities (binance_minute_prices)",
+        "SELECT date_trunc('minute', timestamp), avg(price), count(*) FROM binance_trades "
+        "WHERE timestamp >= :start AND timestamp <= :end GROUP BY date_trunc('minute', timestamp)",
+        "ix_binance_trades_timestamp_covering",
+        index_only=True,
+    ),
+    PlanCheck(
+        "series_buckets_uniswap",
+        "downsample.fine_bucket_statement (uniswap_swaps)",
+        "SELECT floor(CAST(extract(epoch FROM timestamp) AS FLOAT) / 60) AS bucket, "
+        "avg(CAST(extract(epoch FROM timestamp) AS FLOAT)), avg(price), min(price), max(price) "
+        "FROM uniswap_swaps WHERE timestamp >= :start AND timestamp <= :end AND price IS NOT NULL "
+        "GROUP BY bucket ORDER BY bucket",
+        "ix_uniswap_swaps_timestamp_covering",
+        index_only=True,
+    ),
+    PlanCheck(
+        "latest_swap_timestamp",
+        "fetch_data.get_latest_timestamp",
+        "SELECT max(timestamp) FROM uniswap_swaps",
+        "ix_uniswap_swaps_timestamp_covering",
+        index_only=True,
+    ),
+    PlanCheck(
+        "swap_dedupe",
+        "fetch_data.fetch_uniswap_data（按 transaction_hash + log_index 去重）",
+        "SELECT * FROM uniswap_swaps WHERE transaction_hash = :tx_hash AND log_index = :log_index LIMIT 1",
+        "_tx_hash_log_index_uc",
+    ),
+    PlanCheck(
+        "swaps_chain_order",
+        "compute_arbitrage.load_uniswap_swaps_with_metadata",
+        "SELECT * FROM uniswap_swaps ORDER BY block_number, transaction_index, log_index",
+        "ix_uniswap_swaps_block_order",
+    ),
+    PlanCheck(
+        "swaps_wide_range",
+        "不要求顺序的大范围整行读取（接近整个月分区）",
+        "SELECT * FROM uniswap_swaps WHERE timestamp >= :wide_start AND timestamp <= :end",
+        "ix_uniswap_swaps_timestamp_brin",
+    ),
+    PlanCheck(
+        "feed_new_swaps",
+        "main.FEED_CHANNELS uniswap_prices（按 id 增量推送）",
+        "SELECT id, timestamp, price, abs(amount1) FROM uniswap_swaps WHERE id > :last_id ORDER BY id LIMIT 500",
+        "uniswap_swaps_pkey",
+    ),
+    PlanCheck(
+        "behaviors_by_profit",
+        "main.get_arbitrage_behaviors (sort_by=profit)",
+        "SELECT id, buy_timestamp, sell_timestamp, profit FROM arbitrage_opportunities "
+        "ORDER BY profit DESC, id DESC LIMIT 11",
+        "ix_arbitrage_opportunities_profit_id",
+    ),
+    PlanCheck(
+        "behaviors_by_buy_time",
+        "main.get_arbitrage_behaviors (sort_by=buy_timestamp)",
+        "SELECT id, buy_timestamp, sell_timestamp, profit FROM arbitrage_opportunities "
+        "ORDER BY buy_timestamp DESC, id DESC LIMIT 11",
+        "ix_arbitrage_opportunities_buy_timestamp_id",
+    ),
+]
+
+
+def check_parameters(conn: Connection) -> Dict[str, Any]:
+    """根据库中已有的数据确定检查用的参数；uniswap_swaps 为空时抛出 ValueError。"""
+    latest = conn.execute(text("SELECT max(timestamp) FROM uniswap_swaps")).scalar()
+    if latest is None:
+        raise ValueError("uniswap_swaps 为空，先导入或生成数据")
+    month_first = conn.execute(
+        text("SELECT min(timestamp) FROM uniswap_swaps WHERE timestamp >= :month"),
+        {"month": month_start(latest)},
+    ).scalar()
+    sample = conn.execute(
+        text("SELECT transaction_hash, log_index FROM uniswap_swaps WHERE timestamp = :latest LIMIT 1"),
+        {"latest": latest},
+    ).one()
+    last_id = conn.execute(text("SELECT max(id) FROM uniswap_swaps")).scalar()
+    return {
+        "start": latest - timedelta(days=NARROW_WINDOW_DAYS),
+        "end": latest,
+        "wide_start": month_first + (latest - month_first) * WIDE_WINDOW_SKIP,
+        "tx_hash": sample.transaction_hash,
+        "log_index": sample.log_index,
+        "last_id": max(0, last_id - 100),
+    }
+
+
+def _walk(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def parent_relation_names(conn: Connection, names: Iterable[str]) -> Dict[str, str]:
+    """分区（或分区上的索引）名 -> 父表（或父表上的索引）名；不是分区时保持不变。"""
+    names = list(names)
+    if not names:
+        return {}
+    rows = conn.execute(
+        text(
+            "SELECT c.relname, coalesce(p.relname, c.relname) FROM pg_class c "
+            "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+            "LEFT JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE c.relname = ANY(:names)"
+        ),
+        {"names": names},
+    ).all()
+    return dict(rows)
+
+
+def plan_nodes(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return list(_walk(plan["Plan"]))
+
+
+def summarize_plan(conn: Connection, check: PlanCheck, plan: Dict[str, Any]) -> PlanResult:
+    nodes = plan_nodes(plan)
+    raw_indexes = [node["Index Name"] for node in nodes if "Index Name" in node]
+    parents = parent_relation_names(conn, raw_indexes)
+    indexes = list(dict.fromkeys(parents.get(name, name) for name in raw_indexes))
+    node_types = list(dict.fromkeys(node["Node Type"] for node in nodes))
+    return PlanResult(check, indexes, node_types, plan)
+
+
+def check_plan(conn: Connection, check: PlanCheck, params: Dict[str, Any], analyze: bool = False) -> PlanResult:
+    """analyze=True 时实际执行查询（EXPLAIN ANALYZE, BUFFERS），计划中带实际行数与缓冲区读写。"""
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    plan = conn.execute(text(f"EXPLAIN ({options}) {check.sql}"), params).scalar()
+    return summarize_plan(conn, check, plan[0])
+
+
+# ========== 执行计划回归检查 ==========
+
+@dataclass
+class CapturedQuery:
+    source: str  # 发出查询的脚本或 API 路径
+    statement: str
+    parameters: Any
+    engine: str  # "sync"（psycopg2 写引擎）或 "async"（asyncpg 读引擎）
+
+
+class QueryRecorder:
+    """记录引擎上执行的 SELECT 语句（按来源与语句文本去重，保留第一次的参数）。"""
+
+    def __init__(self):
+        self.source = ""
+        self.queries: Dict[Tuple[str, str], CapturedQuery] = {}
+
+    @contextmanager
+    def capture(self, engine: Engine, kind: str):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            # 只记录 SELECT：EXPLAIN ANALYZE 会真正执行语句，写入语句不能重放
+            if executemany or statement.lstrip()[:6].upper() != "SELECT":
+                return
+            self.queries.setdefault(
+                (self.source, statement), CapturedQuery(self.source, statement, parameters, kind)
+            )
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield self
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _walk_with_limit(node: Dict[str, Any], under_limit: bool = False) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    yield node, under_limit
+    under_limit = under_limit or node["Node Type"] == "Limit"
+    for child in node.get("Plans", []):
+        yield from _walk_with_limit(child, under_limit)
+
+
+def plan_problems(
+    conn: Connection,
+    plan: Dict[str, Any],
+    allowed_seq_scans: Iterable[str] = (),
+    large_table_rows: int = LARGE_TABLE_ROWS,
+    estimate_factor: float = ESTIMATE_FACTOR,
+) -> List[str]:
+    """
+    检查 EXPLAIN (ANALYZE, FORMAT JSON) 的计划：
+    - 行数估计不少于 large_table_rows 的表（分区）上的顺序扫描，allowed_seq_scans 中的表（父表名）除外；
+    - 扫描节点的估计行数与实际行数相差超过 estimate_factor 倍（Limit 之下的节点会提前结束，不检查）。
+    """
+    nodes = list(_walk_with_limit(plan["Plan"]))
+    relations = {node["Relation Name"] for node, _ in nodes if "Relation Name" in node}
+    parents = parent_relation_names(conn, relations)
+    sizes = dict(conn.execute(
+        text("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(:names)"), {"names": list(relations)}
+    ).all()) if relations else {}
+    allowed = set(allowed_seq_scans)
+
+    problems = []
+    for node, under_limit in nodes:
+        relation = node.get("Relation Name")
+        if relation is None:
+            continue
+        node_type = node["Node Type"]
+        if node_type == "Seq Scan" and parents.get(relation, relation) not in allowed:
+            rows = int(max(sizes.get(relation) or 0, 0))
+            if rows >= large_table_rows:
+                problems.append(f"顺序扫描大表 {relation}（约 {rows} 行）")
+        if under_limit or not node.get("Actual Loops"):
+            continue
+        planned, actual = node["Plan Rows"], node["Actual Rows"]
+        high, low = max(planned, actual), min(planned, actual)
+        if high >= ESTIMATE_MIN_ROWS and high > estimate_factor * max(low, 1):
+            problems.append(f"{node_type} {relation}: 估计 {planned} 行，实际 {actual} 行")
+    return problems
+
+
+def plan_buffers(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """顶层节点的缓冲区统计（包含所有子节点）与执行时间。"""
+    top = plan["Plan"]
+    return {
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit": top.get("Shared Hit Blocks", 0),
+        "shared_read": top.get("Shared Read Blocks", 0),
+        "temp_written": top.get("Temp Written Blocks", 0),
+        "rows": top.get("Actual Rows"),
+    }
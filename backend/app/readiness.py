@@ -0,0 +1,146 @@
+"""
+API 就绪检查与预热（/api/ready）。
+
+进程启动时不访问数据库；lifespan 在后台启动一次预热，容器编排通过 /api/ready 判断何时接入流量：
+1. 检查数据库结构版本（schema_migrations）是否为最新——API 不执行迁移，版本落后时保持未就绪；
+2. 并发打开 READY_WARM_CONNECTIONS 个连接，预先填充连接池；
+3. 在进程内依次请求 READY_WARM_PATHS（前端首屏调用的端点），填充响应缓存。
+
+就绪后每次检查只读取一次数据版本号（同时验证数据库可用）；发现数据版本变化（脚本重新计算）时在后台重新预热缓存，
+检查本身不等待预热完成。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .cache import get_data_generation
+from .database import DB_POOL_SIZE, AsyncSessionLocal
+from .metrics import WARMUP_CLIENT
+from .migrations import LATEST_VERSION, current_version
+
+READY_WARM_CONNECTIONS = int(os.getenv("READY_WARM_CONNECTIONS", str(min(DB_POOL_SIZE, 5))))
+READY_WARM_PATHS = [
+    path.strip()
+    for path in os.getenv(
+        "READY_WARM_PATHS",
+        "/api/price-data,"
+        "/api/arbitrage/statistics,"
+        "/api/arbitrage/behaviors?page=1&page_size=10&sort_by=profit&sort_order=desc,"
+        "/api/arbitrage/opportunities",
+    ).split(",")
+    if path.strip()
+]
+# 与浏览器一致，缓存中预先生成浏览器会取用的压缩版本
+WARM_ACCEPT_ENCODING = "gzip, deflate, br"
+
+logger = logging.getLogger("app.readiness")
+
+
+class Readiness:
+    def __init__(self, engine: AsyncEngine, asgi_app):
+        self.engine = engine
+        self.asgi_app = asgi_app
+        self.ready = False
+        self.detail: Optional[str] = "warming up"
+        self.warmed_generation: Optional[int] = None
+        self.warm_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """在后台启动预热（已在进行中时复用同一个任务）。"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._warm())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _check_schema(self) -> Optional[str]:
+        async with self.engine.connect() as conn:
+            version = await conn.run_sync(current_version)
+        if version != LATEST_VERSION:
+            return f"schema version {version or 0}, expected {LATEST_VERSION}; run app.scripts.migrate"
+        return None
+
+    async def _warm_pool(self) -> None:
+        async def touch():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(touch() for _ in range(max(1, READY_WARM_CONNECTIONS))))
+
+    async def _warm_caches(self) -> Dict[str, int]:
+        transport = httpx.ASGITransport(app=self.asgi_app, client=WARMUP_CLIENT)
+        statuses: Dict[str, int] = {}
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://warmup", headers={"Accept-Encoding": WARM_ACCEPT_ENCODING}
+        ) as client:
+            for path in READY_WARM_PATHS:
+                response = await client.get(path)
+                statuses[path] = response.status_code
+        return statuses
+
+    async def _warm(self) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            problem = await self._check_schema()
+            if problem is not None:
+                self.ready = False
+                self.detail = problem
+                return
+            await self._warm_pool()
+            async with AsyncSessionLocal() as db:
+                generation = await get_data_generation(db)
+            statuses = await self._warm_caches()
+            failed = [f"{path} -> {status}" for path, status in statuses.items() if status >= 400]
+            if failed:
+                # 缓存预热失败不影响就绪：对应请求到来时会再次计算
+                logger.warning("cache warm-up failed: %s", ", ".join(failed))
+            self.warmed_generation = generation
+            self.warm_seconds = loop.time() - started
+            self.ready = True
+            self.detail = None
+        except Exception as exc:  # 数据库暂不可用等：保持未就绪，下次检查时重试
+            logger.warning("warm-up failed: %s", exc)
+            if not self.ready:
+                self.detail = f"warm-up failed: {exc}"
+
+    async def check(self) -> Dict[str, object]:
+        """
+        返回就绪状态。未就绪时确保预热在后台进行（不等待）；
+        已就绪时检查数据库连通性，并在数据版本变化后后台重新预热缓存。
+        """
+        if not self.ready:
+            self.start()
+            return self.status()
+        try:
+            async with AsyncSessionLocal() as db:
+                generation = await get_data_generation(db)
+        except Exception as exc:
+            return {"ready": False, "detail": f"database unavailable: {exc}"}
+        if generation != self.warmed_generation:
+            self.start()
+        return self.status()
+
+    def status(self) -> Dict[str, object]:
+        body: Dict[str, object] = {"ready": self.ready}
+        if self.detail:
+            body["detail"] = self.detail
+        if self.ready:
+            body["warm_seconds"] = self.warm_seconds
+            body["warmed_generation"] = self.warmed_generation
+            body["warmed_paths"] = READY_WARM_PATHS
+        return body
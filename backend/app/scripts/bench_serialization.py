@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比列表接口新旧序列化路径的 CPU 开销（每 10k 行）。
+
+旧路径：ORM 实例 -> 逐行 serialize_timestamp 构造字典 -> jsonable_encoder -> json.dumps
+新路径：列查询元组 -> rows_to_records -> orjson（datetime 批量按 UTC 编码）
+
+用法:
+    python -m app.scripts.bench_serialization                # 合成数据，不需要数据库
+    python -m app.scripts.bench_serialization --from-db      # 读取 arbitrage_opportunities_minute，包含 ORM 构造开销
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from ..serialization import dumps, rows_to_records
+
+FIELDS = [
+    "id",
+    "timestamp",
+    "uniswap_price",
+    "binance_price",
+    "price_diff_percent",
+    "profit",
+    "profit_rate",
+    "direction",
+]
+
+
+def serialize_timestamp(dt: Optional[datetime]) -> Optional[str]:
+    if not dt:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.isoformat().replace("+00:00", "Z")
+
+
+def legacy_serialize(opportunities) -> bytes:
+    """改造前 get_arbitrage_opportunities 的序列化方式（含 FastAPI JSONResponse 的编码）。"""
+    data = []
+    for opp in opportunities:
+        data.append(
+            {
+                "id": opp.id,
+                "timestamp": serialize_timestamp(opp.timestamp),
+                "uniswap_price": opp.uniswap_price,
+                "binance_price": opp.binance_price,
+                "price_diff_percent": opp.price_diff_percent,
+                "profit": opp.profit,
+                "profit_rate": (opp.profit_rate or 0.0) * 100,
+                "direction": opp.direction or "unknown",
+            }
+        )
+    content = jsonable_encoder({"opportunities": data})
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_serialize(rows) -> bytes:
+    return dumps({"opportunities": rows_to_records(FIELDS, rows)})
+
+
+def synthetic_rows(count: int):
+    rng = random.Random(42)
+    start = datetime(2025, 9, 1)
+    rows = []
+    for idx in range(count):
+        uniswap_price = 2500 + rng.random() * 100
+        binance_price = 2500 + rng.random() * 100
+        rows.append(
+            (
+                idx + 1,
+                start + timedelta(minutes=idx),
+                uniswap_price,
+                binance_price,
+                abs(uniswap_price - binance_price) / 25,
+                rng.random() * 20,
+                rng.random(),
+                rng.choice(["cex->dex", "dex->cex"]),
+            )
+        )
+    return rows
+
+
+def best_cpu_ms(fn: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        best = min(best, time.process_time() - started)
+    return best * 1000
+
+
+def report(label: str, legacy_ms: float, fast_ms: float, rows: int) -> None:
+    scale = 10000 / rows
+    print(f"{label}（{rows} 行，折算为每 10k 行的 CPU 时间）")
+    print(f"  旧路径: {legacy_ms * scale:8.2f} ms")
+    print(f"  新路径: {fast_ms * scale:8.2f} ms")
+    print(f"  加速比: {legacy_ms / fast_ms:8.2f}x")
+
+
+def bench_synthetic(rows: int, repeat: int) -> None:
+    tuples = synthetic_rows(rows)
+    objects: List[SimpleNamespace] = [SimpleNamespace(**dict(zip(FIELDS, row))) for row in tuples]
+    assert json.loads(legacy_serialize(objects)) == json.loads(fast_serialize(
+        [row[:6] + (row[6] * 100, row[7]) for row in tuples]
+    ))
+    report(
+        "合成数据：序列化",
+        best_cpu_ms(lambda: legacy_serialize(objects), repeat),
+        best_cpu_ms(lambda: fast_serialize(tuples), repeat),
+        rows,
+    )
+
+
+def bench_from_db(rows: int, repeat: int) -> None:
+    from sqlalchemy import func, select
+
+    from ..database import SessionLocal
+    from .. import models
+
+    model = models.ArbitrageOpportunityMinute
+    columns = (
+        model.id,
+        model.timestamp,
+        model.uniswap_price,
+        model.binance_price,
+        model.price_diff_percent,
+        model.profit,
+        (func.coalesce(model.profit_rate, 0.0) * 100).label("profit_rate"),
+        func.coalesce(model.direction, "unknown").label("direction"),
+    )
+    session = SessionLocal()
+    try:
+        def legacy() -> bytes:
+            session.expunge_all()
+            return legacy_serialize(
+                session.query(model).order_by(model.timestamp.desc()).limit(rows).all()
+            )
+
+        def fast() -> bytes:
+            return fast_serialize(
+                session.execute(select(*columns).order_by(model.timestamp.desc()).limit(rows)).all()
+            )
+
+        fetched = session.query(func.count(model.id)).scalar() or 0
+        if not fetched:
+            print("arbitrage_opportunities_minute 表为空，跳过数据库基准")
+            return
+        report(
+            "数据库：查询 + ORM 构造 + 序列化",
+            best_cpu_ms(legacy, repeat),
+            best_cpu_ms(fast, repeat),
+            min(rows, fetched),
+        )
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表接口序列化路径 CPU 基准")
+    parser.add_argument("--rows", type=int, default=10000, help="参与基准的行数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最好成绩）")
+    parser.add_argument("--from-db", action="store_true", help="从数据库读取数据（包含 ORM 构造开销）")
+    args = parser.parse_args()
+
+    bench_synthetic(args.rows, args.repeat)
+    if args.from_db:
+        bench_from_db(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
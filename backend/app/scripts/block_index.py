@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+维护本地区块时间索引（app/blocktime.py）。
+
+用法:
+    python -m app.scripts.block_index                      # 把 uniswap_swaps 中新出现的区块记为锚点（fetch_data 每次运行前自动执行）
+    python -m app.scripts.block_index --status             # 锚点数量、覆盖范围与可精确换算的比例
+    python -m app.scripts.block_index --rebuild            # 删除 swap 锚点后重新扫描全部 swap（回补或重置 swap 之后使用）
+    python -m app.scripts.block_index --lookup 2025-09-01T12:00:00Z [--closest after]   # 只用本地索引换算
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+
+from .. import models
+from ..blocktime import SLOT_SECONDS, BlockTimeIndex, record_swap_blocks
+from ..database import SessionLocal, engine
+from ..migrations import ensure_current
+
+
+def _parse_timestamp(value: str) -> int:
+    """unix 秒或 ISO 8601（无时区时按 UTC）。"""
+    if value.isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _print_status(session) -> None:
+    counts = dict(
+        session.query(models.BlockTimestamp.source, func.count()).group_by(models.BlockTimestamp.source).all()
+    )
+    index = BlockTimeIndex.load(session)
+    print(f"锚点: {len(index)}（swap {counts.get('swap', 0)}，区块头 {counts.get('header', 0)}，"
+          f"时间不单调而忽略 {index.skipped}）")
+    if not len(index):
+        return
+    first = datetime.fromtimestamp(index.times[0], tz=timezone.utc)
+    last = datetime.fromtimestamp(index.times[-1], tz=timezone.utc)
+    print(f"覆盖: 区块 {index.blocks[0]} -> {index.blocks[-1]}，时间 {first} -> {last}")
+    # 相邻锚点之间没有空 slot 时，区间内的任意时间都能精确换算
+    gaps = list(zip(index.blocks, index.times, index.blocks[1:], index.times[1:]))
+    exact = sum(1 for b0, t0, b1, t1 in gaps if t1 - t0 == SLOT_SECONDS * (b1 - b0))
+    if gaps:
+        print(f"可精确换算的锚点间隔: {exact}/{len(gaps)}（{exact / len(gaps):.1%}）")
+
+
+def _lookup(session, value: str, closest: str) -> None:
+    timestamp = _parse_timestamp(value)
+    started = time.perf_counter()
+    index = BlockTimeIndex.load(session)
+    loaded = time.perf_counter()
+    result = index.lookup(timestamp, closest)
+    looked_up = time.perf_counter()
+    print(f"加载 {len(index)} 个锚点 {(loaded - started) * 1000:.1f}ms，换算 {(looked_up - loaded) * 1e6:.1f}µs")
+    if result is None:
+        print(f"{timestamp} ({closest}): 超出本地索引范围，需要网络接口")
+    elif result.exact:
+        print(f"{timestamp} ({closest}): 区块 {result.low}（精确）")
+    else:
+        print(f"{timestamp} ({closest}): 区块 {result.low} ~ {result.high}，插值估计 {result.estimate}，"
+              f"保守取 {result.conservative(closest)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="维护本地区块时间索引")
+    parser.add_argument("--status", action="store_true", help="显示索引状态")
+    parser.add_argument("--rebuild", action="store_true", help="删除 swap 锚点后重新扫描全部 swap")
+    parser.add_argument("--lookup", metavar="TIME", help="只用本地索引把时间（unix 秒或 ISO 8601）换算为区块号")
+    parser.add_argument("--closest", choices=("before", "after"), default="before", help="--lookup 的换算方向")
+    args = parser.parse_args(argv)
+
+    ensure_current(engine)
+    session = SessionLocal()
+    try:
+        if args.status:
+            _print_status(session)
+        elif args.lookup:
+            _lookup(session, args.lookup, args.closest)
+        else:
+            started = time.perf_counter()
+            added = record_swap_blocks(session, rebuild=args.rebuild)
+            session.commit()
+            print(f"新增 {added} 个锚点，耗时 {time.perf_counter() - started:.1f}s")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
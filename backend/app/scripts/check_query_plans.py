@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查热点查询是否使用了为其设计的索引（EXPLAIN，不执行查询）。
+
+规划器只在数据量足够时才会选用索引，应在接近真实规模的数据上运行，例如：
+    python -m app.scripts.generate_synthetic --days 30 --swaps-per-day 20000 --reset
+    python -m app.scripts.compute_arbitrage
+
+用法:
+    python -m app.scripts.check_query_plans             # 全部检查，有不符合的以状态 1 退出
+    python -m app.scripts.check_query_plans --check swaps_chain_order --verbose
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from ..database import engine
+from ..query_plans import PLAN_CHECKS, check_parameters, check_plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查热点查询的执行计划是否使用预期索引")
+    parser.add_argument("--check", action="append", choices=[check.name for check in PLAN_CHECKS],
+                        help="只运行指定检查（可重复）")
+    parser.add_argument("--verbose", action="store_true", help="输出完整的 JSON 计划")
+    args = parser.parse_args(argv)
+
+    checks = [check for check in PLAN_CHECKS if not args.check or check.name in args.check]
+    failures = 0
+    with engine.connect() as conn:
+        params = check_parameters(conn)
+        for check in checks:
+            result = check_plan(conn, check, params)
+            status = "OK  " if result.ok else "FAIL"
+            print(f"{status} {check.name:<24} {check.expected_index:<40} {check.source}")
+            for problem in result.problems:
+                print(f"       {problem}")
+            if args.verbose:
+                print(json.dumps(result.plan, indent=2, ensure_ascii=False))
+            failures += not result.ok
+
+    print(f"{len(checks) - failures}/{len(checks)} 条查询使用了预期索引")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,25 @@
 """
 from __future__ import annotations
 
+import argparse
 from bisect import bisect_left, bisect_right
 from collections import defaultdict
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import List, Tuple, Union, Optional, Dict, Set
 
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import delete, func
 from sqlalchemy.orm import Session
 
 from ..database import SessionLocal, engine
+from ..migrations import ensure_current
 from .. import models
+from ..changes import ChangeRange, publish_changes
+from ..summary import refresh_arbitrage_summary
+from ..profiling import RunProfiler, add_profiling_arguments
+from ..snapshot import SNAPSHOT_TABLES, ColumnSnapshot
 
 # ========== 可调参数 ==========
 PAIR_TIME_WINDOW_SEC: int = 300
@@ -128,10 +137,29 @@ def to_unix(dt: datetime) -> int:
 def from_unix(ts: int) -> datetime:
     return datetime.fromtimestamp(ts, tz=timezone.utc)
 
+# 只读取配对与过滤用到的列：不构造 ORM 实例，也不解码 block_hash、sqrt_price_x96 等用不到的宽列
+SWAP_COLUMNS = (
+    models.UniswapSwap.id,
+    models.UniswapSwap.transaction_hash,
+    models.UniswapSwap.log_index,
+    models.UniswapSwap.timestamp,
+    models.UniswapSwap.amount0,
+    models.UniswapSwap.amount1,
+    models.UniswapSwap.price,
+)
+SWAP_METADATA_COLUMNS = (
+    models.UniswapSwap.block_number,
+    models.UniswapSwap.transaction_index,
+    models.UniswapSwap.sender,
+    models.UniswapSwap.recipient,
+    models.UniswapSwap.gas_used,
+)
+
+
 def load_uniswap_swaps(session: Session) -> List[UniswapSwapData]:
     """加载所有Uniswap swap数据，包含完整字段用于启发式过滤"""
     swaps = []
-    for row in session.query(models.UniswapSwap).order_by(models.UniswapSwap.timestamp.asc()):
+    for row in session.query(*SWAP_COLUMNS).order_by(models.UniswapSwap.timestamp.asc()):
         swaps.append(
             UniswapSwapData(
                 id=row.id,
@@ -146,10 +174,83 @@ def load_uniswap_swaps(session: Session) -> List[UniswapSwapData]:
     return swaps
 
 
-def load_uniswap_swaps_with_metadata(session: Session) -> List[Tuple[UniswapSwapData, Dict]]:
-    """加载Uniswap swap数据及其元数据（用于启发式过滤）"""
+def _naive_utc(dt: datetime) -> datetime:
+    """表中的 timestamp 为 naive UTC；带时区的时间转换后再比较。"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _since_filter(table, since: Optional[datetime], until: Optional[datetime] = None):
+    """快照 Arrow 表只保留 since <= timestamp <= until 的行（增量计算，None 表示该侧不限）。"""
+    column = table.column("timestamp")
+    if since is not None:
+        table = table.filter(pc.greater_equal(column, pa.scalar(since, pa.timestamp("us"))))
+        column = table.column("timestamp")
+    if until is not None:
+        table = table.filter(pc.less_equal(column, pa.scalar(until, pa.timestamp("us"))))
+    return table
+
+
+def _arrow_columns(table, names: List[str]) -> List[list]:
+    """Arrow 表的列转换为 Python 列表；timestamp 列转换为 unix 秒（与 to_unix 一致）。"""
+    columns = []
+    for name in names:
+        column = table.column(name)
+        if pa.types.is_timestamp(column.type):
+            column = pc.divide(column.cast(pa.int64()), 1_000_000)
+        columns.append(column.to_pylist())
+    return columns
+
+
+def _swaps_with_metadata_from_snapshot(table) -> List[Tuple[UniswapSwapData, Dict]]:
+    swaps_with_meta = []
+    for (row_id, tx_hash, log_index, timestamp, amount0, amount1, price,
+         block_number, transaction_index, sender, recipient, gas_used) in zip(*_arrow_columns(table, [
+            "id", "transaction_hash", "log_index", "timestamp", "amount0", "amount1", "price",
+            "block_number", "transaction_index", "sender", "recipient", "gas_used",
+         ])):
+        swap_data = UniswapSwapData(
+            id=row_id,
+            transaction_hash=tx_hash or "",
+            log_index=log_index or 0,
+            timestamp=timestamp,
+            amount0=amount0 or 0.0,
+            amount1=amount1 or 0.0,
+            price=price or 0.0,
+        )
+        metadata = {
+            "block_number": block_number,
+            "transaction_index": transaction_index or 0,
+            "sender": sender,
+            "recipient": recipient,
+            "gas_used": gas_used or None,
+        }
+        swaps_with_meta.append((swap_data, metadata))
+    return swaps_with_meta
+
+
+def load_uniswap_swaps_with_metadata(
+    session: Session,
+    snapshot: Optional[ColumnSnapshot] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[Tuple[UniswapSwapData, Dict]]:
+    """
+    加载Uniswap swap数据及其元数据（用于启发式过滤）；有可用的列式快照时从快照读取历史部分
+    since / until 不为空时只加载 since <= timestamp <= until 的 swap（同一区块的 swap 时间相同，因此总是整块加载）
+    """
+    if snapshot is not None:
+        table = snapshot.load(session.connection(), SNAPSHOT_TABLES["uniswap_swaps"])
+        if table is not None:
+            return _swaps_with_metadata_from_snapshot(_since_filter(table, since, until))
     swaps_with_meta = []
-    for row in session.query(models.UniswapSwap).order_by(
+    query = session.query(*SWAP_COLUMNS, *SWAP_METADATA_COLUMNS)
+    if since is not None:
+        query = query.filter(models.UniswapSwap.timestamp >= since)
+    if until is not None:
+        query = query.filter(models.UniswapSwap.timestamp <= until)
+    for row in query.order_by(
         models.UniswapSwap.block_number.asc(),
         models.UniswapSwap.transaction_index.asc(),
         models.UniswapSwap.log_index.asc()
@@ -168,15 +269,34 @@ def load_uniswap_swaps_with_metadata(session: Session) -> List[Tuple[UniswapSwap
             "transaction_index": row.transaction_index or 0,
             "sender": row.sender,
             "recipient": row.recipient,
-            "gas_used": float(row.gas_used) if row.gas_used else None,
+            "gas_used": row.gas_used or None,
         }
         swaps_with_meta.append((swap_data, metadata))
     return swaps_with_meta
 
 
-def load_binance_trades(session: Session) -> List[BinanceTradeData]:
+def load_binance_trades(
+    session: Session,
+    snapshot: Optional[ColumnSnapshot] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[BinanceTradeData]:
+    if snapshot is not None:
+        table = snapshot.load(session.connection(), SNAPSHOT_TABLES["binance_trades"])
+        if table is not None:
+            return [
+                BinanceTradeData(id=row_id, timestamp=timestamp, price=price or 0.0, quantity=quantity or 0.0)
+                for row_id, timestamp, price, quantity in zip(
+                    *_arrow_columns(_since_filter(table, since, until), ["id", "timestamp", "price", "quantity"])
+                )
+            ]
     trades = []
-    for row in session.query(models.BinanceTrade).order_by(models.BinanceTrade.timestamp.asc()):
+    query = session.query(models.BinanceTrade)
+    if since is not None:
+        query = query.filter(models.BinanceTrade.timestamp >= since)
+    if until is not None:
+        query = query.filter(models.BinanceTrade.timestamp <= until)
+    for row in query.order_by(models.BinanceTrade.timestamp.asc()):
         trades.append(
             BinanceTradeData(
                 id=row.id,
@@ -421,8 +541,27 @@ def pair_candidates(
     return result
 
 
-def store_opportunities(session: Session, pairs):
-    session.query(models.ArbitrageOpportunity).delete()
+def store_opportunities(
+    session: Session, pairs, since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    """
+    写入候选并刷新汇总表。since 为空时替换全部候选；
+    不为空时只替换 since <= timestamp <= until 的 swap（即本次重新加载的 swap）产生的候选。
+    候选的 direction 可能为 unknown，无法据此区分哪一侧是 DEX，因此按 swap 的 (transaction_hash, log_index) 关联删除
+    """
+    if since is None:
+        session.query(models.ArbitrageOpportunity).delete()
+    else:
+        opp, swap = models.ArbitrageOpportunity, models.UniswapSwap
+        conditions = [
+            swap.timestamp >= since,
+            opp.uniswap_log_index == swap.log_index,
+            # 候选表中的哈希是 "0x..." 文本，swap 表中是 bytea
+            opp.transaction_hash == func.concat("0x", func.encode(swap.transaction_hash, "hex")),
+        ]
+        if until is not None:
+            conditions.append(swap.timestamp <= until)
+        session.execute(delete(opp).where(*conditions).execution_options(synchronize_session=False))
     opportunities = []
     for dex, cex, rs, net_profit, profit_rate, buy_ts, sell_ts in pairs:
         buy_dt = from_unix(buy_ts)
@@ -461,61 +600,113 @@ def store_opportunities(session: Session, pairs):
             )
         )
     session.bulk_save_objects(opportunities)
+    # 候选的 timestamp 取两腿中较早的一腿，与 swap 相差不超过一个配对窗口
+    window = timedelta(seconds=PAIR_TIME_WINDOW_SEC)
+    start = None if since is None else since - window
+    end = None if since is None or until is None else until + window
+    # 写入时同步刷新汇总表（只重新聚合变化的日期），统计接口直接读取汇总行
+    refresh_arbitrage_summary(session, start, end)
+    publish_changes(session, [ChangeRange("arbitrage_opportunities", start, end, len(opportunities))])
     session.commit()
     return len(opportunities)
 
 
-def main():
-    models.Base.metadata.create_all(bind=engine)
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="计算非原子套利候选")
+    add_profiling_arguments(parser)
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="不使用列式快照（app/snapshot.py），全部从数据库读取")
+    args = parser.parse_args(argv)
+
+    ensure_current(engine)
+    snapshot = None if args.no_snapshot else ColumnSnapshot()
     session = SessionLocal()
     try:
-        print("=" * 60)
-        print("开始计算非原子套利机会")
-        print("=" * 60)
-        
-        # 加载原始数据（包含元数据用于启发式过滤）
-        print("\n[1/5] 加载Uniswap swap数据...")
-        swaps_with_meta = load_uniswap_swaps_with_metadata(session)
-        print(f"  加载了 {len(swaps_with_meta)} 个swap记录")
-        
-        # 应用启发式过滤
-        print("\n[2/5] 应用启发式过滤...")
-        
-        # Heuristic 5: 排除已知路由器/交易机器人
+        with RunProfiler.from_args("compute_arbitrage", args) as profiler:
+            run(session, profiler, snapshot)
+    finally:
+        session.close()
+
+
+def run(
+    session: Session,
+    profiler: RunProfiler,
+    snapshot: Optional[ColumnSnapshot] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    计算并写入套利候选。since 不为空时为增量计算（见 app/scripts/pipeline.py）：
+    只重新匹配 since <= timestamp <= until 的 swap（Binance 成交两侧各多加载一个配对窗口），并只替换这些 swap 的候选。
+    启发式过滤只看同一区块 / 同一交易内的 swap，配对只看 ±PAIR_TIME_WINDOW_SEC 内的成交，
+    因此范围外的 swap 的结果不受变化影响，调用方需保证 [since, until] 向两侧覆盖变化数据至少一个配对窗口。
+    until 为空表示到最新数据为止。
+    """
+    print("=" * 60)
+    print("开始计算非原子套利机会")
+    print("=" * 60)
+    if since is not None:
+        since = _naive_utc(since).replace(microsecond=0)
+        if until is not None:
+            until = _naive_utc(until)
+        print(f"增量计算：重新匹配 {since} ~ {until or '最新'} 的 swap")
+    
+    # 加载原始数据（包含元数据用于启发式过滤）
+    print("\n[1/5] 加载Uniswap swap数据...")
+    with profiler.stage("load_swaps") as stage:
+        swaps_with_meta = load_uniswap_swaps_with_metadata(session, snapshot, since, until)
+        stage.rows = len(swaps_with_meta)
+    print(f"  加载了 {len(swaps_with_meta)} 个swap记录")
+    
+    # 应用启发式过滤
+    print("\n[2/5] 应用启发式过滤...")
+    
+    # Heuristic 5: 排除已知路由器/交易机器人
+    with profiler.stage("heuristic5_routers_bots", rows=len(swaps_with_meta)):
         swaps_with_meta = filter_known_routers_and_bots(swaps_with_meta)
-        print(f"  过滤后剩余 {len(swaps_with_meta)} 个swap")
-        
-        # Heuristic 1 (第二组): 简单swap检查（单swap + gas限制）
+    print(f"  过滤后剩余 {len(swaps_with_meta)} 个swap")
+    
+    # Heuristic 1 (第二组): 简单swap检查（单swap + gas限制）
+    with profiler.stage("heuristic1_simple_swaps", rows=len(swaps_with_meta)):
         swaps_with_meta = filter_simple_swaps(swaps_with_meta)
-        print(f"  过滤后剩余 {len(swaps_with_meta)} 个swap")
-        
-        # Heuristic 4 (第二组): 第一个swap或前置交易相同接收者
+    print(f"  过滤后剩余 {len(swaps_with_meta)} 个swap")
+    
+    # Heuristic 4 (第二组): 第一个swap或前置交易相同接收者
+    with profiler.stage("heuristic4_first_swap", rows=len(swaps_with_meta)):
         swaps_with_meta = filter_first_swap_or_same_recipient(swaps_with_meta)
-        print(f"  过滤后剩余 {len(swaps_with_meta)} 个swap")
-        
-        # 提取过滤后的swap数据
-        print("\n[3/5] 准备套利匹配...")
-        dex_trades = [swap_data for swap_data, _ in swaps_with_meta]
-        print(f"  将使用 {len(dex_trades)} 个过滤后的Uniswap swap进行匹配")
-        
-        # 加载Binance数据
-        print("\n[4/5] 加载Binance交易数据...")
-        cex_trades = load_binance_trades(session)
-        print(f"  加载了 {len(cex_trades)} 个Binance交易记录")
-        
-        # 计算套利候选对
-        print("\n[5/5] 计算套利候选对...")
+    print(f"  过滤后剩余 {len(swaps_with_meta)} 个swap")
+    
+    # 提取过滤后的swap数据
+    print("\n[3/5] 准备套利匹配...")
+    dex_trades = [swap_data for swap_data, _ in swaps_with_meta]
+    print(f"  将使用 {len(dex_trades)} 个过滤后的Uniswap swap进行匹配")
+    
+    # 加载Binance数据
+    print("\n[4/5] 加载Binance交易数据...")
+    with profiler.stage("load_binance") as stage:
+        window = timedelta(seconds=PAIR_TIME_WINDOW_SEC)
+        cex_trades = load_binance_trades(
+            session,
+            snapshot,
+            None if since is None else since - window,
+            None if since is None or until is None else until + window,
+        )
+        stage.rows = len(cex_trades)
+    print(f"  加载了 {len(cex_trades)} 个Binance交易记录")
+    
+    # 计算套利候选对
+    print("\n[5/5] 计算套利候选对...")
+    with profiler.stage("pair_candidates", rows=len(dex_trades)):
         pairs = pair_candidates(dex_trades, cex_trades)
-        print(f"  找到 {len(pairs)} 个套利候选对")
-        
-        # 存储结果
-        count = store_opportunities(session, pairs)
-        print(f"\n已写入 {count} 条套利候选记录。")
-        print("=" * 60)
-        print("计算完成")
-        print("=" * 60)
-    finally:
-        session.close()
+    print(f"  找到 {len(pairs)} 个套利候选对")
+    
+    # 存储结果
+    with profiler.stage("store", rows=len(pairs)):
+        count = store_opportunities(session, pairs, since, until)
+    print(f"\n已写入 {count} 条套利候选记录。")
+    print("=" * 60)
+    print("计算完成")
+    print("=" * 60)
 
 
 if __name__ == "__main__":
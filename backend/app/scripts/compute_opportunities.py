@@ -5,13 +5,17 @@
 """
 from __future__ import annotations
 
+import argparse
 from datetime import datetime, timezone, timedelta
 from typing import List, Tuple, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, cast, Date, extract
 
 from ..database import SessionLocal, engine
+from ..migrations import ensure_current
 from .. import models
+from ..changes import ChangeRange, publish_changes
+from ..profiling import RunProfiler, add_profiling_arguments
 
 # ========== 可调参数 ==========
 CEX_FEE_RATE = 0.001  # CEX 手续费率 0.1%
@@ -70,10 +74,23 @@ def compute_opportunity_for_minute(
     return best_opp
 
 
-def compute_opportunities(session: Session, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None):
+def compute_opportunities(
+    session: Session,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    profiler: Optional[RunProfiler] = None,
+):
     """
     计算套利机会并存储到数据库
+    传入 start_time 时为增量计算：只重新计算并替换 start_time 到 end_time（均截断到分钟）之间的分钟记录，
+    范围外的记录保持不变（见 app/scripts/pipeline.py）；未传入时全量重新计算。
+    end_time 所在分钟早于最新分钟时按整分钟读取，否则与全量计算一致，只读到最新分钟的起点
+    profiler 用于记录各阶段耗时，未传入时只打印阶段耗时
     """
+    profiler = profiler or RunProfiler("compute_opportunities")
+    incremental = start_time is not None
+    if incremental:
+        start_time = truncate_to_minute(start_time)
     print("=" * 60)
     print("开始计算套利机会（按分钟）")
     print("=" * 60)
@@ -91,17 +108,22 @@ def compute_opportunities(session: Session, start_time: Optional[datetime] = Non
             print("数据库中没有数据，退出")
             return
     
-    if end_time is None:
-        # 获取最新的数据时间
-        latest_uniswap = session.query(func.max(models.UniswapSwap.timestamp)).scalar()
-        latest_binance = session.query(func.max(models.BinanceTrade.timestamp)).scalar()
-        if latest_uniswap and latest_binance:
-            end_time = max(latest_uniswap, latest_binance)
-            end_time = truncate_to_minute(end_time)
-            print(f"计算到最新数据时间: {end_time}")
-        else:
-            print("数据库中没有数据，退出")
-            return
+    # 获取最新的数据时间
+    latest_uniswap = session.query(func.max(models.UniswapSwap.timestamp)).scalar()
+    latest_binance = session.query(func.max(models.BinanceTrade.timestamp)).scalar()
+    if not (latest_uniswap and latest_binance):
+        print("数据库中没有数据，退出")
+        return
+    latest_minute = truncate_to_minute(max(latest_uniswap, latest_binance))
+    end_inclusive = end_time is None or truncate_to_minute(end_time) >= latest_minute
+    if end_inclusive:
+        end_time = latest_minute
+        print(f"计算到最新数据时间: {end_time}")
+    else:
+        end_time = truncate_to_minute(end_time)
+
+    def before_end(column):
+        return column <= end_time if end_inclusive else column < end_time + timedelta(minutes=1)
     
     print(f"\n时间范围: {start_time} -> {end_time}")
     
@@ -109,28 +131,31 @@ def compute_opportunities(session: Session, start_time: Optional[datetime] = Non
     print("\n[1/3] 计算 Uniswap 每分钟平均价格...")
     uniswap_minute_prices = {}
     
-    uniswap_data = (
-        session.query(
-            func.date_trunc('minute', models.UniswapSwap.timestamp).label('minute'),
-            func.avg(models.UniswapSwap.price).label('avg_price'),
-            func.count(models.UniswapSwap.id).label('trade_count')
-        )
-        .filter(
-            models.UniswapSwap.timestamp >= start_time,
-            models.UniswapSwap.timestamp <= end_time
+    with profiler.stage("uniswap_minute_prices") as stage:
+        # 只用到 timestamp / price 与 count(*)，由 (timestamp) INCLUDE (price, ...) 覆盖索引完成，不回表
+        uniswap_data = (
+            session.query(
+                func.date_trunc('minute', models.UniswapSwap.timestamp).label('minute'),
+                func.avg(models.UniswapSwap.price).label('avg_price'),
+                func.count().label('trade_count')
+            )
+            .filter(
+                models.UniswapSwap.timestamp >= start_time,
+                before_end(models.UniswapSwap.timestamp)
+            )
+            .group_by(func.date_trunc('minute', models.UniswapSwap.timestamp))
+            .all()
         )
-        .group_by(func.date_trunc('minute', models.UniswapSwap.timestamp))
-        .all()
-    )
-    
-    for row in uniswap_data:
-        minute = row.minute
-        if minute.tzinfo is None:
-            minute = minute.replace(tzinfo=timezone.utc)
-        uniswap_minute_prices[minute] = {
-            'price': float(row.avg_price),
-            'trade_count': int(row.trade_count)
-        }
+        
+        for row in uniswap_data:
+            minute = row.minute
+            if minute.tzinfo is None:
+                minute = minute.replace(tzinfo=timezone.utc)
+            uniswap_minute_prices[minute] = {
+                'price': float(row.avg_price),
+                'trade_count': int(row.trade_count)
+            }
+        stage.rows = len(uniswap_minute_prices)
     
     print(f"  处理了 {len(uniswap_minute_prices)} 分钟的 Uniswap 数据")
     
@@ -138,91 +163,120 @@ def compute_opportunities(session: Session, start_time: Optional[datetime] = Non
     print("\n[2/3] 计算 Binance 每分钟平均价格...")
     binance_minute_prices = {}
     
-    binance_data = (
-        session.query(
-            func.date_trunc('minute', models.BinanceTrade.timestamp).label('minute'),
-            func.avg(models.BinanceTrade.price).label('avg_price'),
-            func.count(models.BinanceTrade.id).label('trade_count')
-        )
-        .filter(
-            models.BinanceTrade.timestamp >= start_time,
-            models.BinanceTrade.timestamp <= end_time
+    with profiler.stage("binance_minute_prices") as stage:
+        binance_data = (
+            session.query(
+                func.date_trunc('minute', models.BinanceTrade.timestamp).label('minute'),
+                func.avg(models.BinanceTrade.price).label('avg_price'),
+                func.count().label('trade_count')
+            )
+            .filter(
+                models.BinanceTrade.timestamp >= start_time,
+                before_end(models.BinanceTrade.timestamp)
+            )
+            .group_by(func.date_trunc('minute', models.BinanceTrade.timestamp))
+            .all()
         )
-        .group_by(func.date_trunc('minute', models.BinanceTrade.timestamp))
-        .all()
-    )
-    
-    for row in binance_data:
-        minute = row.minute
-        if minute.tzinfo is None:
-            minute = minute.replace(tzinfo=timezone.utc)
-        binance_minute_prices[minute] = {
-            'price': float(row.avg_price),
-            'trade_count': int(row.trade_count)
-        }
+
+        for row in binance_data:
+            minute = row.minute
+            if minute.tzinfo is None:
+                minute = minute.replace(tzinfo=timezone.utc)
+            binance_minute_prices[minute] = {
+                'price': float(row.avg_price),
+                'trade_count': int(row.trade_count)
+            }
+        stage.rows = len(binance_minute_prices)
     
     print(f"  处理了 {len(binance_minute_prices)} 分钟的 Binance 数据")
     
     # 计算套利机会
     print("\n[3/3] 计算套利机会...")
-    opportunities = []
-    all_minutes = set(uniswap_minute_prices.keys()) | set(binance_minute_prices.keys())
-    
-    for minute in sorted(all_minutes):
-        uniswap_data = uniswap_minute_prices.get(minute)
-        binance_data = binance_minute_prices.get(minute)
-        
-        # 需要两个市场都有数据才能计算
-        if not uniswap_data or not binance_data:
-            continue
-        
-        uniswap_price = uniswap_data['price']
-        binance_price = binance_data['price']
-        
-        # 计算套利机会
-        result = compute_opportunity_for_minute(uniswap_price, binance_price, minute)
-        if result:
-            direction, profit, profit_rate = result
-            price_diff_percent = abs(uniswap_price - binance_price) / ((uniswap_price + binance_price) / 2) * 100
-            
-            opportunities.append(
-                models.ArbitrageOpportunityMinute(
-                    timestamp=minute,
-                    uniswap_price=uniswap_price,
-                    binance_price=binance_price,
-                    price_diff_percent=price_diff_percent,
-                    profit=profit,
-                    profit_rate=profit_rate,
-                    direction=direction,
-                    uniswap_trade_count=uniswap_data['trade_count'],
-                    binance_trade_count=binance_data['trade_count'],
+    with profiler.stage("match_minutes") as stage:
+        opportunities = []
+        all_minutes = set(uniswap_minute_prices.keys()) | set(binance_minute_prices.keys())
+
+        for minute in sorted(all_minutes):
+            uniswap_data = uniswap_minute_prices.get(minute)
+            binance_data = binance_minute_prices.get(minute)
+
+            # 需要两个市场都有数据才能计算
+            if not uniswap_data or not binance_data:
+                continue
+
+            uniswap_price = uniswap_data['price']
+            binance_price = binance_data['price']
+
+            # 计算套利机会
+            result = compute_opportunity_for_minute(uniswap_price, binance_price, minute)
+            if result:
+                direction, profit, profit_rate = result
+                price_diff_percent = abs(uniswap_price - binance_price) / ((uniswap_price + binance_price) / 2) * 100
+
+                opportunities.append(
+                    models.ArbitrageOpportunityMinute(
+                        timestamp=minute,
+                        uniswap_price=uniswap_price,
+                        binance_price=binance_price,
+                        price_diff_percent=price_diff_percent,
+                        profit=profit,
+                        profit_rate=profit_rate,
+                        direction=direction,
+                        uniswap_trade_count=uniswap_data['trade_count'],
+                        binance_trade_count=binance_data['trade_count'],
+                    )
                 )
-            )
+        stage.rows = len(opportunities)
     
-    # 存储到数据库（全量计算，先清空表再插入）
+    # 存储到数据库（全量计算先清空表再插入；增量计算只替换 start_time 到 end_time 的分钟）
     print(f"\n存储 {len(opportunities)} 条套利机会记录...")
-    if opportunities:
-        # 清空表（全量重新计算）
-        session.query(models.ArbitrageOpportunityMinute).delete()
-        print("  已清空旧数据")
-        
-        session.bulk_save_objects(opportunities)
-        session.commit()
-        print(f"已写入 {len(opportunities)} 条套利机会记录")
-    else:
-        print("没有找到套利机会")
+    with profiler.stage("store", rows=len(opportunities)):
+        if incremental:
+            deleted = (
+                session.query(models.ArbitrageOpportunityMinute)
+                .filter(
+                    models.ArbitrageOpportunityMinute.timestamp >= start_time,
+                    models.ArbitrageOpportunityMinute.timestamp <= end_time,
+                )
+                .delete(synchronize_session=False)
+            )
+            print(f"  已删除 {start_time} -> {end_time} 的 {deleted} 条旧记录")
+
+            session.bulk_save_objects(opportunities)
+            publish_changes(session, [
+                ChangeRange("arbitrage_opportunities_minute", start_time, end_time, len(opportunities))
+            ])
+            session.commit()
+            print(f"已写入 {len(opportunities)} 条套利机会记录")
+        else:
+            # 清空表（全量重新计算）；没有找到套利机会时同样清空并发布，旧记录不能留在表里
+            session.query(models.ArbitrageOpportunityMinute).delete()
+            print("  已清空旧数据")
+
+            session.bulk_save_objects(opportunities)
+            publish_changes(session, [ChangeRange("arbitrage_opportunities_minute", rows=len(opportunities))])
+            session.commit()
+            if opportunities:
+                print(f"已写入 {len(opportunities)} 条套利机会记录")
+            else:
+                print("没有找到套利机会")
     
     print("=" * 60)
     print("计算完成")
     print("=" * 60)
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """主函数"""
-    models.Base.metadata.create_all(bind=engine)
+    parser = argparse.ArgumentParser(description="按分钟计算套利机会")
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    ensure_current(engine)
     session = SessionLocal()
     try:
-        compute_opportunities(session)
+        with RunProfiler.from_args("compute_opportunities", args) as profiler:
+            compute_opportunities(session, profiler=profiler)
     except Exception as e:
         print(f"发生错误: {e}")
         import traceback
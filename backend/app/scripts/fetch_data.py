@@ -1,10 +1,10 @@
+import argparse
 import os
 import sys
 import requests
 import time
 from datetime import datetime, timezone
-from sqlalchemy import create_engine, func, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func
 from dotenv import load_dotenv
 import ssl
 from requests.adapters import HTTPAdapter
@@ -18,16 +18,17 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-# --- 数据库配置 ---
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL 环境变量未设置")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# --- 数据库配置（使用主库写引擎，连接池与超时见 app.database） ---
+from app.database import SessionLocal, engine
+from app.migrations import ensure_current
+from app.partitions import ensure_partitions
 
 # --- 导入数据库模型 ---
-from app.models import Base, UniswapSwap, BinanceTrade
+from app.models import UniswapSwap, BinanceTrade
+from app.profiling import RunProfiler, add_profiling_arguments
+from app.changes import ChangeRange, publish_changes
+from app.blocktime import BlockTimeIndex, record_swap_blocks
+from app.snapshot import update_snapshots_if_enabled
 
 # --- API 配置 ---
 BINANCE_API_URL = os.getenv("BINANCE_API_URL", "https://api.binance.com/api/v3/klines")
@@ -48,34 +49,6 @@ UNISWAP_SWAP_TOPIC = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e11
 BLOCK_CHUNK_SIZE = 5000  # Etherscan 对区块范围有隐式限制
 UNISWAP_FEE_RATE = 0.0005  # 0.05% fee tier for the tracked pool
 WEI_IN_ETH = 10 ** 18
-UNISWAP_SCHEMA_UPDATES = [
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS block_number BIGINT",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS block_hash VARCHAR(66)",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS transaction_index INTEGER",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS sender VARCHAR(66)",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS recipient VARCHAR(66)",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS sqrt_price_x96 NUMERIC",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS liquidity NUMERIC",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS tick INTEGER",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS gas_price_wei NUMERIC",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS gas_used NUMERIC",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS gas_fee_eth DOUBLE PRECISION",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS fee_amount DOUBLE PRECISION",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS slippage_bps DOUBLE PRECISION"
-]
-BINANCE_SCHEMA_UPDATES = [
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS open_time TIMESTAMPTZ",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS close_time TIMESTAMPTZ",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS open_price DOUBLE PRECISION",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS high_price DOUBLE PRECISION",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS low_price DOUBLE PRECISION",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS close_price DOUBLE PRECISION",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS quote_volume DOUBLE PRECISION",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS number_of_trades BIGINT",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS taker_buy_base_volume DOUBLE PRECISION",
-    "ALTER TABLE binance_trades ADD COLUMN IF NOT EXISTS taker_buy_quote_volume DOUBLE PRECISION",
-    "ALTER TABLE uniswap_swaps ADD COLUMN IF NOT EXISTS log_index INTEGER"
-]
 
 
 # --- 自定义 SSL 适配器 ---
@@ -241,6 +214,43 @@ def get_block_number_by_timestamp(timestamp: int, closest: str = "before") -> Op
     return None
 
 
+def get_block_timestamp(block_number: int) -> Optional[int]:
+    """
+    使用 Etherscan proxy 接口获取区块头中的时间戳（校验本地区块时间索引时使用）
+    
+    Returns:
+        Unix 时间戳，如果失败返回 None（不重试，索引会改用其他方式）
+    """
+    params = {
+        "module": "proxy",
+        "action": "eth_getBlockByNumber",
+        "tag": hex(block_number),
+        "boolean": "false",
+        "apikey": ETHERSCAN_API_KEY,
+        "chainId": 1
+    }
+    try:
+        response = requests.get(ETHERSCAN_API_URL, params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        block = data.get("result")
+        if isinstance(block, dict) and block.get("timestamp"):
+            return int(block["timestamp"], 16)
+        print(f"获取区块头API错误: {data.get('message') or data.get('error')} - {block}")
+    except requests.exceptions.RequestException as e:
+        print(f"获取区块头时出错: {e}")
+    return None
+
+
+def resolve_block_number(block_index: BlockTimeIndex, timestamp: int, closest: str = "before") -> Optional[int]:
+    """先用本地区块时间索引换算（app/blocktime.py），落在已知范围之外且无法确定时才调用 getblocknobytime"""
+    block = block_index.block_at(timestamp, closest, fetch_header=get_block_timestamp)
+    if block is not None:
+        print(f"区块时间索引: {timestamp} ({closest}) -> {block}")
+        return block
+    return get_block_number_by_timestamp(timestamp, closest)
+
+
 def get_latest_timestamp(session, model) -> Optional[datetime]:
     """返回指定模型的最新时间戳"""
     return session.query(func.max(model.timestamp)).scalar()
@@ -258,17 +268,9 @@ def current_utc_timestamp() -> int:
     return int(datetime.now(timezone.utc).timestamp())
 
 
-def ensure_schema_upgraded():
-    """确保数据库包含扩展列"""
-    statements = UNISWAP_SCHEMA_UPDATES + BINANCE_SCHEMA_UPDATES
-    with engine.begin() as conn:
-        for stmt in statements:
-            conn.execute(text(stmt))
-
-
 # --- 数据获取函数 ---
 
-def fetch_binance_data(db_session):
+def fetch_binance_data(db_session) -> int:
     """获取并存储币安 USDT/ETH 交易数据"""
     print("正在获取币安数据...")
     symbol = "ETHUSDT"
@@ -360,6 +362,7 @@ def fetch_binance_data(db_session):
             continue
 
         batch_count = 0
+        batch_times = []  # 新增行的时间，提交时发布变更范围
         for kline in klines:
             open_time = datetime.fromtimestamp(kline[0] / 1000, tz=timezone.utc)
             close_time = datetime.fromtimestamp(kline[6] / 1000, tz=timezone.utc)
@@ -397,8 +400,10 @@ def fetch_binance_data(db_session):
                 )
                 db_session.add(trade)
                 batch_count += 1
+                batch_times.append(open_time)
         
         if batch_count > 0:
+            publish_changes(db_session, [ChangeRange.covering("binance_trades", batch_times)])
             db_session.commit()
             total_trades += batch_count
             print(f"已添加 {batch_count} 条币安交易记录，总计 {total_trades} 条")
@@ -410,9 +415,10 @@ def fetch_binance_data(db_session):
         time.sleep(0.5)  # 尊重 API 速率限制
 
     print(f"币安数据获取完成，共获取 {total_trades} 条交易记录。")
+    return total_trades
 
 
-def fetch_uniswap_data(db_session):
+def fetch_uniswap_data(db_session) -> int:
     """获取并存储 Uniswap V3 Swap 事件数据"""
     print("正在获取 Uniswap 数据...")
 
@@ -427,12 +433,17 @@ def fetch_uniswap_data(db_session):
 
     end_timestamp = current_utc_timestamp()
 
-    start_block = get_block_number_by_timestamp(start_timestamp, closest="after")
-    end_block = get_block_number_by_timestamp(end_timestamp, closest="before")
+    # 已有 swap 的新区块记为索引锚点；换算先查本地索引，获取到的区块头写回作为新的锚点
+    record_swap_blocks(db_session)
+    block_index = BlockTimeIndex.load(db_session)
+    start_block = resolve_block_number(block_index, start_timestamp, closest="after")
+    end_block = resolve_block_number(block_index, end_timestamp, closest="before")
+    block_index.save(db_session)
+    db_session.commit()
 
     if not start_block or not end_block:
         print("无法获取起始或结束区块号，正在退出。")
-        return
+        return 0
 
     print(f"将从区块 {start_block} 获取到 {end_block}...")
 
@@ -494,6 +505,7 @@ def fetch_uniswap_data(db_session):
                 continue
 
             batch_count = 0
+            batch_times = []  # 新增行的时间，提交时发布变更范围
             for log in logs:
                 timestamp_val = int(log['timeStamp'], 16)
                 timestamp = datetime.fromtimestamp(timestamp_val, tz=timezone.utc)
@@ -560,8 +572,10 @@ def fetch_uniswap_data(db_session):
                     )
                     db_session.add(swap)
                     batch_count += 1
+                    batch_times.append(timestamp)
             
             if batch_count > 0:
+                publish_changes(db_session, [ChangeRange.covering("uniswap_swaps", batch_times)])
                 db_session.commit()
                 total_swaps += batch_count
                 print(f"已提交 {batch_count} 条 Swap 记录，总计 {total_swaps} 条")
@@ -591,23 +605,37 @@ def fetch_uniswap_data(db_session):
         time.sleep(0.2)  # 尊重 API 速率限制
 
     print(f"Uniswap 数据获取完成，共获取 {total_swaps} 条 Swap 记录。")
+    return total_swaps
 
 
-def main():
+def main(argv=None):
     """主函数，用于执行数据爬取和存储"""
+    parser = argparse.ArgumentParser(description="爬取 Uniswap 与币安数据")
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
     print("=" * 60)
     print("开始数据爬取任务")
     print("=" * 60)
     
-    # 创建表（如果不存在）
-    Base.metadata.create_all(bind=engine)
-    ensure_schema_upgraded()
+    # 数据库结构不是最新时执行迁移（已是最新时只查询一次版本号）
+    ensure_current(engine)
+    # 新数据落在当前月份之后：确保对应的月分区已存在，并把 DEFAULT 分区中的行移入月分区
+    with engine.begin() as conn:
+        ensure_partitions(conn)
     
     db_session = SessionLocal()
     
     try:
-        fetch_uniswap_data(db_session)
-        fetch_binance_data(db_session)
+        with RunProfiler.from_args("fetch_data", args) as profiler:
+            with profiler.stage("uniswap") as stage:
+                stage.rows = fetch_uniswap_data(db_session)
+            with profiler.stage("binance") as stage:
+                stage.rows = fetch_binance_data(db_session)
+            # 已建立列式快照时，把新封存的历史追加到快照（compute_arbitrage 从快照读取）
+            with profiler.stage("snapshot") as stage, engine.connect() as conn:
+                updated = update_snapshots_if_enabled(conn)
+                stage.rows = sum(result["rows"] for result in (updated or {}).values())
         print("=" * 60)
         print("数据爬取任务完成")
         print("=" * 60)
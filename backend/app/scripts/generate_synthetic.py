@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成可复现的合成行情数据，写入 uniswap_swaps 与 binance_trades，用于规模测试。
+
+字段约定与 fetch_data 一致：
+- binance_trades 为 1 分钟 K 线（price = 收盘价，quantity = 成交量），间隔可通过 --binance-interval 调整；
+- uniswap_swaps 中 amount0 为 WETH、amount1 为 USDC（正数表示流入池子），price = |amount1| / |amount0|。
+
+数据特征（覆盖 compute_arbitrage 的全部启发式）：
+- 相关价格：CEX 中间价为几何布朗运动；DEX 价格 = 中间价 × (1 + 基差)，基差为均值回复过程，
+  偶尔出现跳变，产生超过 MIN_REL_SPREAD 的价差；
+- 突发的 swap 频率：平静 / 活跃两种状态随机切换，活跃期到达率成倍增加；
+- 同一区块多笔 swap、同一交易多笔 swap（多为路由器发起，gas 更高）；
+- sender / recipient 混合普通地址、已知路由器和机器人地址（零地址）；
+- gas_used 为对数正态分布，部分单 swap 交易超过 400k；gas 价格随区块缓慢漂移。
+
+相同的 --seed 与参数总是生成完全相同的数据。行通过 COPY 批量写入，可扩展到千万行以上。
+
+用法:
+    python -m app.scripts.generate_synthetic --days 30 --swaps-per-day 20000 --reset
+    python -m app.scripts.generate_synthetic --days 120 --swaps-per-day 100000 --reset   # 约 1200 万行
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from ..database import SessionLocal, engine
+from ..migrations import ensure_current
+from ..partitions import ensure_partitions
+from .. import models
+from ..blocktime import record_swap_blocks
+from ..changes import ChangeRange, publish_changes
+from ..snapshot import update_snapshots_if_enabled
+from ..types import copy_literal, uint_to_bytes
+from .compute_arbitrage import KNOWN_BOTS, KNOWN_ROUTERS
+
+DEFAULT_START = datetime(2025, 9, 1)
+START_BLOCK = 20_000_000
+BLOCK_TIME_SEC = 12
+UNISWAP_FEE_RATE = 0.0005
+WEI_IN_ETH = 10 ** 18
+Q96 = 1 << 96
+
+# 价格过程参数（按秒）
+MID_PRICE = 2500.0
+MID_VOL_PER_SEC = 0.6 / math.sqrt(365 * 86400)  # 年化波动率约 60%
+BASIS_TAU_SEC = 90.0  # 基差均值回复时间常数
+BASIS_VOL = 0.002  # 基差的平稳标准差
+BASIS_JUMP_PROB_PER_SEC = 1 / 1800  # 平均每 30 分钟一次跳变
+BASIS_JUMP_SCALE = 0.015
+
+# swap 到达过程
+BURST_MULTIPLIER = 8.0
+CALM_MEAN_SEC = 1800.0
+BURST_MEAN_SEC = 180.0
+MULTI_SWAP_TX_PROB = 0.08
+MULTI_SWAP_ROUTER_PROB = 0.6  # 多 swap 交易由路由器发起的比例（其余为合约钱包等普通地址）
+HEAVY_GAS_PROB = 0.04  # 单 swap 交易中附带其他调用、gas 超过 400k 的比例
+ROUTER_PROB = 0.35
+BOT_PROB = 0.02
+SAME_RECIPIENT_PROB = 0.3  # 同一区块内沿用上一笔 swap 的 recipient
+USER_POOL_SIZE = 5000
+
+UNISWAP_COLUMNS = [
+    "transaction_hash", "log_index", "timestamp", "amount0", "amount1", "price",
+    "block_number", "block_hash", "transaction_index", "sender", "recipient",
+    "sqrt_price_x96", "liquidity", "tick", "gas_price_wei", "gas_used",
+    "gas_fee_eth", "fee_amount", "slippage_bps",
+]
+BINANCE_COLUMNS = [
+    "timestamp", "price", "quantity", "open_time", "close_time", "open_price",
+    "high_price", "low_price", "close_price", "quote_volume", "number_of_trades",
+    "taker_buy_base_volume", "taker_buy_quote_volume",
+]
+
+
+def _address(rng: random.Random) -> str:
+    return "0x%040x" % rng.getrandbits(160)
+
+
+def _block_hash(seed: int, block_number: int) -> str:
+    return "0x" + hashlib.sha256(f"{seed}:{block_number}".encode()).hexdigest()
+
+
+class MarketSimulator:
+    """按秒推进 CEX 中间价、DEX 基差、gas 价格和突发状态。"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.mid = MID_PRICE
+        self.basis = 0.0
+        self.gas_gwei = 15.0
+        self.bursting = False
+        self.regime_left = rng.expovariate(1 / CALM_MEAN_SEC)
+
+    def step(self) -> None:
+        rng = self.rng
+        self.mid *= math.exp(MID_VOL_PER_SEC * rng.gauss(0, 1))
+        decay = math.exp(-1 / BASIS_TAU_SEC)
+        self.basis = self.basis * decay + BASIS_VOL * math.sqrt(1 - decay * decay) * rng.gauss(0, 1)
+        if rng.random() < BASIS_JUMP_PROB_PER_SEC:
+            self.basis += rng.choice((-1, 1)) * rng.expovariate(1 / BASIS_JUMP_SCALE)
+        self.gas_gwei = min(300.0, max(1.0, self.gas_gwei * math.exp(0.01 * rng.gauss(0, 1))))
+        self.regime_left -= 1
+        if self.regime_left <= 0:
+            self.bursting = not self.bursting
+            mean = BURST_MEAN_SEC if self.bursting else CALM_MEAN_SEC
+            self.regime_left = rng.expovariate(1 / mean)
+
+    @property
+    def dex_price(self) -> float:
+        return self.mid * (1 + self.basis)
+
+
+class SyntheticGenerator:
+    def __init__(self, seed: int, start: datetime, swaps_per_day: float, binance_interval: int):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.start = start
+        self.binance_interval = binance_interval
+        self.market = MarketSimulator(self.rng)
+        # 平静期的每秒到达率，使长期平均约为 swaps_per_day（每笔交易平均 swap 数约 1.1）
+        burst_share = BURST_MEAN_SEC / (BURST_MEAN_SEC + CALM_MEAN_SEC)
+        mean_multiplier = (1 - burst_share) + burst_share * BURST_MULTIPLIER
+        swaps_per_tx = 1 + MULTI_SWAP_TX_PROB * 1.5
+        self.calm_tx_rate = swaps_per_day / 86400 / mean_multiplier / swaps_per_tx
+        self.users = [_address(self.rng) for _ in range(USER_POOL_SIZE)]
+        self.routers = sorted(KNOWN_ROUTERS)
+        self.bots = sorted(KNOWN_BOTS)
+        self.current_block = None
+        self.block_tx_index = 0
+        self.block_log_index = 0
+        self.last_recipient = None
+        # 当前 K 线的累积状态
+        self.kline: Optional[dict] = None
+
+    # ---------- Binance ----------
+
+    def _kline_update(self, second: int, now: datetime) -> Optional[list]:
+        """累积当前秒的价格，到达 K 线边界时返回完成的一行。"""
+        market = self.market
+        price = market.mid
+        finished = None
+        if self.kline is None or second % self.binance_interval == 0:
+            if self.kline is not None:
+                finished = self._kline_row()
+            self.kline = {"open_time": now, "open": price, "high": price, "low": price, "close": price,
+                          "volume": 0.0, "quote": 0.0, "trades": 0, "taker_base": 0.0}
+        k = self.kline
+        k["high"] = max(k["high"], price)
+        k["low"] = min(k["low"], price)
+        k["close"] = price
+        activity = BURST_MULTIPLIER if market.bursting else 1.0
+        volume = self.rng.lognormvariate(-1.0, 1.0) * activity
+        k["volume"] += volume
+        k["quote"] += volume * price
+        k["trades"] += max(1, int(self.rng.expovariate(1 / (20 * activity))))
+        k["taker_base"] += volume * self.rng.uniform(0.3, 0.7)
+        return finished
+
+    def _kline_row(self) -> list:
+        k = self.kline
+        close_time = k["open_time"] + timedelta(seconds=self.binance_interval) - timedelta(milliseconds=1)
+        vwap = k["quote"] / k["volume"] if k["volume"] else k["close"]
+        return [
+            k["open_time"], k["close"], k["volume"], k["open_time"], close_time, k["open"],
+            k["high"], k["low"], k["close"], k["quote"], k["trades"],
+            k["taker_base"], k["taker_base"] * vwap,
+        ]
+
+    # ---------- Uniswap ----------
+
+    def _participants(self, multi: bool):
+        rng = self.rng
+        roll = rng.random()
+        if roll < BOT_PROB:
+            sender = rng.choice(self.bots)
+        elif (multi and rng.random() < MULTI_SWAP_ROUTER_PROB) or roll < BOT_PROB + ROUTER_PROB:
+            sender = rng.choice(self.routers)
+        else:
+            sender = rng.choice(self.users)
+        if self.last_recipient and rng.random() < SAME_RECIPIENT_PROB:
+            recipient = self.last_recipient
+        else:
+            recipient = rng.choice(self.users)
+        return sender, recipient
+
+    def _swap_rows(self, now: datetime, block_number: int) -> List[list]:
+        rng = self.rng
+        market = self.market
+        if block_number != self.current_block:
+            self.current_block = block_number
+            self.block_tx_index = rng.randint(0, 40)
+            self.block_log_index = rng.randint(0, 200)
+            self.last_recipient = None
+        else:
+            self.block_tx_index += rng.randint(1, 5)
+
+        multi = rng.random() < MULTI_SWAP_TX_PROB
+        swap_count = rng.choice((2, 2, 3)) if multi else 1
+        sender, recipient = self._participants(multi)
+        self.last_recipient = recipient
+        tx_hash = "0x%064x" % rng.getrandbits(256)
+        block_hash = _block_hash(self.seed, block_number)
+        gas_scale = 2.6 if multi else (3.5 if rng.random() < HEAVY_GAS_PROB else 1.0)
+        gas_used = int(rng.lognormvariate(math.log(130_000 * gas_scale), 0.35))
+        gas_price_wei = int(market.gas_gwei * rng.uniform(1.0, 1.3) * 1e9)
+        gas_fee_eth = gas_price_wei * gas_used / WEI_IN_ETH
+
+        # 基差偏离时套利者更倾向于把 DEX 价格拉回：DEX 价格偏高时卖出 ETH 的概率更大
+        sell_prob = min(0.9, max(0.1, 0.5 + market.basis * 20))
+        rows = []
+        for _ in range(swap_count):
+            pool_price = market.dex_price
+            size_eth = min(500.0, rng.lognormvariate(0.0, 1.2))
+            impact = min(0.01, size_eth * 2e-5) + abs(rng.gauss(0, 0.0002))
+            selling_eth = rng.random() < sell_prob
+            trade_price = pool_price * (1 - impact if selling_eth else 1 + impact)
+            amount0 = size_eth if selling_eth else -size_eth  # WETH 流入池子为正
+            amount1 = -size_eth * trade_price if selling_eth else size_eth * trade_price
+            sqrt_price_x96 = int(math.sqrt(pool_price) * Q96)
+            liquidity = int(rng.uniform(1e17, 5e18))
+            # 地址 / 哈希与 uint160 / uint128 列为 bytea，按 COPY 的 "\x..." 写法输出（见 app/types.py）
+            rows.append([
+                copy_literal(tx_hash), self.block_log_index, now, amount0, amount1, abs(amount1) / abs(amount0),
+                block_number, copy_literal(block_hash), self.block_tx_index,
+                copy_literal(sender), copy_literal(recipient),
+                copy_literal(uint_to_bytes(sqrt_price_x96, 20)), copy_literal(uint_to_bytes(liquidity, 16)),
+                int(math.log(pool_price) / math.log(1.0001)),
+                gas_price_wei, gas_used, gas_fee_eth, abs(amount1) * UNISWAP_FEE_RATE,
+                (trade_price / pool_price - 1.0) * 10000,
+            ])
+            self.block_log_index += rng.randint(1, 4)
+            # 同一交易内的后续 swap 使价格继续朝同方向移动
+            market.basis += (-impact if selling_eth else impact) * 0.5
+        return rows
+
+    def generate(self, seconds: int):
+        """逐秒生成数据，每秒产出 (binance 行列表, uniswap 行列表)。"""
+        rng = self.rng
+        market = self.market
+        for second in range(seconds):
+            now = self.start + timedelta(seconds=second)
+            market.step()
+            binance_rows = []
+            finished = self._kline_update(second, now)
+            if finished is not None:
+                binance_rows.append(finished)
+
+            uniswap_rows: List[list] = []
+            rate = self.calm_tx_rate * (BURST_MULTIPLIER if market.bursting else 1.0)
+            # 每秒到达的交易数服从泊松分布（用指数间隔累加生成）
+            elapsed = rng.expovariate(rate) if rate > 0 else 1.0
+            while elapsed < 1.0:
+                timestamp = now + timedelta(microseconds=int(elapsed * 1e6))
+                block_number = START_BLOCK + int((timestamp - self.start).total_seconds()) // BLOCK_TIME_SEC
+                # 同一区块内的 swap 使用区块时间戳（与链上数据一致）
+                block_time = self.start + timedelta(
+                    seconds=(block_number - START_BLOCK) * BLOCK_TIME_SEC
+                )
+                uniswap_rows.extend(self._swap_rows(block_time, block_number))
+                elapsed += rng.expovariate(rate)
+            yield binance_rows, uniswap_rows
+
+        if self.kline is not None:
+            yield [self._kline_row()], []
+
+
+def _copy_rows(cursor, table: str, columns: List[str], rows: List[list]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def generate(
+    seed: int,
+    days: float,
+    swaps_per_day: float,
+    binance_interval: int = 60,
+    start: datetime = DEFAULT_START,
+    reset: bool = False,
+    batch_rows: int = 100_000,
+) -> dict:
+    """生成并写入数据，返回行数与耗时。"""
+    ensure_current(engine)
+    generator = SyntheticGenerator(seed, start, swaps_per_day, binance_interval)
+    seconds = int(days * 86400)
+    # COPY 之前建好覆盖范围内的月分区，行直接写入对应分区
+    with engine.begin() as conn:
+        ensure_partitions(conn, start, start + timedelta(seconds=seconds))
+    started = time.perf_counter()
+    totals = {"uniswap_swaps": 0, "binance_trades": 0}
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # 时间按 UTC 写入（binance open_time / close_time 可能是 timestamptz 列）
+        cursor.execute("SET TIME ZONE 'UTC'")
+        if reset:
+            # 区块时间索引的锚点来自被清空的数据，一并清空
+            cursor.execute("TRUNCATE uniswap_swaps, binance_trades, block_timestamps RESTART IDENTITY")
+        pending_binance: List[list] = []
+        pending_uniswap: List[list] = []
+        for binance_rows, uniswap_rows in generator.generate(seconds):
+            pending_binance.extend(binance_rows)
+            pending_uniswap.extend(uniswap_rows)
+            if len(pending_uniswap) + len(pending_binance) >= batch_rows:
+                _copy_rows(cursor, "uniswap_swaps", UNISWAP_COLUMNS, pending_uniswap)
+                _copy_rows(cursor, "binance_trades", BINANCE_COLUMNS, pending_binance)
+                totals["uniswap_swaps"] += len(pending_uniswap)
+                totals["binance_trades"] += len(pending_binance)
+                pending_binance.clear()
+                pending_uniswap.clear()
+                print(
+                    f"已写入 uniswap_swaps {totals['uniswap_swaps']} 行，"
+                    f"binance_trades {totals['binance_trades']} 行",
+                    flush=True,
+                )
+        _copy_rows(cursor, "uniswap_swaps", UNISWAP_COLUMNS, pending_uniswap)
+        _copy_rows(cursor, "binance_trades", BINANCE_COLUMNS, pending_binance)
+        totals["uniswap_swaps"] += len(pending_uniswap)
+        totals["binance_trades"] += len(pending_binance)
+        raw.commit()
+    finally:
+        raw.close()
+
+    # VACUUM 设置可见性映射，聚合查询可以直接走覆盖索引的 Index Only Scan，不必等待 autovacuum
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE uniswap_swaps"))
+        conn.execute(text("VACUUM ANALYZE binance_trades"))
+    session = SessionLocal()
+    try:
+        # --reset 清空了整张表，变化范围无界；否则为本次生成的时间段
+        end = None if reset else start + timedelta(seconds=seconds)
+        publish_changes(session, [
+            ChangeRange(table, None if reset else start, end, rows) for table, rows in totals.items()
+        ])
+        record_swap_blocks(session)
+        session.commit()
+    finally:
+        session.close()
+    # 已建立列式快照时追加新封存的历史（--reset 后校验失败，快照会重建）
+    with engine.connect() as conn:
+        update_snapshots_if_enabled(conn)
+
+    totals["seconds"] = time.perf_counter() - started
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成可复现的合成行情数据")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--days", type=float, default=7, help="生成的天数")
+    parser.add_argument("--swaps-per-day", type=float, default=20000, help="平均每天的 Uniswap swap 数")
+    parser.add_argument("--binance-interval", type=int, default=60, help="Binance K 线间隔（秒）")
+    parser.add_argument("--start", default=DEFAULT_START.date().isoformat(), help="起始日期（UTC）")
+    parser.add_argument("--reset", action="store_true", help="先清空 uniswap_swaps、binance_trades 与区块时间索引")
+    parser.add_argument("--batch-rows", type=int, default=100_000, help="每次 COPY 的行数")
+    args = parser.parse_args()
+
+    start = datetime.fromisoformat(args.start).replace(tzinfo=None)
+    totals = generate(
+        args.seed, args.days, args.swaps_per_day, args.binance_interval, start, args.reset, args.batch_rows
+    )
+    rows = totals["uniswap_swaps"] + totals["binance_trades"]
+    print(
+        f"完成：uniswap_swaps {totals['uniswap_swaps']} 行，binance_trades {totals['binance_trades']} 行，"
+        f"耗时 {totals['seconds']:.1f}s（{rows / max(totals['seconds'], 1e-9):.0f} 行/秒）"
+    )
+
+
+if __name__ == "__main__":
+    main()
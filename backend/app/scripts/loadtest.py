@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 并发压测与基准对比（替代 api_latency_test.sh）。
+
+对每个端点依次压测：固定数量的并发客户端在给定时长内循环请求，统计
+p50 / p95 / p99 延迟、吞吐量和错误率，结果写入 JSON；指定 --baseline 时与基线对比，
+任一端点退化超过阈值即以非零状态退出，可直接用于部署前检查。
+
+用法:
+    python -m app.scripts.loadtest --base-url http://127.0.0.1:8000 --concurrency 50 --duration 10 \\
+        --output results.json
+    python -m app.scripts.loadtest --baseline results.json --threshold 0.2   # 与上一次结果对比
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from ..profiling import git_commit
+
+DEFAULT_ENDPOINTS = [
+    "/api/health",
+    "/api/db-check",
+    "/api/price-data",
+    "/api/arbitrage/statistics",
+    "/api/arbitrage/behaviors?page=1&page_size=5",
+    "/api/arbitrage/opportunities?min_profit_rate=0",
+]
+
+# 参与基线对比的指标：延迟越大越差，吞吐量越小越差
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """最近秩百分位数（输入需已排序）。"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    url: str,
+    deadline: float,
+    remaining: Optional[List[int]],
+    latencies: List[float],
+    errors: Dict[str, int],
+    sizes: List[int],
+) -> None:
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(url)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                key = str(response.status_code)
+                errors[key] = errors.get(key, 0) + 1
+            else:
+                latencies.append(elapsed)
+                sizes.append(len(response.content))
+        except httpx.HTTPError as exc:
+            key = type(exc).__name__
+            errors[key] = errors.get(key, 0) + 1
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    url: str,
+    concurrency: int,
+    duration: float,
+    requests: Optional[int],
+    warmup: float,
+) -> Dict[str, object]:
+    """压测单个端点：先预热（不计入统计），再由 concurrency 个客户端并发请求。"""
+    if warmup > 0:
+        await asyncio.gather(
+            *(
+                _worker(client, url, time.perf_counter() + warmup, None, [], {}, [])
+                for _ in range(concurrency)
+            )
+        )
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    sizes: List[int] = []
+    remaining = [requests] if requests is not None else None
+    deadline = time.perf_counter() + (duration if requests is None else float("inf"))
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _worker(client, url, deadline, remaining, latencies, errors, sizes)
+            for _ in range(concurrency)
+        )
+    )
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    error_count = sum(errors.values())
+    total = len(latencies) + error_count
+    return {
+        "requests": total,
+        "errors": error_count,
+        "error_breakdown": errors,
+        "error_rate": error_count / total if total else 0.0,
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "mean_bytes": sum(sizes) / len(sizes) if sizes else 0,
+    }
+
+
+async def run_suite(args) -> Dict[str, object]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, object] = {}
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout, limits=limits, headers={"Accept-Encoding": "gzip"}
+    ) as client:
+        for endpoint in args.endpoints:
+            result = await run_endpoint(
+                client, endpoint, args.concurrency, args.duration, args.requests, args.warmup
+            )
+            results[endpoint] = result
+            print(
+                f"==> {endpoint}\n"
+                f"  requests={result['requests']} errors={result['errors']} "
+                f"error_rate={result['error_rate']:.2%} throughput={result['throughput_rps']:.1f} req/s\n"
+                f"  p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+                f"p99={result['p99_ms']:.1f}ms max={result['max_ms']:.1f}ms"
+            )
+    return results
+
+
+def compare_with_baseline(
+    results: Dict[str, dict],
+    baseline: Dict[str, dict],
+    threshold: float,
+    min_delta_ms: float,
+    max_error_rate: float,
+) -> List[str]:
+    """
+    返回退化描述列表（为空表示通过）：
+    - 延迟百分位数比基线高出 threshold 比例且绝对差超过 min_delta_ms；
+    - 吞吐量比基线低 threshold 比例以上；
+    - 错误率超过 max_error_rate。
+    """
+    regressions: List[str] = []
+    for endpoint, current in results.items():
+        if current["error_rate"] > max_error_rate:
+            regressions.append(
+                f"{endpoint}: error_rate {current['error_rate']:.2%} > {max_error_rate:.2%}"
+            )
+        previous = baseline.get(endpoint)
+        if previous is None:
+            continue
+        for metric in LATENCY_METRICS:
+            before, after = previous[metric], current[metric]
+            if after > before * (1 + threshold) and after - before > min_delta_ms:
+                regressions.append(f"{endpoint}: {metric} {before:.1f} -> {after:.1f}")
+        before, after = previous["throughput_rps"], current["throughput_rps"]
+        if after < before * (1 - threshold):
+            regressions.append(f"{endpoint}: throughput_rps {before:.1f} -> {after:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 并发压测与基准对比")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="后端地址")
+    parser.add_argument(
+        "--endpoint", dest="endpoints", action="append", help="要压测的路径（可重复），默认与前端调用一致"
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个端点的压测时长（秒）")
+    parser.add_argument("--requests", type=int, help="改为每个端点固定请求总数（忽略 --duration）")
+    parser.add_argument("--warmup", type=float, default=1.0, help="每个端点的预热时长（秒），不计入统计")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求超时（秒）")
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", help="基线结果 JSON（同一脚本的输出）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对退化比例（0.2 = 20%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="延迟退化的最小绝对差（毫秒）")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="允许的最大错误率")
+    args = parser.parse_args()
+    args.endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    args.concurrency = max(1, args.concurrency)
+
+    print(f"Target base URL: {args.base_url}")
+    print(f"Concurrency: {args.concurrency}  "
+          + (f"requests/endpoint: {args.requests}" if args.requests else f"duration/endpoint: {args.duration}s"))
+    print()
+
+    results = asyncio.run(run_suite(args))
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration": None if args.requests else args.duration,
+            "requests": args.requests,
+            "git_commit": git_commit(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入 {args.output}")
+
+    baseline: Dict[str, dict] = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = compare_with_baseline(
+        results, baseline, args.threshold, args.min_delta_ms, args.max_error_rate
+    )
+    if regressions:
+        print("\n性能退化:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    if args.baseline:
+        print("\n与基线相比未发现性能退化")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+执行数据库迁移（在主库上），并为原始成交表预先创建月分区。
+
+用法:
+    python -m app.scripts.migrate            # 应用所有未执行的迁移
+    python -m app.scripts.migrate --check    # 只检查，结构不是最新时以状态 1 退出
+    python -m app.scripts.migrate --status   # 列出所有迁移及其是否已应用
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from ..database import engine
+from ..migrations import LATEST_VERSION, MIGRATIONS, SCHEMA_MIGRATIONS_TABLE, current_version, upgrade
+from ..partitions import ensure_partitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument("--check", action="store_true", help="只检查是否为最新版本")
+    parser.add_argument("--status", action="store_true", help="列出迁移及应用时间")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        version = current_version(conn)
+        applied_at = {}
+        if args.status and version is not None:
+            applied_at = dict(conn.execute(text(f"SELECT version, applied_at FROM {SCHEMA_MIGRATIONS_TABLE}")).all())
+
+    if args.status:
+        for migration_ in MIGRATIONS:
+            when = applied_at.get(migration_.version)
+            if when is not None:
+                state = when.isoformat()
+            elif version is not None and migration_.version <= version:
+                state = "已包含（按当前模型建库）"
+            else:
+                state = "未应用"
+            print(f"{migration_.version:04d}_{migration_.name}: {state}")
+        return
+
+    if args.check:
+        print(f"当前版本 {version or 0}，最新版本 {LATEST_VERSION}")
+        sys.exit(0 if version == LATEST_VERSION else 1)
+
+    if version == LATEST_VERSION:
+        print(f"数据库结构已是最新（版本 {LATEST_VERSION}）")
+    else:
+        applied = upgrade(engine)
+        print(f"已应用 {len(applied)} 个迁移，当前版本 {LATEST_VERSION}")
+
+    # 容器每次启动都会执行本脚本，借此滚动创建未来月份的分区
+    with engine.begin() as conn:
+        created = ensure_partitions(conn)
+    if created:
+        print(f"已创建分区: {', '.join(created)}")
+
+
+if __name__ == "__main__":
+    main()
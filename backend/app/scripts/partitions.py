@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+维护 uniswap_swaps / binance_trades 的月分区。
+
+用法:
+    python -m app.scripts.partitions                          # 创建缺失的月分区（含未来 PARTITION_PREMAKE_MONTHS 个月）
+    python -m app.scripts.partitions --list                   # 列出分区及行数估计
+    python -m app.scripts.partitions --detach-before 2025-06  # 分离 2025-06 之前的月份，保留为 *_archive_YYYYMM 表
+    python -m app.scripts.partitions --detach-before 2025-06 --drop   # 分离并删除
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import text
+
+from ..changes import ChangeRange, publish_changes
+from ..database import SessionLocal, engine
+from ..migrations import ensure_current
+from ..partitions import (
+    PARTITIONED_TABLES,
+    detach_partitions_before,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+)
+
+
+def _print_partitions() -> None:
+    with engine.connect() as conn:
+        for table in PARTITIONED_TABLES:
+            print(table)
+            for name, month in list_partitions(conn, table):
+                rows = conn.execute(
+                    text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+                ).scalar()
+                label = f"{month:%Y-%m}" if month else "default"
+                print(f"  {label:<8} {name:<32} ~{max(int(rows or 0), 0)} 行")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="维护原始成交表的月分区")
+    parser.add_argument("--list", action="store_true", help="列出分区")
+    parser.add_argument("--detach-before", metavar="YYYY-MM", help="分离早于该月份的分区")
+    parser.add_argument("--drop", action="store_true", help="与 --detach-before 一起使用：分离后直接删除")
+    args = parser.parse_args()
+
+    ensure_current(engine)
+    if args.list:
+        _print_partitions()
+        return
+
+    if args.detach_before:
+        before = datetime.strptime(args.detach_before, "%Y-%m")
+        session = SessionLocal()
+        try:
+            handled = detach_partitions_before(session.connection(), before, drop=args.drop)
+            if handled:
+                # 被分离的月份中的行不再可见
+                publish_changes(session, [
+                    ChangeRange(table, None, month_start(before)) for table in PARTITIONED_TABLES
+                ])
+            session.commit()
+        finally:
+            session.close()
+        action = "删除" if args.drop else "分离"
+        print(f"已{action} {len(handled)} 个分区" + (f": {', '.join(handled)}" if handled else ""))
+        return
+
+    with engine.begin() as conn:
+        created = ensure_partitions(conn)
+    print(f"已创建 {len(created)} 个分区" + (f": {', '.join(created)}" if created else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量数据流水线（取代 reset_recompute.sh 的"删表 - 全量采集 - 串行全量计算"）。
+
+阶段与依赖：
+
+    migrate ─> fetch ─┬─> snapshot ─> arbitrage
+                      └─> opportunities
+
+- 依赖满足的阶段并行运行，每个阶段在独立的工作进程中执行（两个计算阶段都是 CPU 密集的 Python 代码）；
+- 两个计算阶段各自在 pipeline_watermarks 表中记录上次成功时处理到的输入位置：两张原始表的最大 timestamp
+  （走索引，只读一行），以及已处理到的变更事件 id（data_changes，见 app/changes.py）。
+  之后只重算变化（新事件覆盖的时间范围，以及水位之后的新数据）影响到的范围：
+    opportunities：变化所在的分钟记录；
+    arbitrage：变化的 swap，以及变化的成交一个配对窗口内的 swap 的候选（见 compute_arbitrage.run）；
+  没有变化时跳过；事件范围无下界（重置、分区分离）或事件已被清理时改为全量重算。
+  判断变化不扫描原始表，代价与历史总量无关；--check-rows 额外统计水位之前的行数，
+  与上次记录的行数不同（未发布事件的外部回补、删除）时改为全量重算；
+- 全量重算需要显式指定：--full 重算全部结果（保留原始数据），--reset 删除所有表后重新采集再全量计算；
+- --watch 常驻运行：LISTEN 变更通知，原始表变化后（合并 --debounce 秒内的连续写入）立即增量重算；
+- 结束时打印各阶段的方式、开始时间、耗时与行数，--report（或 RUN_REPORT_DIR）写出 JSON 运行报告。
+
+用法:
+    python -m app.scripts.pipeline                 # 采集新数据并增量计算
+    python -m app.scripts.pipeline --skip-fetch    # 不采集，只处理数据库中已有的新数据（如 generate_synthetic 写入的）
+    python -m app.scripts.pipeline --full          # 计算阶段全部全量重算
+    python -m app.scripts.pipeline --reset         # 删除所有表，重新采集并全量计算（原 reset_recompute.sh）
+    python -m app.scripts.pipeline --status        # 显示各阶段的水位与下次运行的方式
+    python -m app.scripts.pipeline --check-rows    # 同时用行数检查未发布事件的外部写入（扫描原始表）
+    python -m app.scripts.pipeline --watch         # 常驻：原始表有变化（采集、回补、合成数据）时自动增量计算
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..changes import (
+    CHANGES_CHANNEL,
+    RAW_TABLES,
+    ChangeRange,
+    changes_after,
+    latest_change_id,
+    listen,
+    prune_changes,
+)
+from ..database import Base, SessionLocal, engine
+from ..migrations import SCHEMA_MIGRATIONS_TABLE, ensure_current
+from ..partitions import ensure_partitions
+from ..profiling import RunProfiler, StageRecord, add_profiling_arguments, peak_rss_bytes
+from ..snapshot import ColumnSnapshot, update_snapshots_if_enabled
+from . import compute_arbitrage
+from .compute_opportunities import compute_opportunities
+
+DEFAULT_JOBS = 2  # 同时运行的阶段数（两个计算阶段可以并行）
+DEFAULT_DEBOUNCE_SEC = 2.0  # --watch：收到通知后等待写入停止的时间，合并连续的批次
+
+
+# ========== 水位 ==========
+
+@dataclass(frozen=True)
+class InputState:
+    """两张原始表的最大 timestamp、读取时最新的变更事件 id，以及不晚于水位的行数（只在 --check-rows 时统计）。"""
+
+    uniswap_watermark: Optional[datetime]
+    binance_watermark: Optional[datetime]
+    uniswap_rows: Optional[int] = None
+    binance_rows: Optional[int] = None
+    change_id: int = 0
+
+
+@dataclass(frozen=True)
+class StagePlan:
+    """
+    一个阶段本次的运行方式：full / incremental / skip；
+    incremental 时 [since, until] 为重算的范围，until 为空表示到最新数据。
+    """
+
+    mode: str
+    reason: str
+    since: Optional[datetime] = None
+    state: Optional[InputState] = None
+    until: Optional[datetime] = None
+
+
+def _rows_until(session: Session, model, watermark: Optional[datetime]) -> int:
+    """timestamp <= watermark 的行数；走 timestamp 覆盖索引的 index-only scan，但仍与历史总量成正比。"""
+    if watermark is None:
+        return 0
+    return session.query(func.count()).select_from(model).filter(model.timestamp <= watermark).scalar()
+
+
+def read_input_state(session: Session, count_rows: bool = False) -> InputState:
+    # 先读事件位置：之后提交的写入留给下次运行，不会被本次的水位越过而漏掉
+    change_id = latest_change_id(session)
+    uniswap_watermark = session.query(func.max(models.UniswapSwap.timestamp)).scalar()
+    binance_watermark = session.query(func.max(models.BinanceTrade.timestamp)).scalar()
+    if not count_rows:
+        return InputState(uniswap_watermark, binance_watermark, change_id=change_id)
+    return InputState(
+        uniswap_watermark,
+        binance_watermark,
+        _rows_until(session, models.UniswapSwap, uniswap_watermark),
+        _rows_until(session, models.BinanceTrade, binance_watermark),
+        change_id,
+    )
+
+
+def plan_stage(session: Session, stage: "Stage", full: bool, check_rows: bool = False) -> StagePlan:
+    """
+    比较阶段水位、未处理的变更事件与当前输入，决定全量 / 增量 / 跳过。
+    check_rows 时统计原始表水位之前的行数，与上次记录的行数比较（扫描原始表）。
+    """
+    state = read_input_state(session, count_rows=check_rows)
+    if full:
+        return StagePlan("full", "--full", state=state)
+    row = session.get(models.PipelineWatermark, stage.name)
+    if row is None or row.uniswap_watermark is None or row.binance_watermark is None:
+        return StagePlan("full", "没有水位（首次运行）", state=state)
+    if state.uniswap_watermark is None or state.binance_watermark is None:
+        return StagePlan("full", "原始数据为空", state=state)
+
+    if row.change_id is None:
+        return StagePlan("full", "水位早于变更事件表", state=state)
+    changes = changes_after(session, row.change_id, RAW_TABLES, state.change_id)
+    if changes is None:
+        return StagePlan("full", "未处理的变更事件已被清理", state=state)
+    if check_rows and not changes and row.uniswap_rows is not None and row.binance_rows is not None:
+        # 没有事件：检查水位之前的数据是否被未发布事件的写入修改（上次没有统计行数时只记录本次的行数）
+        uniswap_rows = _rows_until(session, models.UniswapSwap, row.uniswap_watermark)
+        binance_rows = _rows_until(session, models.BinanceTrade, row.binance_watermark)
+        if (uniswap_rows, binance_rows) != (row.uniswap_rows, row.binance_rows):
+            return StagePlan(
+                "full",
+                f"水位之前的数据已变化（uniswap {row.uniswap_rows} -> {uniswap_rows}，"
+                f"binance {row.binance_rows} -> {binance_rows}）",
+                state=state,
+            )
+    # 水位之后的新数据总是计入（与同一区块的 swap 时间相同，从水位本身算起）
+    if state.uniswap_watermark > row.uniswap_watermark:
+        changes.append(ChangeRange("uniswap_swaps", row.uniswap_watermark, state.uniswap_watermark))
+    if state.binance_watermark > row.binance_watermark:
+        changes.append(ChangeRange("binance_trades", row.binance_watermark, state.binance_watermark))
+    if not changes:
+        return StagePlan("skip", "没有新数据", state=state)
+    unbounded = sorted({change.table for change in changes if change.start is None})
+    if unbounded:
+        return StagePlan("full", f"{', '.join(unbounded)} 整体变化（重置或分区分离）", state=state)
+    since, until = stage.affected(changes)
+    events = sum(1 for change in changes if change.rows is not None)
+    reason = f"{events} 个变更事件" if events else "有新数据"
+    return StagePlan("incremental", reason, since=since, state=state, until=until)
+
+
+def save_watermark(session: Session, stage: str, plan: StagePlan, seconds: float) -> None:
+    """阶段成功后记录本次处理到的输入位置。"""
+    row = session.get(models.PipelineWatermark, stage) or models.PipelineWatermark(stage=stage)
+    row.uniswap_watermark = plan.state.uniswap_watermark
+    row.binance_watermark = plan.state.binance_watermark
+    row.uniswap_rows = plan.state.uniswap_rows
+    row.binance_rows = plan.state.binance_rows
+    row.change_id = plan.state.change_id
+    row.mode = plan.mode
+    row.seconds = seconds
+    session.add(row)
+    session.commit()
+
+
+def save_row_counts(session: Session, stage: str, state: InputState) -> None:
+    """跳过的阶段没有处理新数据，只记录 --check-rows 统计的行数，作为下次比较的基准。"""
+    row = session.get(models.PipelineWatermark, stage)
+    if row is None or state.uniswap_rows is None:
+        return
+    row.uniswap_rows = state.uniswap_rows
+    row.binance_rows = state.binance_rows
+    session.commit()
+
+
+def _envelope(changes: List[ChangeRange], table: str) -> Optional[Tuple[datetime, Optional[datetime]]]:
+    """一张表所有变化范围的外包络；end 为空表示到最新数据。没有该表的变化时返回 None。"""
+    ranges = [change for change in changes if change.table == table]
+    if not ranges:
+        return None
+    ends = [change.end for change in ranges]
+    return min(change.start for change in ranges), None if None in ends else max(ends)
+
+
+def _affected_range(
+    changes: List[ChangeRange], margins: Dict[str, timedelta]
+) -> Tuple[datetime, Optional[datetime]]:
+    """各表变化范围向两侧各扩展 margins[table] 后的并集外包络。"""
+    starts, ends = [], []
+    for table, margin in margins.items():
+        envelope = _envelope(changes, table)
+        if envelope is None:
+            continue
+        starts.append(envelope[0] - margin)
+        ends.append(None if envelope[1] is None else envelope[1] + margin)
+    return min(starts), None if None in ends else max(ends)
+
+
+def _opportunities_affected(changes: List[ChangeRange]) -> Tuple[datetime, Optional[datetime]]:
+    # 分钟平均价格只取决于同一分钟的数据，变化所在的分钟需要重算
+    return _affected_range(changes, {table: timedelta(0) for table in RAW_TABLES})
+
+
+def _arbitrage_affected(changes: List[ChangeRange]) -> Tuple[datetime, Optional[datetime]]:
+    # 变化的 swap 本身需要重算；变化的成交只影响配对窗口内的 swap
+    window = timedelta(seconds=compute_arbitrage.PAIR_TIME_WINDOW_SEC)
+    return _affected_range(changes, {"uniswap_swaps": timedelta(0), "binance_trades": window})
+
+
+# ========== 阶段 ==========
+
+def _run_migrate(plan: Optional[StagePlan], options: dict, profiler: RunProfiler) -> Optional[int]:
+    ensure_current(engine)
+    with engine.begin() as conn:
+        ensure_partitions(conn)
+    return None
+
+
+def _run_fetch(plan: Optional[StagePlan], options: dict, profiler: RunProfiler) -> Optional[int]:
+    # 采集脚本在导入时读取 .env 与 API 配置，只在需要采集时导入
+    from .fetch_data import fetch_binance_data, fetch_uniswap_data
+
+    session = SessionLocal()
+    try:
+        with profiler.stage("uniswap") as stage:
+            stage.rows = fetch_uniswap_data(session)
+        with profiler.stage("binance") as stage:
+            stage.rows = fetch_binance_data(session)
+    finally:
+        session.close()
+    return sum(record.rows or 0 for record in profiler.stages)
+
+
+def _run_snapshot(plan: Optional[StagePlan], options: dict, profiler: RunProfiler) -> Optional[int]:
+    # 已建立列式快照时追加新封存的历史，未建立时什么也不做
+    with engine.connect() as conn:
+        updated = update_snapshots_if_enabled(conn)
+    return sum(result["rows"] for result in (updated or {}).values())
+
+
+def _run_opportunities(plan: Optional[StagePlan], options: dict, profiler: RunProfiler) -> Optional[int]:
+    session = SessionLocal()
+    try:
+        compute_opportunities(session, start_time=plan.since, end_time=plan.until, profiler=profiler)
+    finally:
+        session.close()
+    return next((record.rows for record in profiler.stages if record.name == "store"), None)
+
+
+def _run_arbitrage(plan: Optional[StagePlan], options: dict, profiler: RunProfiler) -> Optional[int]:
+    snapshot = ColumnSnapshot() if options["snapshot"] else None
+    session = SessionLocal()
+    try:
+        compute_arbitrage.run(session, profiler, snapshot, since=plan.since, until=plan.until)
+    finally:
+        session.close()
+    return next((record.rows for record in profiler.stages if record.name == "store"), None)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    depends_on: Tuple[str, ...]
+    run: Callable[[Optional[StagePlan], dict, RunProfiler], Optional[int]]
+    # 有水位的计算阶段：由原始表的变化范围得到增量重算的 [since, until]；None 表示每次都运行
+    affected: Optional[Callable[[List[ChangeRange]], Tuple[datetime, Optional[datetime]]]] = None
+
+
+STAGES: Dict[str, Stage] = {
+    stage.name: stage
+    for stage in (
+        Stage("migrate", (), _run_migrate),
+        Stage("fetch", ("migrate",), _run_fetch),
+        Stage("snapshot", ("fetch",), _run_snapshot),
+        Stage("opportunities", ("fetch",), _run_opportunities, _opportunities_affected),
+        Stage("arbitrage", ("snapshot",), _run_arbitrage, _arbitrage_affected),
+    )
+}
+
+
+def _execute(name: str, plan: Optional[StagePlan], options: dict) -> dict:
+    """在工作进程中运行一个阶段；输出先缓存，由主进程按阶段整段打印，避免并行阶段的输出交错。"""
+    output = io.StringIO()
+    profiler = RunProfiler(name)
+    cpu_started = time.process_time()
+    error = None
+    rows = None
+    with redirect_stdout(output):
+        try:
+            rows = STAGES[name].run(plan, options, profiler)
+        except Exception:
+            error = traceback.format_exc()
+    return {
+        "rows": rows,
+        "error": error,
+        "output": output.getvalue(),
+        "cpu_seconds": time.process_time() - cpu_started,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "stages": [record.to_dict() for record in profiler.stages],
+    }
+
+
+# ========== 调度 ==========
+
+@dataclass
+class StageRun:
+    name: str
+    plan: Optional[StagePlan]
+    status: str = "pending"  # pending / running / ok / skipped / failed / blocked
+    started: float = 0.0
+    seconds: float = 0.0
+    result: dict = field(default_factory=dict)
+
+
+def _reset_database() -> None:
+    """删除所有表与迁移记录（原 reset_recompute.sh 的第一步），之后由 migrate 阶段重建。"""
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA_MIGRATIONS_TABLE}"))
+    print("已删除所有表")
+
+
+def run_pipeline(args: argparse.Namespace, profiler: RunProfiler) -> List[StageRun]:
+    skipped = {"fetch": "--skip-fetch"} if args.skip_fetch else {}
+    options = {"snapshot": not args.no_snapshot}
+    runs = {name: StageRun(name, None) for name in STAGES}
+    pipeline_started = time.perf_counter()
+
+    def ready(run: StageRun) -> bool:
+        return all(runs[dep].status in ("ok", "skipped") for dep in STAGES[run.name].depends_on)
+
+    def blocked(run: StageRun) -> bool:
+        return any(runs[dep].status in ("failed", "blocked") for dep in STAGES[run.name].depends_on)
+
+    def plan_for(name: str) -> Optional[StagePlan]:
+        if name in skipped:
+            return StagePlan("skip", skipped[name])
+        if STAGES[name].affected is None:
+            return None
+        # 计算阶段在依赖（采集）完成后才读取输入位置，本次采集的数据计入本次运行
+        session = SessionLocal()
+        try:
+            return plan_stage(session, STAGES[name], full=args.full, check_rows=args.check_rows)
+        finally:
+            session.close()
+
+    running = {}
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=get_context("spawn")) as pool:
+        while True:
+            # STAGES 按依赖顺序排列，一轮即可处理完本轮就绪（含因跳过而就绪）的阶段
+            for run in runs.values():
+                if run.status != "pending":
+                    continue
+                if blocked(run):
+                    run.status = "blocked"
+                elif ready(run):
+                    run.plan = plan_for(run.name)
+                    run.started = time.perf_counter() - pipeline_started
+                    if run.plan is not None and run.plan.mode == "skip":
+                        run.status = "skipped"
+                        print(f"[{run.name}] 跳过：{run.plan.reason}")
+                        if run.plan.state is not None:
+                            session = SessionLocal()
+                            try:
+                                save_row_counts(session, run.name, run.plan.state)
+                            finally:
+                                session.close()
+                        continue
+                    run.status = "running"
+                    running[pool.submit(_execute, run.name, run.plan, options)] = run
+                    description = "" if run.plan is None else f"（{_describe_plan(run.plan)}）"
+                    print(f"[{run.name}] 开始{description}", flush=True)
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                run = running.pop(future)
+                run.seconds = time.perf_counter() - pipeline_started - run.started
+                try:
+                    run.result = future.result()
+                except Exception:  # 工作进程异常退出
+                    run.result = {"error": traceback.format_exc(), "output": "", "stages": []}
+                run.status = "failed" if run.result["error"] else "ok"
+                _print_stage_output(run)
+                if run.status == "ok" and run.plan is not None and run.plan.state is not None:
+                    session = SessionLocal()
+                    try:
+                        save_watermark(session, run.name, run.plan, run.seconds)
+                    finally:
+                        session.close()
+
+    for run in runs.values():
+        record = StageRecord(run.name, run.result.get("rows"))
+        record.seconds = run.seconds
+        record.cpu_seconds = run.result.get("cpu_seconds", 0.0)
+        record.peak_rss_bytes = run.result.get("peak_rss_bytes")
+        record.details = {
+            "status": run.status,
+            "mode": run.plan.mode if run.plan else "run",
+            "reason": run.plan.reason if run.plan else None,
+            "since": run.plan.since.isoformat() if run.plan and run.plan.since else None,
+            "until": run.plan.until.isoformat() if run.plan and run.plan.until else None,
+            "started_offset_seconds": run.started,
+            "stages": run.result.get("stages", []),
+        }
+        profiler.stages.append(record)
+    _prune_changes()
+    return list(runs.values())
+
+
+def _prune_changes() -> None:
+    session = SessionLocal()
+    try:
+        deleted = prune_changes(session)
+        session.commit()
+    finally:
+        session.close()
+    if deleted:
+        print(f"已清理 {deleted} 条过期的变更事件")
+
+
+def _describe_plan(plan: StagePlan) -> str:
+    if plan.mode == "incremental":
+        until = "" if plan.until is None else f" 到 {plan.until}"
+        return f"增量（{plan.reason}），从 {plan.since} 起{until}"
+    return f"{'全量' if plan.mode == 'full' else plan.mode}：{plan.reason}"
+
+
+def _print_stage_output(run: StageRun) -> None:
+    print(f"\n----- [{run.name}] {'完成' if run.status == 'ok' else '失败'}，{run.seconds:.1f}s -----")
+    output = run.result.get("output", "")
+    if output:
+        print(output.rstrip())
+    if run.result.get("error"):
+        print(run.result["error"].rstrip())
+    sys.stdout.flush()
+
+
+def _print_summary(runs: List[StageRun], wall_seconds: float) -> None:
+    print("\n" + "=" * 72)
+    # 中文表头每个字占两列宽
+    print(f"{'阶段':<14}{'结果':<10}{'方式':<14}{'开始':>6}{'耗时':>7}{'行数':>9}")
+    for run in runs:
+        mode = "-" if run.plan is None else run.plan.mode
+        rows = run.result.get("rows")
+        print(
+            f"{run.name:<16}{run.status:<12}{mode:<16}{run.started:>7.1f}s{run.seconds:>8.1f}s"
+            f"{'-' if rows is None else rows:>11}"
+        )
+    serial = sum(run.seconds for run in runs)
+    print(f"总耗时 {wall_seconds:.1f}s（各阶段耗时合计 {serial:.1f}s）")
+    print("=" * 72)
+
+
+def _print_status() -> None:
+    session = SessionLocal()
+    try:
+        ensure_current(engine)
+        for stage in STAGES.values():
+            if stage.affected is None:
+                continue
+            row = session.get(models.PipelineWatermark, stage.name)
+            if row is None:
+                print(f"{stage.name:<14} 没有水位")
+            else:
+                uniswap_rows = "" if row.uniswap_rows is None else f" ({row.uniswap_rows} 行)"
+                binance_rows = "" if row.binance_rows is None else f" ({row.binance_rows} 行)"
+                print(
+                    f"{stage.name:<14} uniswap {row.uniswap_watermark}{uniswap_rows}  "
+                    f"binance {row.binance_watermark}{binance_rows}  "
+                    f"事件 #{row.change_id or 0}  "
+                    f"上次 {row.mode} {row.seconds or 0:.1f}s @ {row.updated_at}"
+                )
+            print(f"{'':<14} 下次运行：{_describe_plan(plan_stage(session, stage, full=False))}")
+    finally:
+        session.close()
+
+
+def _run_once(args: argparse.Namespace) -> List[str]:
+    """运行一次流水线并打印汇总，返回未完成的阶段。"""
+    started = time.perf_counter()
+    with RunProfiler.from_args("pipeline", args) as profiler:
+        runs = run_pipeline(args, profiler)
+        _print_summary(runs, time.perf_counter() - started)
+    return [run.name for run in runs if run.status in ("failed", "blocked")]
+
+
+def _watch(args: argparse.Namespace) -> None:
+    """
+    常驻运行：启动时先处理一次积压的变化，之后 LISTEN 变更通知，原始表有变化时增量重算。
+    收到通知后等待 debounce 秒内没有新的原始表通知再运行，把连续写入的批次合并为一次重算；
+    计算阶段自己发布的结果表通知被忽略。运行期间到达的通知在连接上排队，结束后立即处理。
+    """
+    args.skip_fetch = True
+    print(f"监听 {CHANGES_CHANNEL} 通知（debounce {args.debounce}s），Ctrl+C 退出")
+    failed = _run_once(args)
+    if failed:
+        print(f"未完成的阶段: {', '.join(failed)}")
+    args.full = False  # --full 只作用于启动时的第一次运行
+    pending = set()
+    try:
+        for notifications in listen(engine, timeout=args.debounce):
+            tables = {table for note in notifications for table in note.get("tables", ()) if table in RAW_TABLES}
+            if tables:
+                pending |= tables
+                continue
+            if not pending or notifications:
+                continue
+            print(f"\n原始表有变化（{', '.join(sorted(pending))}），开始增量计算")
+            pending.clear()
+            failed = _run_once(args)
+            if failed:
+                print(f"未完成的阶段: {', '.join(failed)}（下次变化时重试）")
+    except KeyboardInterrupt:
+        print("已停止监听")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="增量数据流水线：采集、快照与两个计算阶段")
+    parser.add_argument("--full", action="store_true", help="计算阶段全部全量重算（不删除原始数据）")
+    parser.add_argument("--reset", action="store_true", help="删除所有表后重新采集并全量计算")
+    parser.add_argument("--skip-fetch", action="store_true", help="不采集新数据")
+    parser.add_argument("--no-snapshot", action="store_true", help="compute_arbitrage 不使用列式快照")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help=f"同时运行的阶段数（默认 {DEFAULT_JOBS}）")
+    parser.add_argument("--status", action="store_true", help="显示各阶段水位与下次运行的方式")
+    parser.add_argument("--check-rows", action="store_true",
+                        help="统计原始表水位之前的行数，发现未发布事件的外部写入（扫描原始表）")
+    parser.add_argument("--watch", action="store_true", help="常驻运行，原始表有变化时自动增量计算（不采集）")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE_SEC,
+                        help=f"--watch 合并连续写入的等待秒数（默认 {DEFAULT_DEBOUNCE_SEC}）")
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.status:
+        _print_status()
+        return
+    if args.watch:
+        _watch(args)
+        return
+    if args.reset:
+        _reset_database()
+        args.full = True
+
+    failed = _run_once(args)
+    if failed:
+        print(f"未完成的阶段: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+执行计划回归检查：运行计算脚本并在进程内请求 API，记录它们实际发出的每条 SELECT，
+逐条 EXPLAIN (ANALYZE, BUFFERS)，报告：
+- 行数达到 --large-table-rows 的表（分区）上的顺序扫描（ALLOWED_SEQ_SCANS 中登记的除外）；
+- 扫描节点估计行数与实际行数相差超过 --estimate-factor 倍（统计信息过期或条件写法让规划器失明）；
+- query_plans.PLAN_CHECKS 中热点查询未使用预期索引。
+发现任何问题时以状态 1 退出，可作为合并前的检查步骤。
+
+规划器只在数据量足够时才会选用索引，应在接近真实规模的数据上运行：
+    python -m app.scripts.plan_regression --generate          # 重置并生成 30 天合成数据后检查
+    python -m app.scripts.plan_regression                     # 使用现有数据（会重新运行计算脚本）
+    python -m app.scripts.plan_regression --skip-compute --output plans.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+from datetime import timedelta
+from typing import Dict, List
+
+from sqlalchemy import func, select
+
+from ..database import SessionLocal, async_engine, engine
+from .. import models
+from ..query_plans import (
+    ESTIMATE_FACTOR,
+    LARGE_TABLE_ROWS,
+    PLAN_CHECKS,
+    QueryRecorder,
+    check_parameters,
+    check_plan,
+    plan_buffers,
+    plan_problems,
+)
+
+# 按来源登记允许的顺序扫描（父表名）：这些查询本来就读取整张表，索引没有帮助
+ALLOWED_SEQ_SCANS: Dict[str, List[str]] = {
+    # 全量加载所有 swap 与成交到内存中配对
+    "compute_arbitrage": ["uniswap_swaps", "binance_trades", "arbitrage_opportunities"],
+    # 全量按分钟聚合两张原始表
+    "compute_opportunities": ["uniswap_swaps", "binance_trades"],
+    # 不带条件的全量返回
+    "/api/arbitrage/opportunities": ["arbitrage_opportunities_minute"],
+    "/api/export/arbitrage_opportunities_minute": ["arbitrage_opportunities_minute"],
+    # 默认范围覆盖全部数据；binance_trades 每分钟一行，全表读取比走索引便宜
+    "/api/series": ["arbitrage_opportunities_minute", "binance_trades"],
+}
+
+
+def run_compute_scripts(recorder: QueryRecorder) -> None:
+    """运行计算脚本（输出丢弃），记录它们在写引擎上发出的查询。"""
+    from . import compute_arbitrage, compute_opportunities
+
+    for name, script in (("compute_opportunities", compute_opportunities),
+                         ("compute_arbitrage", compute_arbitrage)):
+        recorder.source = name
+        print(f"运行 {name} ...")
+        with recorder.capture(engine, "sync"), contextlib.redirect_stdout(io.StringIO()):
+            script.main([])
+
+
+def api_requests() -> List[str]:
+    """覆盖各端点主要参数组合的请求路径，时间范围取自现有数据。"""
+    with SessionLocal() as session:
+        latest = session.scalar(select(func.max(models.UniswapSwap.timestamp)))
+        first_opportunity = session.scalar(select(func.min(models.ArbitrageOpportunityMinute.timestamp)))
+        # 只有约 1% 的行满足的利润阈值，检查 min_profit 过滤能否走 (profit, id) 索引
+        top_profit = session.scalar(
+            select(func.percentile_disc(0.99).within_group(models.ArbitrageOpportunity.profit))
+        )
+    if latest is None:
+        raise SystemExit("数据库中没有 swap 数据，先运行 generate_synthetic 或 fetch_data")
+    day = latest.date()
+    week_ago = day - timedelta(days=7)
+    window_start = (first_opportunity or latest).replace(microsecond=0)
+    window_end = window_start + timedelta(days=1)
+    return [
+        f"/api/price-data?start_date={week_ago}&end_date={day}",
+        "/api/price-data",
+        "/api/arbitrage/statistics",
+        "/api/arbitrage/statistics?by=day",
+        "/api/arbitrage/statistics?by=direction",
+        "/api/arbitrage/behaviors",
+        "/api/arbitrage/behaviors?sort_by=buy_timestamp&sort_order=asc",
+        f"/api/arbitrage/behaviors?sort_by=sell_timestamp&min_profit={top_profit or 0}",
+        "/api/arbitrage/behaviors?total_mode=estimate&page=20",
+        "/api/arbitrage/opportunities",
+        f"/api/arbitrage/opportunities?start_time={window_start.isoformat()}"
+        f"&end_time={window_end.isoformat()}&min_profit_rate=0.001",
+        "/api/arbitrage/opportunities?limit=100&page=3",
+        "/api/series",
+        f"/api/series?start_time={window_start.isoformat()}&end_time={window_end.isoformat()}&method=minmax",
+        f"/api/export/uniswap_swaps?start_time={day.isoformat()}T00:00:00&end_time={day.isoformat()}T23:59:59",
+        "/api/export/arbitrage_opportunities_minute",
+        "/api/db-check",
+    ]
+
+
+async def request_api(recorder: QueryRecorder, paths: List[str]) -> None:
+    """在进程内请求 API（不经过网络），记录读引擎上发出的查询。"""
+    import httpx
+
+    from ..main import app, response_cache
+
+    response_cache.clear()  # 缓存命中不会发出查询
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plan-regression") as client:
+        with recorder.capture(async_engine.sync_engine, "async"):
+            for path in paths:
+                recorder.source = path.split("?", 1)[0]
+                response = await client.get(path)
+                if response.status_code != 200:
+                    raise SystemExit(f"{path} 返回 {response.status_code}: {response.text[:200]}")
+                # 带上一页 next_cursor 再请求一次，覆盖 keyset 翻页语句
+                if recorder.source == "/api/arbitrage/behaviors" and "total_mode" not in path:
+                    cursor = response.json().get("next_cursor")
+                    if cursor:
+                        separator = "&" if "?" in path else "?"
+                        await client.get(f"{path}{separator}cursor={cursor}")
+
+
+async def explain_async(queries) -> Dict[int, dict]:
+    plans = {}
+    async with async_engine.connect() as conn:
+        for index, query in queries:
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.statement, query.parameters
+            )
+            plan = result.scalar()
+            plans[index] = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+            await conn.rollback()
+    return plans
+
+
+async def capture_api_plans(recorder: QueryRecorder) -> Dict[int, dict]:
+    """请求 API 并 EXPLAIN 读引擎上记录到的查询（同一个事件循环，连接池中的 asyncpg 连接不能跨循环使用）。"""
+    await request_api(recorder, api_requests())
+    return await explain_async(
+        [(i, q) for i, q in enumerate(recorder.queries.values()) if q.engine == "async"]
+    )
+
+
+def explain_queries(recorder: QueryRecorder, plans: Dict[int, dict], args) -> List[dict]:
+    queries = list(enumerate(recorder.queries.values()))
+    report = []
+    with engine.connect() as conn:
+        for index, query in queries:
+            if query.engine == "sync":
+                plan = conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.statement, query.parameters
+                ).scalar()[0]
+                conn.rollback()
+            else:
+                plan = plans[index]
+            problems = plan_problems(
+                conn, plan, ALLOWED_SEQ_SCANS.get(query.source, ()),
+                large_table_rows=args.large_table_rows, estimate_factor=args.estimate_factor,
+            )
+            report.append({
+                "source": query.source,
+                "statement": " ".join(query.statement.split()),
+                **plan_buffers(plan),
+                "problems": problems,
+                "plan": plan,
+            })
+
+        params = check_parameters(conn)
+        for check in PLAN_CHECKS:
+            result = check_plan(conn, check, params, analyze=True)
+            report.append({
+                "source": f"plan_check:{check.name}",
+                "statement": " ".join(check.sql.split()),
+                **plan_buffers(result.plan),
+                "problems": result.problems,
+                "plan": result.plan,
+            })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE API 与计算脚本发出的查询，发现不良计划时失败")
+    parser.add_argument("--generate", action="store_true", help="先重置并生成合成数据（generate_synthetic）")
+    parser.add_argument("--seed", type=int, default=42, help="合成数据随机种子")
+    parser.add_argument("--days", type=float, default=30, help="合成数据天数")
+    parser.add_argument("--swaps-per-day", type=float, default=20000, help="合成数据每天 swap 数")
+    parser.add_argument("--skip-compute", action="store_true",
+                        help="不运行计算脚本（只检查 API 查询，使用现有计算结果）")
+    parser.add_argument("--large-table-rows", type=int, default=LARGE_TABLE_ROWS,
+                        help=f"顺序扫描视为问题的表行数下限（默认 {LARGE_TABLE_ROWS}）")
+    parser.add_argument("--estimate-factor", type=float, default=ESTIMATE_FACTOR,
+                        help=f"估计行数与实际行数允许的最大倍数（默认 {ESTIMATE_FACTOR}）")
+    parser.add_argument("--output", help="将完整报告（含 JSON 计划）写入该文件")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        from .generate_synthetic import generate
+
+        print(f"生成合成数据: {args.days} 天, 每天 {args.swaps_per_day:g} 个 swap ...")
+        generate(args.seed, args.days, args.swaps_per_day, reset=True)
+
+    recorder = QueryRecorder()
+    if not args.skip_compute:
+        run_compute_scripts(recorder)
+    plans = asyncio.run(capture_api_plans(recorder))
+    report = explain_queries(recorder, plans, args)
+
+    failures = 0
+    for entry in report:
+        status = "FAIL" if entry["problems"] else "OK  "
+        print(f"{status} {entry['source']:<44} {entry['execution_ms'] or 0:>9.1f} ms  "
+              f"hit={entry['shared_hit']:<7} read={entry['shared_read']:<7} rows={entry['rows']}")
+        if entry["problems"]:
+            print(f"       {entry['statement'][:160]}")
+            for problem in entry["problems"]:
+                print(f"       {problem}")
+        failures += bool(entry["problems"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        print(f"报告已写入 {args.output}")
+
+    print(f"{len(report) - failures}/{len(report)} 条查询计划通过检查")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在不同规模的合成数据集上对整条流水线计时。
+
+对每个规模（每天 swap 数 × 天数）依次：
+1. 用 generate_synthetic 清空并重新生成原始数据（固定种子，结果可复现）；
+2. 计时 compute_opportunities 与 compute_arbitrage 及其各阶段（脚本输出默认静默）；
+3. 启动一个本地 uvicorn 子进程，用 loadtest 的逐端点压测测量 API 延迟与吞吐量。
+
+结果写入 JSON，便于在不同提交之间比较。注意：会覆盖当前数据库中的原始数据与计算结果，
+只应在专用的测试库上运行。
+
+用法:
+    python -m app.scripts.run_benchmarks --scale 1x7 --scale 10x7 --output bench.json
+    python -m app.scripts.run_benchmarks --scale 100x100 --skip-api      # 约 1000 万行 swap
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import httpx
+
+from ..database import SessionLocal
+from ..profiling import RunProfiler, git_commit
+from . import compute_arbitrage, generate_synthetic
+from .compute_opportunities import compute_opportunities
+from .loadtest import DEFAULT_ENDPOINTS, run_endpoint
+
+SWAPS_PER_UNIT = 10_000  # --scale 中 1 个单位对应的每天 swap 数
+
+
+def parse_scale(value: str) -> Tuple[int, float]:
+    """"10x7" -> (每天 100000 笔 swap, 7 天)。"""
+    try:
+        units, days = value.lower().split("x")
+        return int(float(units) * SWAPS_PER_UNIT), float(days)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid scale {value!r}, expected UNITSxDAYS (e.g. 10x7)")
+
+
+def _timed(name: str, func, quiet: bool) -> Dict[str, object]:
+    """运行 func(session, profiler)，返回总耗时与各阶段统计。"""
+    profiler = RunProfiler(name, verbose=False)
+    session = SessionLocal()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            with profiler:
+                func(session, profiler)
+    finally:
+        session.close()
+    return {
+        "seconds": time.perf_counter() - started,
+        "stages": [stage.to_dict() for stage in profiler.stages],
+    }
+
+
+def _run_compute_opportunities(session, profiler: RunProfiler) -> None:
+    compute_opportunities(session, profiler=profiler)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def api_server(startup_timeout: float = 30.0):
+    """在空闲端口上启动 uvicorn 子进程，等待 /api/health 就绪后返回 base URL。"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _api_suite(base_url: str, endpoints: List[str], args) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=60.0, limits=limits, headers={"Accept-Encoding": "gzip"}
+    ) as client:
+        for endpoint in endpoints:
+            results[endpoint] = await run_endpoint(
+                client, endpoint, args.concurrency, args.duration, None, args.warmup
+            )
+    return results
+
+
+def run_scale(swaps_per_day: int, days: float, args) -> Dict[str, object]:
+    label = f"{swaps_per_day}/day x {days:g}d"
+    print(f"==> {label}")
+    result: Dict[str, object] = {"swaps_per_day": swaps_per_day, "days": days}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generated = generate_synthetic.generate(args.seed, days, swaps_per_day, reset=True)
+    swaps = generated["uniswap_swaps"]
+    result["rows"] = {"uniswap_swaps": swaps, "binance_trades": generated["binance_trades"]}
+    result["generate_seconds"] = generated["seconds"]
+    print(f"  generated {swaps} swaps, {generated['binance_trades']} klines in {generated['seconds']:.1f}s")
+
+    result["compute"] = {
+        "compute_opportunities": _timed("compute_opportunities", _run_compute_opportunities, not args.verbose),
+        "compute_arbitrage": _timed("compute_arbitrage", compute_arbitrage.run, not args.verbose),
+    }
+    for name, timing in result["compute"].items():
+        seconds = timing["seconds"]
+        timing["swaps_per_second"] = swaps / seconds if seconds else 0.0
+        slowest = max(timing["stages"], key=lambda stage: stage["seconds"], default=None)
+        print(
+            f"  {name}: {seconds:.2f}s ({timing['swaps_per_second']:.0f} swaps/s)"
+            + (f", slowest stage {slowest['name']} {slowest['seconds']:.2f}s" if slowest else "")
+        )
+
+    if not args.skip_api:
+        with api_server() as base_url:
+            api = asyncio.run(_api_suite(base_url, args.endpoints, args))
+        result["api"] = api
+        for endpoint, stats in api.items():
+            print(
+                f"  {endpoint}: p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+                f"throughput={stats['throughput_rps']:.1f} req/s errors={stats['errors']}"
+            )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在合成数据集上对计算脚本和 API 计时")
+    parser.add_argument(
+        "--scale", dest="scales", action="append", type=parse_scale,
+        help=f"数据规模 UNITSxDAYS（1 单位 = 每天 {SWAPS_PER_UNIT} 笔 swap，可重复），默认 1x7",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="合成数据的随机种子")
+    parser.add_argument("--endpoint", dest="endpoints", action="append", help="要压测的路径（可重复）")
+    parser.add_argument("--concurrency", type=int, default=10, help="API 压测并发数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每个端点的压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=1.0, help="每个端点的预热时长（秒）")
+    parser.add_argument("--skip-api", action="store_true", help="只计时计算脚本")
+    parser.add_argument("--verbose", action="store_true", help="显示计算脚本自身的输出")
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+    args.scales = args.scales or [parse_scale("1x7")]
+    args.endpoints = args.endpoints or DEFAULT_ENDPOINTS
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "seed": args.seed,
+            "git_commit": git_commit(),
+        },
+        "results": [run_scale(swaps_per_day, days, args) for swaps_per_day, days in args.scales],
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+维护 compute_arbitrage 使用的列式快照（app/snapshot.py）。
+
+用法:
+    python -m app.scripts.snapshot              # 建立快照，或追加新封存的历史（之后 fetch_data 等会自动追加）
+    python -m app.scripts.snapshot --status     # 显示各表快照的水位、段数与是否可用
+    python -m app.scripts.snapshot --rebuild    # 删除后重建
+    python -m app.scripts.snapshot --remove     # 删除快照（计算脚本改为全部从数据库读取）
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import time
+
+from ..database import engine
+from ..migrations import ensure_current
+from ..snapshot import SNAPSHOT_TABLES, ColumnSnapshot
+
+
+def _print_status(snapshot: ColumnSnapshot) -> None:
+    print(f"快照目录: {snapshot.directory}")
+    with engine.connect() as conn:
+        for table in SNAPSHOT_TABLES.values():
+            manifest = snapshot.manifest(table)
+            if manifest is None:
+                print(f"  {table.name:<16} 没有快照")
+                continue
+            reason = snapshot.stale_reason(conn, table, manifest)
+            print(
+                f"  {table.name:<16} 水位 {manifest['watermark']}  版本 {manifest['generation']}  {manifest['rows']} 行 / "
+                f"{len(manifest['segments'])} 段  {'可用' if reason is None else reason}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="维护计算脚本的列式快照")
+    parser.add_argument("--status", action="store_true", help="显示快照状态")
+    parser.add_argument("--rebuild", action="store_true", help="删除后重建快照")
+    parser.add_argument("--remove", action="store_true", help="删除快照")
+    args = parser.parse_args(argv)
+
+    snapshot = ColumnSnapshot()
+    if args.status:
+        _print_status(snapshot)
+        return
+    if args.remove:
+        shutil.rmtree(snapshot.directory, ignore_errors=True)
+        print(f"已删除 {snapshot.directory}")
+        return
+
+    ensure_current(engine)
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        results = snapshot.update_all(conn, rebuild=args.rebuild)
+    for name, result in results.items():
+        print(f"{name}: 追加 {result['rows']} 行，水位 {result['watermark']}")
+    print(f"耗时 {time.perf_counter() - started:.1f}s，目录 {snapshot.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+列表接口的快速序列化路径。
+
+查询只选取需要的列（不构造 ORM 实例），由 orjson 一次性编码为 bytes；
+naive datetime 按 UTC 输出为 "2025-09-01T12:00:00Z"，与原先的 isoformat().replace("+00:00", "Z") 一致。
+编码结果直接作为原始 Response 返回，也可原样放入响应缓存，命中时无需再次编码。
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable, List, Sequence
+
+import orjson
+from fastapi import Response
+
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def dumps(obj: Any) -> bytes:
+    """将对象编码为 JSON bytes（datetime 视为 UTC）。"""
+    return orjson.dumps(obj, option=ORJSON_OPTIONS)
+
+
+def dumps_ndjson(records: Iterable[dict]) -> bytes:
+    """将一批记录编码为 NDJSON（每行一个 JSON 对象）。"""
+    option = ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+    return b"".join(orjson.dumps(record, option=option) for record in records)
+
+
+def rows_to_records(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """将列查询返回的元组按列名转换为字典列表。"""
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    """以原始 bytes 返回 JSON，跳过 FastAPI 的 jsonable_encoder。"""
+    return Response(content=body, status_code=status_code, media_type="application/json")
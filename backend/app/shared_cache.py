@@ -0,0 +1,172 @@
+"""
+多 worker 共享的响应缓存（本地文件，推荐放在 /dev/shm 这类内存文件系统上）。
+
+每个 worker 仍保留进程内的 ResponseCache 作为一级缓存；一级缓存未命中时查询这里：
+条目按数据版本分目录保存为 `{dir}/{generation:x}/{sha1(key)}`，写入时先写临时文件再 os.replace，
+读取方不会看到半个文件。同一个条目由 fcntl 文件锁保证只计算一次——其他 worker（以及本进程内的其他协程）
+以非阻塞方式（LOCK_NB）反复尝试加锁，失败时在事件循环中退避等待（不占用线程池的线程），
+期间条目一旦写好就直接读取。
+
+数据版本变化后，第一个写入新版本的 worker 删除旧版本目录。
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Awaitable, Callable, Optional, Tuple
+
+from .cache import CacheKey
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # uvicorn 同样读取该变量作为 worker 数
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "1024"))  # 每个数据版本最多保存的条目数
+LOCK_SUFFIX = ".lock"
+LOCK_RETRY_INITIAL = 0.001  # 加锁失败后的首次等待（秒），之后逐次翻倍
+LOCK_RETRY_MAX = 0.05  # 单次等待的上限（秒）
+
+
+def default_shared_cache_dir() -> Optional[str]:
+    """
+    SHARED_CACHE_DIR 显式设置时使用该目录（设为空字符串则关闭）；
+    未设置且以多 worker 运行时默认使用 /dev/shm（不存在时为系统临时目录）。
+    """
+    configured = os.getenv("SHARED_CACHE_DIR")
+    if configured is not None:
+        return configured or None
+    if WEB_CONCURRENCY <= 1:
+        return None
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "arbitrage-api-cache")
+
+
+def _key_digest(key: CacheKey) -> str:
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+class SharedFileCache:
+    """跨进程的 bytes 缓存；所有文件操作都很短，直接在事件循环中执行，锁等待是异步的退避重试。"""
+
+    def __init__(self, directory: str, max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max(0, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._cleaned_generation: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _generation_dir(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{generation:x}")
+
+    def _path(self, generation: int, key: CacheKey) -> str:
+        return os.path.join(self._generation_dir(generation), _key_digest(key))
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def _lock(self, path: str) -> Tuple[Optional[int], Optional[bytes]]:
+        """
+        获取条目的文件锁，返回 (fd, None)；等待期间其他 worker 已写好条目时不再加锁，返回 (None, data)。
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path + LOCK_SUFFIX, os.O_CREAT | os.O_RDWR, 0o600)
+        delay = LOCK_RETRY_INITIAL
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd, None
+                except BlockingIOError:
+                    pass
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LOCK_RETRY_MAX)
+                data = self._read(path)
+                if data is not None:
+                    os.close(fd)
+                    return None, data
+        except BaseException:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _write(self, generation: int, path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        if self.max_entries and len(os.listdir(directory)) >= self.max_entries * 2:  # 每个条目含一个锁文件
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._remove_old_generations(generation)
+
+    def _remove_old_generations(self, generation: int) -> None:
+        if self._cleaned_generation == generation:
+            return
+        self._cleaned_generation = generation
+        current = f"{generation:x}"
+        for name in os.listdir(self.directory):
+            if name == current:
+                continue
+            try:
+                older = int(name, 16) < generation
+            except ValueError:
+                continue
+            if older:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    async def get_or_compute(
+        self, generation: int, key: CacheKey, compute: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        path = self._path(generation, key)
+        data = self._read(path)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        try:
+            fd, data = await self._lock(path)
+        except OSError:
+            # 目录刚被清理等情况：本次不经过共享缓存
+            self.misses += 1
+            return await compute()
+        if fd is None:
+            self.hits += 1
+            return data
+        try:
+            # 等锁期间其他 worker 可能已经写好
+            data = self._read(path)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+            data = await compute()
+            try:
+                self._write(generation, path, data)
+            except OSError:
+                # 共享目录不可写（空间不足等）时只影响共享，不影响本次响应
+                pass
+            return data
+        finally:
+            self._unlock(fd)
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
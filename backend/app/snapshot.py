@@ -0,0 +1,256 @@
+"""
+计算脚本的列式快照（Arrow IPC 文件，内存映射读取）。
+
+compute_arbitrage 每次都需要全部 swap 与 Binance 成交，但一天以前的历史不会再变化。
+快照把这些历史按计算脚本用到的列保存为 `{dir}/{table}/{seq:06d}.arrow` 分段文件，
+每次采集后只追加新封存的一段。加载时以内存映射打开各段（不经过数据库和逐行解码），
+再从数据库读取快照水位之后的尾部数据拼接。
+
+- 封存：只有比表中最新时间早 SNAPSHOT_SEAL_SECONDS 的行才写入快照，较新的行可能还会被补采或修正；
+- 校验：manifest 记录写入快照时的数据版本（data_generation），加载前读取之后的变更事件（data_changes，
+  见 app/changes.py）。有事件涉及水位及之前的时间（回补、删除、重置）或事件不连续（已清理）时快照失效，
+  加载器回退到数据库，下次更新时重建快照；只涉及水位之后的事件不影响快照（尾部本来就从数据库读取）。
+  校验只读取 data_changes 中的少量事件，不扫描原始表；
+- 快照是可选的：目录中没有 manifest 时加载器直接读取数据库，`python -m app.scripts.snapshot` 首次建立快照后，
+  fetch_data / generate_synthetic 在写入数据后自动追加。
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import pyarrow as pa
+from sqlalchemy import BigInteger, DateTime, Float, Integer, func, select
+from sqlalchemy.engine import Connection
+
+from . import models
+from .changes import changes_between_generations, current_generation
+from .types import HexBinary
+
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshots")
+)
+SNAPSHOT_SEAL_SECONDS = int(os.getenv("SNAPSHOT_SEAL_SECONDS", "86400"))  # 早于最新数据该秒数的行才封存
+SNAPSHOT_BATCH_ROWS = 100_000  # 写入快照时每个 RecordBatch 的行数
+SNAPSHOT_FORMAT = 2  # 2：按数据版本与变更事件校验（1 为按行数与列之和校验，读取时视为没有快照）
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    """一张原始表的快照定义：保存的列与行顺序；name 同时是变更事件中的表名。"""
+
+    name: str
+    model: Any
+    columns: Sequence
+    order_by: Sequence
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column.key for column in self.columns]
+
+    def schema(self) -> pa.Schema:
+        return pa.schema([pa.field(column.key, _arrow_type(column)) for column in self.columns])
+
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, Integer):
+        return pa.int32()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")  # naive UTC，与表中一致
+    if isinstance(column_type, HexBinary):
+        return pa.string()  # 保存解码后的 "0x..."，读取时不需要再转换
+    raise TypeError(f"unsupported column type for snapshot: {column.key} {column_type}")
+
+
+_swap = models.UniswapSwap
+_trade = models.BinanceTrade
+
+SNAPSHOT_TABLES: Dict[str, SnapshotTable] = {
+    # compute_arbitrage 按链上顺序加载 swap；链上顺序与时间顺序一致，因此快照段与尾部可以直接拼接
+    "uniswap_swaps": SnapshotTable(
+        "uniswap_swaps",
+        _swap,
+        columns=(
+            _swap.id, _swap.transaction_hash, _swap.log_index, _swap.timestamp, _swap.amount0,
+            _swap.amount1, _swap.price, _swap.block_number, _swap.transaction_index, _swap.sender,
+            _swap.recipient, _swap.gas_used,
+        ),
+        order_by=(_swap.block_number, _swap.transaction_index, _swap.log_index),
+    ),
+    "binance_trades": SnapshotTable(
+        "binance_trades",
+        _trade,
+        columns=(_trade.id, _trade.timestamp, _trade.price, _trade.quantity),
+        order_by=(_trade.timestamp,),
+    ),
+}
+
+
+def _rows_to_table(table: SnapshotTable, rows: List[Sequence]) -> pa.Table:
+    schema = table.schema()
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+    )
+
+
+class ColumnSnapshot:
+    """一个目录下各表的快照；manifest 与分段文件都先写临时文件再 os.replace，读取方不会看到半个文件。"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, seal_seconds: int = SNAPSHOT_SEAL_SECONDS):
+        self.directory = directory
+        self.seal_seconds = seal_seconds
+
+    def _table_dir(self, table: SnapshotTable) -> str:
+        return os.path.join(self.directory, table.name)
+
+    def manifest(self, table: SnapshotTable) -> Optional[dict]:
+        path = os.path.join(self._table_dir(table), MANIFEST_NAME)
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("columns") != table.column_names:
+            return None
+        return manifest
+
+    def exists(self) -> bool:
+        return any(self.manifest(table) is not None for table in SNAPSHOT_TABLES.values())
+
+    def _write_manifest(self, table: SnapshotTable, manifest: dict) -> None:
+        path = os.path.join(self._table_dir(table), MANIFEST_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def stale_reason(
+        self, conn: Connection, table: SnapshotTable, manifest: Optional[dict], generation: Optional[int] = None
+    ) -> Optional[str]:
+        """快照不可用的原因；可用时返回 None。generation 为当前数据版本（未传入时读取）。"""
+        if manifest is None:
+            return "没有快照"
+        if generation is None:
+            generation = current_generation(conn)
+        changes = changes_between_generations(conn, manifest["generation"], generation, (table.name,))
+        if changes is None:
+            return f"无法确定数据版本 {manifest['generation']} 之后的变化（变更事件已清理或数据被重置）"
+        if manifest["watermark"] is None:
+            return None
+        watermark = datetime.fromisoformat(manifest["watermark"])
+        for change in changes:
+            if change.start is None or change.start <= watermark:
+                start = "起点" if change.start is None else change.start.isoformat()
+                return f"快照范围内的数据已变化（{start} ~ {change.end.isoformat() if change.end else '末尾'}）"
+        return None
+
+    # ---------- 更新 ----------
+
+    def update(self, conn: Connection, table: SnapshotTable, rebuild: bool = False) -> dict:
+        """
+        追加新封存的历史（timestamp 在 (水位, 最新时间 - seal_seconds] 内的行）为一个新分段。
+        快照校验失败或 rebuild=True 时清空后重建。返回本次写入的行数与新水位。
+        """
+        # 先读数据版本再读数据：之后提交的写入在下次校验时都能看到对应的事件
+        generation = current_generation(conn)
+        manifest = None if rebuild else self.manifest(table)
+        if manifest is not None and self.stale_reason(conn, table, manifest, generation) is not None:
+            manifest = None
+        if manifest is None:
+            shutil.rmtree(self._table_dir(table), ignore_errors=True)
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "table": table.name,
+                "columns": table.column_names,
+                "watermark": None,
+                "rows": 0,
+                "segments": [],
+            }
+        os.makedirs(self._table_dir(table), exist_ok=True)
+        # 已核对到当前版本；之后只需检查更新的事件
+        manifest["generation"] = generation
+
+        latest = conn.execute(select(func.max(table.model.timestamp))).scalar()
+        if latest is None:
+            self._write_manifest(table, manifest)
+            return {"rows": 0, "watermark": manifest["watermark"]}
+        horizon = latest - timedelta(seconds=self.seal_seconds)
+        watermark = datetime.fromisoformat(manifest["watermark"]) if manifest["watermark"] else None
+        if watermark is not None and horizon <= watermark:
+            self._write_manifest(table, manifest)
+            return {"rows": 0, "watermark": manifest["watermark"]}
+
+        stmt = select(*table.columns).where(table.model.timestamp <= horizon)
+        if watermark is not None:
+            stmt = stmt.where(table.model.timestamp > watermark)
+        stmt = stmt.order_by(*table.order_by)
+
+        filename = f"{len(manifest['segments']):06d}.arrow"
+        path = os.path.join(self._table_dir(table), filename)
+        rows_written = 0
+        schema = table.schema()
+        with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            result = conn.execute(stmt.execution_options(yield_per=SNAPSHOT_BATCH_ROWS))
+            for rows in result.partitions():
+                writer.write_table(_rows_to_table(table, rows))
+                rows_written += len(rows)
+        if rows_written == 0:
+            os.remove(path + ".tmp")
+        else:
+            os.replace(path + ".tmp", path)
+            manifest["segments"].append({"file": filename, "rows": rows_written, "end": horizon.isoformat()})
+            manifest["rows"] += rows_written
+        manifest["watermark"] = horizon.isoformat()
+        self._write_manifest(table, manifest)
+        return {"rows": rows_written, "watermark": manifest["watermark"]}
+
+    def update_all(self, conn: Connection, rebuild: bool = False) -> Dict[str, dict]:
+        return {name: self.update(conn, table, rebuild=rebuild) for name, table in SNAPSHOT_TABLES.items()}
+
+    # ---------- 读取 ----------
+
+    def load(self, conn: Connection, table: SnapshotTable) -> Optional[pa.Table]:
+        """
+        内存映射读取快照各段，拼接数据库中水位之后的尾部，返回按 table.order_by 排列的 Arrow 表。
+        没有快照或快照已过期时返回 None（调用方回退到数据库）。
+        """
+        manifest = self.manifest(table)
+        reason = self.stale_reason(conn, table, manifest)
+        if reason is not None:
+            if manifest is not None:
+                print(f"  {table.name} 快照不可用：{reason}，从数据库读取")
+            return None
+
+        parts = []
+        try:
+            for segment in manifest["segments"]:
+                source = pa.memory_map(os.path.join(self._table_dir(table), segment["file"]))
+                parts.append(pa.ipc.open_file(source).read_all())
+        except (OSError, pa.ArrowInvalid) as e:
+            # 分段在读取期间被并发的重建删除
+            print(f"  {table.name} 快照读取失败：{e}，从数据库读取")
+            return None
+
+        stmt = select(*table.columns).order_by(*table.order_by)
+        if manifest["watermark"] is not None:
+            stmt = stmt.where(table.model.timestamp > datetime.fromisoformat(manifest["watermark"]))
+        parts.append(_rows_to_table(table, conn.execute(stmt).all()))
+        return pa.concat_tables(parts)
+
+
+def update_snapshots_if_enabled(conn: Connection) -> Optional[Dict[str, dict]]:
+    """采集 / 生成脚本写入数据后调用：已建立快照时追加新封存的历史，未建立时不做任何事。"""
+    snapshot = ColumnSnapshot()
+    if not snapshot.exists():
+        return None
+    return snapshot.update_all(conn)
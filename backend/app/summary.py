@@ -0,0 +1,155 @@
+"""
+arbitrage_opportunities 的预聚合统计（arbitrage_summary 表）。
+
+compute_arbitrage 写入套利候选后在同一事务中调用 refresh_arbitrage_summary，
+/api/arbitrage/statistics 只需按主键读取少量汇总行，不再随历史数据量线性增长。
+
+表中保存按天 × 方向的明细行（day_direction），total / day / direction 三种分桶都由明细行汇总。
+增量计算只替换了一段时间内的候选，刷新时只重新聚合这段时间所在日期的明细行，再由明细行（天数 × 方向数行）
+重建三种分桶，不扫描整张候选表。平均利润率按 AVG 的语义只统计 profit_rate 不为空的候选（profit_rate_count）。
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import Date, String, cast, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+
+SUMMARY_BUCKETS = ("total", "day", "direction")
+DETAIL_BUCKET = "day_direction"  # bucket_key 为 "YYYY-MM-DD|方向"（timestamp 为空时日期部分为空）
+SUMMARY_COLUMNS = [
+    "bucket", "bucket_key", "total_opportunities", "total_profit", "profit_rate_sum", "profit_rate_count",
+]
+
+
+def summary_aggregate(bucket: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    返回对 arbitrage_opportunities 的聚合查询，列与 SUMMARY_COLUMNS 一一对应；
+    start / end 限定 start <= timestamp < end（用于只重新聚合部分日期的明细行）。
+    """
+    opp = models.ArbitrageOpportunity
+    day_expr = cast(cast(opp.timestamp, Date), String)
+    if bucket == "total":
+        key_expr = literal("all")
+    elif bucket == "day":
+        key_expr = day_expr
+    elif bucket == "direction":
+        key_expr = func.coalesce(opp.direction, "unknown")
+    elif bucket == DETAIL_BUCKET:
+        key_expr = func.concat(func.coalesce(day_expr, ""), "|", func.coalesce(opp.direction, "unknown"))
+    else:
+        raise ValueError(f"unknown summary bucket: {bucket}")
+
+    stmt = select(
+        literal(bucket).label("bucket"),
+        key_expr.label("bucket_key"),
+        func.count(opp.id).label("total_opportunities"),
+        func.coalesce(func.sum(opp.profit), 0.0).label("total_profit"),
+        func.coalesce(func.sum(opp.profit_rate), 0.0).label("profit_rate_sum"),
+        func.count(opp.profit_rate).label("profit_rate_count"),
+    )
+    if bucket == "day":
+        stmt = stmt.where(opp.timestamp.isnot(None))
+    if start is not None:
+        stmt = stmt.where(opp.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(opp.timestamp < end)
+    if bucket != "total":
+        stmt = stmt.group_by(key_expr)
+    return stmt
+
+
+def _rollup(bucket: str):
+    """由明细行汇总出指定分桶，列与 SUMMARY_COLUMNS 一一对应。"""
+    summary = models.ArbitrageSummary
+    day = func.split_part(summary.bucket_key, "|", 1)
+    if bucket == "total":
+        key_expr = literal("all")
+    elif bucket == "day":
+        key_expr = day
+    else:
+        key_expr = func.split_part(summary.bucket_key, "|", 2)
+    stmt = select(
+        literal(bucket).label("bucket"),
+        key_expr.label("bucket_key"),
+        func.coalesce(func.sum(summary.total_opportunities), 0).label("total_opportunities"),
+        func.coalesce(func.sum(summary.total_profit), 0.0).label("total_profit"),
+        func.coalesce(func.sum(summary.profit_rate_sum), 0.0).label("profit_rate_sum"),
+        func.coalesce(func.sum(summary.profit_rate_count), 0).label("profit_rate_count"),
+    ).where(summary.bucket == DETAIL_BUCKET)
+    if bucket == "day":
+        stmt = stmt.where(day != "")
+    if bucket != "total":
+        stmt = stmt.group_by(key_expr)
+    return stmt
+
+
+def refresh_arbitrage_summary(
+    session: Session, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> None:
+    """
+    在当前事务中刷新 arbitrage_summary（不提交）。start / end 为候选 timestamp 可能变化的范围
+    （None 表示该侧无界，都为 None 时重建全部明细行）：重新聚合范围所在日期的明细行，再重建三种分桶。
+    """
+    summary = models.ArbitrageSummary
+    day = func.split_part(summary.bucket_key, "|", 1)
+    first_day = start.date() if start is not None else None
+    last_day = end.date() if end is not None else None
+
+    conditions = [summary.bucket == DETAIL_BUCKET]
+    if first_day is not None:
+        conditions.append(day >= first_day.isoformat())
+    if last_day is not None:
+        conditions.append(day <= last_day.isoformat())
+    session.execute(delete(summary).where(*conditions))
+    session.execute(insert(summary).from_select(SUMMARY_COLUMNS, summary_aggregate(
+        DETAIL_BUCKET,
+        datetime.combine(first_day, datetime.min.time()) if first_day is not None else None,
+        datetime.combine(last_day + timedelta(days=1), datetime.min.time()) if last_day is not None else None,
+    )))
+
+    session.execute(delete(summary).where(summary.bucket.in_(SUMMARY_BUCKETS)))
+    for bucket in SUMMARY_BUCKETS:
+        session.execute(insert(summary).from_select(SUMMARY_COLUMNS, _rollup(bucket)))
+
+
+def format_summary_row(row) -> Dict[str, float]:
+    """将汇总行转换为 API 输出格式（平均利润率以百分比表示，与 AVG 一样忽略为空的利润率）。"""
+    count = int(row.total_opportunities or 0)
+    rate_count = int(row.profit_rate_count or 0)
+    average_profit_rate = (float(row.profit_rate_sum or 0.0) / rate_count) if rate_count else 0.0
+    return {
+        "total_opportunities": count,
+        "total_profit": float(row.total_profit or 0.0),
+        "average_profit_rate": average_profit_rate * 100,
+    }
+
+
+async def load_summary(db: AsyncSession, bucket: str) -> List:
+    """
+    读取指定分桶的汇总行；若从未刷新过（没有 total 行，例如表是升级前写入的），
+    则退回到对 arbitrage_opportunities 的实时聚合。
+    """
+    summary = models.ArbitrageSummary
+    has_summary = (
+        await db.execute(
+            select(summary.id).where(summary.bucket == "total", summary.bucket_key == "all")
+        )
+    ).first()
+    if has_summary is None:
+        stmt = summary_aggregate(bucket)
+        if bucket != "total":
+            stmt = stmt.order_by("bucket_key")
+        return (await db.execute(stmt)).all()
+
+    return (
+        await db.scalars(
+            select(summary)
+            .where(summary.bucket == bucket)
+            .order_by(summary.bucket_key)
+        )
+    ).all()
@@ -0,0 +1,84 @@
+"""
+原始链上数据的紧凑列类型。
+
+地址与哈希按原始字节存为 bytea（20 / 32 字节，而不是 42 / 66 个字符的十六进制文本），
+uint160 / uint128 按定长大端字节存为 bytea（而不是 Numeric(50) / Numeric(40)）。
+Python 侧的值保持不变：地址与哈希仍是小写的 "0x..." 字符串，大整数为 int，
+因此 ORM 实例、导出与 API 输出都与原先的文本 / Numeric 列一致。
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Optional, Union
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+
+def hex_to_bytes(value: str) -> bytes:
+    """"0x..." 十六进制字符串 -> 字节。"""
+    return bytes.fromhex(value[2:] if value.startswith(("0x", "0X")) else value)
+
+
+def bytes_to_hex(value: bytes) -> str:
+    """字节 -> 小写 "0x..." 十六进制字符串。"""
+    return "0x" + bytes(value).hex()
+
+
+def uint_to_bytes(value: Union[int, Decimal], width: int) -> bytes:
+    """无符号整数 -> 定长大端字节；超出位宽时抛出 OverflowError。"""
+    return int(value).to_bytes(width, "big")
+
+
+def bytes_to_uint(value: bytes) -> int:
+    return int.from_bytes(value, "big")
+
+
+def copy_literal(value: Union[str, bytes]) -> str:
+    """bytea 在 COPY 文本 / CSV 格式中的写法（"\\x" 加十六进制）。"""
+    if isinstance(value, str):
+        return "\\x" + (value[2:] if value.startswith(("0x", "0X")) else value)
+    return "\\x" + value.hex()
+
+
+class HexBinary(TypeDecorator):
+    """以 bytea 存储的地址 / 哈希，读写均为 "0x..." 字符串。length 为字节数，写入时校验。"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, length: int):
+        super().__init__()
+        self.length = length
+
+    def process_bind_param(self, value, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        data = hex_to_bytes(value) if isinstance(value, str) else bytes(value)
+        if len(data) != self.length:
+            raise ValueError(f"expected {self.length} bytes, got {len(data)}: {value!r}")
+        return data
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        return None if value is None else bytes_to_hex(value)
+
+
+class UnsignedBinary(TypeDecorator):
+    """
+    以定长大端 bytea 存储的无符号大整数（uint160 为 20 字节），读写均为 int。
+    precision 为十进制位数，导出时仍使用原来的 decimal256(precision, 0)。
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, bits: int, precision: int):
+        super().__init__()
+        self.width = bits // 8
+        self.precision = precision
+
+    def process_bind_param(self, value, dialect) -> Optional[bytes]:
+        return None if value is None else uint_to_bytes(value, self.width)
+
+    def process_result_value(self, value, dialect) -> Optional[int]:
+        return None if value is None else bytes_to_uint(value)
@@ -0,0 +1,25 @@
+"""
+测试的公共设置。
+
+单元测试只导入模块、不连接数据库；app.database 在导入时要求 DATABASE_URL，未配置时填入一个不会被连接的占位地址。
+需要真实数据库的测试使用 database_url fixture，没有配置数据库时跳过。
+"""
+import os
+import sys
+
+import pytest
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    os.environ["DATABASE_URL"] = "postgresql://unconfigured/unit_tests"
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    if not DATABASE_URL:
+        pytest.skip("没有配置 DATABASE_URL")
+    return DATABASE_URL
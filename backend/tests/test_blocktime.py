@@ -0,0 +1,127 @@
+"""本地区块时间索引（app/blocktime.py）：锚点间的上下界、保守取值与区块头校验。"""
+from bisect import bisect_left, bisect_right
+
+import pytest
+
+from app.blocktime import SLOT_SECONDS, BlockRange, BlockTimeIndex, _between
+
+
+def _chain_time(block):
+    # 每三个区块之后空一个 slot
+    return SLOT_SECONDS * (block + block // 3)
+
+
+CHAIN = [_chain_time(block) for block in range(3000)]
+
+
+def _truth(timestamp, closest):
+    """在完整的链上换算，作为期望结果。"""
+    if closest == "before":
+        return bisect_right(CHAIN, timestamp) - 1
+    return bisect_left(CHAIN, timestamp)
+
+
+def test_between_without_empty_slots_is_exact():
+    left, right = (100, 1000), (110, 1000 + 10 * SLOT_SECONDS)
+    assert _between(1050, "before", left, right) == BlockRange(104, 104, 104)
+    assert _between(1050, "after", left, right) == BlockRange(105, 105, 105)
+
+
+def test_between_with_empty_slots_bounds():
+    # 10 个区块占了 20 个 slot
+    left, right = (100, 1000), (110, 1000 + 20 * SLOT_SECONDS)
+    before = _between(1100, "before", left, right)
+    after = _between(1100, "after", left, right)
+    assert (before.low, before.high) == (100, 108)
+    assert (after.low, after.high) == (101, 109)
+    assert before.low <= before.estimate <= before.high
+    assert after.low <= after.estimate <= after.high
+
+
+def test_between_irregular_anchors_only_bounds_by_anchors():
+    # 锚点之间的区块比 slot 多，不符合合并后的出块规则
+    left, right = (100, 1000), (110, 1060)
+    assert _between(1030, "before", left, right) == BlockRange(100, 109, 105)
+    assert _between(1030, "after", left, right) == BlockRange(101, 110, 105)
+
+
+def test_between_one_sided():
+    anchor = (100, 1000)
+    # 最新锚点之后 1 秒的第一个区块是精确的
+    assert _between(1001, "after", anchor, None) == BlockRange(101, 101, 101)
+    before = _between(1000 + 3 * SLOT_SECONDS + 5, "before", anchor, None)
+    assert (before.low, before.high) == (100, 103)
+    # 最早锚点之前："before" 没有下界，"after" 只能按 slot 外推出下界
+    assert _between(900, "before", None, anchor) is None
+    after = _between(900, "after", None, anchor)
+    assert (after.low, after.high) == (92, 100)
+    assert _between(900, "after", None, None) is None
+
+
+def test_conservative_side():
+    result = BlockRange(10, 20, 15)
+    assert result.conservative("before") == 20
+    assert result.conservative("after") == 10
+    assert not result.exact
+    assert BlockRange(7, 7, 7).exact
+
+
+def test_lookup_on_anchor_is_exact():
+    index = BlockTimeIndex([(0, CHAIN[0]), (2999, CHAIN[2999]), (1500, CHAIN[1500])])
+    assert index.blocks == [0, 1500, 2999]
+    assert index.lookup(CHAIN[1500], "before") == BlockRange(1500, 1500, 1500)
+    assert index.lookup(CHAIN[1500], "after") == BlockRange(1500, 1500, 1500)
+
+
+def test_non_monotonic_anchors_are_skipped():
+    index = BlockTimeIndex([(0, 0), (10, 120), (20, 100), (30, 360)])
+    assert index.blocks == [0, 10, 30]
+    assert index.skipped == 1
+    assert not index.add(10, 130)  # 已有锚点
+    assert not index.add(5, 130)  # 时间不单调
+    assert index.add(5, 60)
+
+
+@pytest.mark.parametrize("closest", ["before", "after"])
+@pytest.mark.parametrize("timestamp", [1, 5000, 17_777, 23_999, 35_000, CHAIN[2998] + 1])
+def test_block_at_with_headers_matches_chain(timestamp, closest):
+    index = BlockTimeIndex([(0, CHAIN[0]), (2999, CHAIN[2999])])
+    fetched = []
+
+    def fetch_header(block):
+        fetched.append(block)
+        return CHAIN[block]
+
+    assert index.block_at(timestamp, closest, fetch_header, tolerance=0, max_probes=64) == _truth(timestamp, closest)
+    assert len(fetched) <= 64
+
+
+@pytest.mark.parametrize("closest", ["before", "after"])
+@pytest.mark.parametrize("timestamp", [5000, 17_777, 35_000])
+def test_block_at_within_tolerance_is_conservative(timestamp, closest):
+    index = BlockTimeIndex((block, CHAIN[block]) for block in range(0, 3000, 50))
+    block = index.block_at(timestamp, closest, tolerance=100)
+    # "before" 只会偏后、"after" 只会偏前：按区块范围抓取日志时只会多取
+    if closest == "before":
+        assert _truth(timestamp, closest) <= block <= _truth(timestamp, closest) + 50
+    else:
+        assert _truth(timestamp, closest) - 50 <= block <= _truth(timestamp, closest)
+
+
+def test_block_at_gives_up_without_headers():
+    index = BlockTimeIndex([(0, CHAIN[0]), (2999, CHAIN[2999])])
+    assert index.block_at(20_000, "before", tolerance=100) is None
+    assert index.block_at(20_000, "before", lambda block: None, tolerance=100) is None
+
+    calls = []
+    assert index.block_at(20_000, "before", calls.append, tolerance=0, max_probes=0) is None
+    assert calls == []
+
+
+def test_block_at_does_not_probe_outside_known_range():
+    index = BlockTimeIndex([(0, CHAIN[0]), (1000, CHAIN[1000])])
+    calls = []
+    assert index.block_at(CHAIN[1000] + 10 * SLOT_SECONDS, "before", calls.append, tolerance=0) is None
+    assert calls == []
+    # 已知范围之后 1 秒的第一个区块可以直接外推
+    assert index.block_at(CHAIN[1000] + 1, "after", calls.append, tolerance=0) == 1001
@@ -0,0 +1,56 @@
+"""进程内响应缓存（app/cache.py）：版本只前进，旧版本的慢请求不清空、不回退缓存。"""
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.cache import CacheScope, ResponseCache, make_cache_key
+
+KEY = make_cache_key("price-data", {"start_date": "2025-09-01"})
+OTHER = make_cache_key("price-data", {"start_date": "2025-09-02"})
+
+
+def test_newer_generation_clears_entries():
+    cache = ResponseCache()
+    cache.set(1, KEY, b"old")
+    assert cache.get(2, KEY) is None
+    assert len(cache) == 0
+    cache.set(2, KEY, b"new")
+    assert cache.get(2, KEY) == b"new"
+
+
+def test_stale_set_is_dropped_without_clearing():
+    cache = ResponseCache()
+    cache.set(2, KEY, b"current")
+    # 版本递增前开始计算的慢请求晚到
+    cache.set(1, OTHER, b"stale")
+    assert cache.get(2, KEY) == b"current"
+    assert cache.get(2, OTHER) is None
+    assert cache.cleared == 0
+
+
+def test_stale_get_misses_without_clearing():
+    cache = ResponseCache()
+    cache.set(2, KEY, b"current")
+    assert cache.get(1, KEY) is None
+    assert cache.get(2, KEY) == b"current"
+    assert cache.cleared == 0
+
+
+def test_advance_never_moves_backwards():
+    cache = ResponseCache()
+    cache.set(3, KEY, b"current")
+    cache.advance(1, 2, None)
+    assert cache.get(3, KEY) == b"current"
+    assert cache.cleared == 0
+
+
+def test_advance_with_changes_only_evicts_affected_entries():
+    cache = ResponseCache()
+    cache.set(1, KEY, b"a", CacheScope.of(("uniswap_swaps",), datetime(2025, 9, 1), datetime(2025, 9, 2)))
+    cache.set(1, OTHER, b"b", CacheScope.of(("uniswap_swaps",), datetime(2025, 9, 2), datetime(2025, 9, 3)))
+    change = SimpleNamespace(
+        table_name="uniswap_swaps", start_time=datetime(2025, 9, 2, 12), end_time=datetime(2025, 9, 2, 13)
+    )
+    cache.advance(1, 2, [change])
+    assert cache.get(2, KEY) == b"a"
+    assert cache.get(2, OTHER) is None
+    assert cache.invalidated == 1
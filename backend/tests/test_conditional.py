@@ -0,0 +1,115 @@
+"""条件请求与响应压缩（app/conditional.py）：Accept-Encoding 协商、ETag 与 304。"""
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from app import conditional
+from app.cache import make_cache_key
+from app.conditional import (
+    EncodedBody,
+    choose_encoding,
+    encoded_json_response,
+    make_etag,
+    matching_etag,
+    not_modified_response,
+)
+
+KEY = make_cache_key("arbitrage-statistics", {"by": "day"})
+PREFERRED = conditional.SUPPORTED_ENCODINGS[0]
+
+
+def _request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": raw})
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZip ; q=0.5", "gzip"),
+        ("gzip;q=0", None),
+        ("gzip;q=abc", None),
+        ("deflate, *", PREFERRED),
+        ("gzip, deflate, br", PREFERRED),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_brotli_preferred_over_gzip():
+    pytest.importorskip("brotli")
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+
+
+def test_etag_depends_on_generation_key_and_encoding():
+    etag = make_etag(10, KEY)
+    assert etag.startswith('"a-') and etag.endswith('"')
+    assert make_etag(10, KEY) == etag
+    assert make_etag(11, KEY) != etag
+    assert make_etag(10, make_cache_key("arbitrage-statistics", {"by": "hour"})) != etag
+    assert make_etag(10, KEY, "gzip") == etag[:-1] + '-gzip"'
+
+
+def test_matching_etag_weak_comparison():
+    etags = (make_etag(1, KEY, "gzip"), make_etag(1, KEY))
+    assert matching_etag(etags[1], etags) == etags[1]
+    assert matching_etag(f'"other", W/{etags[0]}', etags) == etags[0]
+    assert matching_etag("*", etags) == etags[0]
+    assert matching_etag('"other"', etags) is None
+    assert matching_etag(make_etag(2, KEY), etags) is None
+
+
+def test_not_modified_for_compressed_and_identity_etags():
+    assert not_modified_response(_request(), 1, KEY) is None
+    compressed = make_etag(1, KEY, "gzip")
+    response = not_modified_response(_request(if_none_match=compressed, accept_encoding="gzip"), 1, KEY)
+    assert response.status_code == 304
+    assert response.headers["etag"] == compressed
+    assert response.headers["vary"] == "Accept-Encoding"
+    # 响应体过小而未压缩时，客户端持有的是无后缀的 ETag
+    identity = make_etag(1, KEY)
+    response = not_modified_response(_request(if_none_match=identity, accept_encoding="gzip"), 1, KEY)
+    assert response.status_code == 304
+    assert response.headers["etag"] == identity
+    # 数据版本变化后失效
+    assert not_modified_response(_request(if_none_match=compressed, accept_encoding="gzip"), 2, KEY) is None
+
+
+def test_large_body_is_compressed_once(monkeypatch):
+    monkeypatch.setattr(conditional, "RESPONSE_COMPRESSION_MIN_BYTES", 16)
+    body = EncodedBody(b'{"items": [' + b"1, " * 100 + b"1]}")
+    response = encoded_json_response(_request(accept_encoding="gzip"), 3, KEY, body)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == make_etag(3, KEY, "gzip")
+    assert gzip.decompress(response.body) == body.identity
+    assert body.variant("gzip") is body.variant("gzip")
+
+    plain = encoded_json_response(_request(), 3, KEY, body)
+    assert "content-encoding" not in plain.headers
+    assert plain.body == body.identity
+    assert plain.headers["etag"] == make_etag(3, KEY)
+
+
+def test_brotli_variant_round_trip(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(conditional, "RESPONSE_COMPRESSION_MIN_BYTES", 16)
+    body = EncodedBody(b'{"value": "' + b"x" * 500 + b'"}')
+    response = encoded_json_response(_request(accept_encoding="br, gzip"), 3, KEY, body)
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(response.body) == body.identity
+
+
+def test_small_body_is_not_compressed(monkeypatch):
+    monkeypatch.setattr(conditional, "RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+    body = EncodedBody(b'{"ok": true}')
+    response = encoded_json_response(_request(accept_encoding="gzip"), 3, KEY, body)
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == make_etag(3, KEY)
+    assert response.headers["cache-control"] == "no-cache"
@@ -0,0 +1,64 @@
+"""套利行为列表的 keyset 分页 cursor（app/main.py 的 _encode_cursor / _decode_cursor）。"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.main import _decode_cursor, _encode_cursor
+
+
+def test_profit_cursor_round_trip():
+    cursor = _encode_cursor("profit", "desc", 12.5, 42)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor, "profit", "desc") == (12.5, 42)
+    assert _decode_cursor(_encode_cursor("profit", "asc", 3, 7), "profit", "asc") == (3.0, 7)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        datetime(2025, 9, 1, 12, 0, 0, 123456),  # 数据库中的 naive UTC
+        datetime(2025, 9, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+        datetime(2025, 9, 1, 20, 0, 0, 123456, tzinfo=timezone(timedelta(hours=8))),
+    ],
+)
+def test_timestamp_cursor_round_trip_as_naive_utc(value):
+    cursor = _encode_cursor("buy_timestamp", "asc", value, 9)
+    assert _decode_cursor(cursor, "buy_timestamp", "asc") == (datetime(2025, 9, 1, 12, 0, 0, 123456), 9)
+
+
+@pytest.mark.parametrize("sort_by, sort_order", [("profit", "asc"), ("sell_timestamp", "desc")])
+def test_cursor_from_other_sort_is_rejected(sort_by, sort_order):
+    cursor = _encode_cursor("profit", "desc", 1.0, 1)
+    with pytest.raises(HTTPException) as excinfo:
+        _decode_cursor(cursor, sort_by, sort_order)
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == "invalid cursor"
+
+
+def _raw(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.parametrize(
+    "cursor, sort_by",
+    [
+        ("not-a-cursor", "profit"),
+        ("!!!!", "profit"),
+        (base64.urlsafe_b64encode(b"\xff\xfe").decode(), "profit"),
+        (_raw([1, 2]), "profit"),
+        (_raw({"s": "profit", "o": "desc", "v": 1.0}), "profit"),
+        (_raw({"s": "profit", "o": "desc", "v": "abc", "id": 1}), "profit"),
+        (_raw({"s": "profit", "o": "desc", "v": 1.0, "id": None}), "profit"),
+        (_raw({"s": "buy_timestamp", "o": "desc", "v": "yesterday", "id": 1}), "buy_timestamp"),
+        (_raw({"s": "buy_timestamp", "o": "desc", "v": 5, "id": 1}), "buy_timestamp"),
+    ],
+)
+def test_malformed_cursor_is_rejected(cursor, sort_by):
+    with pytest.raises(HTTPException) as excinfo:
+        _decode_cursor(cursor, sort_by, "desc")
+    assert excinfo.value.status_code == 400
+    # 响应中不回显解析细节
+    assert excinfo.value.detail == "invalid cursor"
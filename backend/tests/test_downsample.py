@@ -0,0 +1,89 @@
+"""图表序列降采样（app/downsample.py）：LTTB 与 minmax 的点数、首尾点和极值保留。"""
+import math
+
+import pytest
+
+from app.downsample import downsample_buckets, lttb, minmax, spread_series
+
+
+def _wave(count):
+    return [(float(t), math.sin(t / 7) * 100 + t) for t in range(count)]
+
+
+def test_lttb_keeps_endpoints_and_returns_threshold_points():
+    points = _wave(1000)
+    for threshold in (3, 10, 200, 999):
+        sampled = lttb(points, threshold)
+        assert len(sampled) == threshold
+        assert sampled[0] == points[0]
+        assert sampled[-1] == points[-1]
+        # 选中的点来自原序列且按时间递增
+        assert all(point in points for point in sampled)
+        assert [t for t, _ in sampled] == sorted({t for t, _ in sampled})
+
+
+def test_lttb_returns_input_when_nothing_to_drop():
+    points = _wave(50)
+    assert lttb(points, 50) == points
+    assert lttb(points, 80) == points
+    assert lttb([], 10) == []
+    assert lttb(points[:2], 2) == points[:2]
+
+
+def test_lttb_small_threshold_never_exceeds_points():
+    # 没有中间桶时只保留首尾点，点数仍不超过 threshold
+    points = _wave(50)
+    assert lttb(points, 2) == [points[0], points[-1]]
+    assert lttb(points, 1) == [points[0]]
+    assert lttb(points, 0) == []
+    assert lttb(points[:3], 2) == [points[0], points[2]]
+
+
+def test_lttb_keeps_spike():
+    points = [(float(t), 0.0) for t in range(300)]
+    points[137] = (137.0, 1000.0)
+    assert (137.0, 1000.0) in lttb(points, 20)
+
+
+def test_minmax_keeps_extremes_in_time_order():
+    # (min_t, min, max_t, max)：第一个桶的最高点早于最低点
+    points = [(1.0, 5.0, 0.0, 9.0), (3.0, 4.0, 2.0, 6.0), (4.0, 1.0, 5.0, 8.0), (7.0, 2.0, 6.0, 3.0)]
+    assert minmax(points, 2) == [(0.0, 9.0), (3.0, 4.0), (4.0, 1.0), (5.0, 8.0)]
+
+
+def test_minmax_point_count():
+    points = [(float(t), -float(t % 13), float(t) + 0.5, float(t % 17)) for t in range(1000)]
+    for buckets in (1, 7, 250):
+        sampled = minmax(points, buckets)
+        assert buckets <= len(sampled) <= 2 * buckets
+        assert min(value for _, value in sampled) == -12.0
+        assert max(value for _, value in sampled) == 16.0
+    # 桶数多于输入时每个输入一个桶
+    assert len(minmax(points[:3], 10)) == 6
+    assert minmax([], 10) == []
+
+
+def test_minmax_single_value_bucket_collapses():
+    assert minmax([(1.0, 2.0, 1.0, 2.0)], 1) == [(1.0, 2.0)]
+
+
+class _Bucket:
+    def __init__(self, index, avg_t, avg):
+        self.index, self.avg_t, self.avg = index, avg_t, avg
+        self.min_t, self.min, self.max_t, self.max = avg_t, avg - 1, avg_t + 0.5, avg + 1
+
+
+def test_spread_series_only_uses_shared_buckets():
+    uniswap = [_Bucket(0, 10.0, 101.0), _Bucket(1, 20.0, 100.0), _Bucket(3, 40.0, 99.0)]
+    binance = [_Bucket(0, 12.0, 99.0), _Bucket(2, 30.0, 100.0), _Bucket(3, 38.0, 99.0)]
+    assert spread_series(uniswap, binance, 10, "lttb") == [(11.0, 2.0), (39.0, 0.0)]
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("points", [2, 3, 4, 5])
+def test_series_never_exceed_points(method, points):
+    # /api/series 的 points 最小为 2
+    buckets = [_Bucket(i, float(i), 100.0 + math.sin(i)) for i in range(points * 4)]
+    other = [_Bucket(i, float(i) + 0.25, 100.0) for i in range(points * 4)]
+    assert len(downsample_buckets(buckets, points, method)) <= points
+    assert len(spread_series(buckets, other, points, method)) <= points
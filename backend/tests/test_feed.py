@@ -0,0 +1,55 @@
+"""实时推送（app/feed.py）：轮询任务只在有订阅者时运行。"""
+import asyncio
+
+from app.feed import GenerationWatcher
+
+
+class _CountingWatcher(GenerationWatcher):
+    """不连接数据库，只记录轮询次数。"""
+
+    def __init__(self):
+        super().__init__(interval=0.01)
+        self.polls = 0
+
+    async def _run(self) -> None:
+        while True:
+            self.polls += 1
+            await asyncio.sleep(self.interval)
+
+
+def test_poll_task_stops_with_last_subscriber():
+    async def scenario():
+        watcher = _CountingWatcher()
+        watcher.subscribe()
+        watcher.subscribe()
+        watcher.current_event()
+        await asyncio.sleep(0.05)
+        task = watcher._task
+        assert task is not None and not task.done()
+
+        watcher.unsubscribe()
+        await asyncio.sleep(0.02)
+        assert not task.done()
+
+        watcher.unsubscribe()
+        await asyncio.sleep(0.02)
+        assert task.cancelled()
+        assert watcher._task is None
+        polls = watcher.polls
+        await asyncio.sleep(0.05)
+        assert watcher.polls == polls
+
+        # 新的订阅者重新启动轮询
+        watcher.subscribe()
+        watcher.current_event()
+        await asyncio.sleep(0.05)
+        assert watcher.polls > polls
+        await watcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unsubscribe_without_subscribers_is_harmless():
+    watcher = GenerationWatcher()
+    watcher.unsubscribe()
+    assert watcher.subscribers == 0
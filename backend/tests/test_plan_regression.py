@@ -0,0 +1,51 @@
+"""
+执行计划回归检查（app/scripts/plan_regression.py）：热点查询使用预期索引，API 发出的查询没有不良计划。
+需要接近真实规模的数据（python -m app.scripts.plan_regression --generate 生成）；没有配置数据库时跳过。
+不运行计算脚本，检查现有的计算结果。
+"""
+import argparse
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.query_plans import ESTIMATE_FACTOR, LARGE_TABLE_ROWS, PLAN_CHECKS
+
+
+@pytest.fixture(scope="module")
+def conn(database_url):
+    from app.database import engine
+
+    with engine.connect() as connection:
+        # 小数据集上顺序扫描本来就是最优计划，检查结果没有意义
+        swaps = connection.execute(text("SELECT count(*) FROM uniswap_swaps")).scalar()
+        connection.rollback()
+        if swaps < LARGE_TABLE_ROWS:
+            pytest.skip(f"数据量不足（uniswap_swaps {swaps} 行），执行计划检查需要接近真实规模的数据")
+        yield connection
+
+
+@pytest.mark.parametrize("check", PLAN_CHECKS, ids=[check.name for check in PLAN_CHECKS])
+def test_plan_check(conn, check):
+    from app.query_plans import check_parameters, check_plan
+
+    result = check_plan(conn, check, check_parameters(conn), analyze=True)
+    conn.rollback()
+    assert result.problems == []
+
+
+def test_api_query_plans(conn):
+    from app.query_plans import QueryRecorder
+    from app.scripts import plan_regression
+
+    recorder = QueryRecorder()
+    plans = asyncio.run(plan_regression.capture_api_plans(recorder))
+    args = argparse.Namespace(large_table_rows=LARGE_TABLE_ROWS, estimate_factor=ESTIMATE_FACTOR)
+    report = plan_regression.explain_queries(recorder, plans, args)
+    problems = {
+        f"{entry['source']}: {entry['statement'][:120]}": entry["problems"]
+        for entry in report
+        # 热点查询的索引检查由 test_plan_check 覆盖
+        if entry["problems"] and not entry["source"].startswith("plan_check:")
+    }
+    assert problems == {}
@@ -0,0 +1,87 @@
+"""原始链上数据的紧凑列类型（app/types.py）：bytea 与 "0x..." 字符串 / 大整数之间的往返。"""
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.types import HexBinary, UnsignedBinary, copy_literal
+
+DIALECT = postgresql.dialect()
+
+ADDRESS = "0x88e6a0c2ddd26feeb64f039a2c41296fcb3f5640"
+TX_HASH = "0x" + "ab" * 32
+
+
+@pytest.mark.parametrize("length, value", [(20, ADDRESS), (32, TX_HASH), (20, "0x" + "00" * 20)])
+def test_hex_binary_round_trip(length, value):
+    column = HexBinary(length)
+    stored = column.process_bind_param(value, DIALECT)
+    assert stored == bytes.fromhex(value[2:])
+    assert column.process_result_value(stored, DIALECT) == value
+
+
+def test_hex_binary_normalizes_to_lowercase_with_prefix():
+    column = HexBinary(20)
+    stored = column.process_bind_param(ADDRESS.upper().replace("0X", "0x"), DIALECT)
+    assert column.process_result_value(stored, DIALECT) == ADDRESS
+    # 没有 0x 前缀或已经是字节
+    assert column.process_bind_param(ADDRESS[2:], DIALECT) == stored
+    assert column.process_bind_param(stored, DIALECT) == stored
+    assert column.process_result_value(memoryview(stored), DIALECT) == ADDRESS
+
+
+@pytest.mark.parametrize("value", [ADDRESS[:-2], ADDRESS + "00", TX_HASH])
+def test_hex_binary_rejects_wrong_length(value):
+    with pytest.raises(ValueError):
+        HexBinary(20).process_bind_param(value, DIALECT)
+
+
+def test_hex_binary_rejects_non_hex():
+    with pytest.raises(ValueError):
+        HexBinary(20).process_bind_param("0x" + "zz" * 20, DIALECT)
+
+
+@pytest.mark.parametrize(
+    "bits, value",
+    [
+        (160, 0),
+        (160, 1),
+        (160, 2**160 - 1),
+        (160, 2**96 * 3000),
+        (128, 2**128 - 1),
+        (128, 17_234_567_890_123_456_789),
+    ],
+)
+def test_unsigned_binary_round_trip(bits, value):
+    column = UnsignedBinary(bits, precision=50)
+    stored = column.process_bind_param(value, DIALECT)
+    assert len(stored) == bits // 8
+    assert column.process_result_value(stored, DIALECT) == value
+    # Numeric 列读出的 Decimal 按相同的字节写入
+    assert column.process_bind_param(Decimal(value), DIALECT) == stored
+
+
+def test_unsigned_binary_is_big_endian_and_order_preserving():
+    column = UnsignedBinary(160, precision=50)
+    assert column.process_bind_param(1, DIALECT) == b"\x00" * 19 + b"\x01"
+    values = [0, 1, 255, 256, 2**80, 2**160 - 1]
+    stored = [column.process_bind_param(value, DIALECT) for value in values]
+    # 定长大端字节的字典序与数值顺序一致（bytea 比较、排序仍然正确）
+    assert stored == sorted(stored)
+
+
+@pytest.mark.parametrize("value", [2**160, -1])
+def test_unsigned_binary_rejects_out_of_range(value):
+    with pytest.raises(OverflowError):
+        UnsignedBinary(160, precision=50).process_bind_param(value, DIALECT)
+
+
+def test_none_passes_through():
+    for column in (HexBinary(20), UnsignedBinary(160, precision=50)):
+        assert column.process_bind_param(None, DIALECT) is None
+        assert column.process_result_value(None, DIALECT) is None
+
+
+def test_copy_literal():
+    assert copy_literal(ADDRESS) == "\\x" + ADDRESS[2:]
+    assert copy_literal(bytes.fromhex(ADDRESS[2:])) == "\\x" + ADDRESS[2:]